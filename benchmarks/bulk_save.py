@@ -0,0 +1,67 @@
+"""
+Замер времени сохранения большого словаря (DictionaryService.save_dictionary_by_dto).
+
+Запуск из корня проекта (БД берётся из DATABASE_URL, в неё пишется тестовый словарь, который затем удаляется):
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/bulk_save.py --terms 100000 --connections 200000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+database.engine.echo = False
+logging.getLogger("sqlalchemy.engine").disabled = True
+
+from src.database.models import create_all  # noqa: E402
+from src.models.dto import ConnectionDTO, DictionaryDTO, TermDTO  # noqa: E402
+from src.services.dictionary_purger import dictionary_purger  # noqa: E402
+from src.services.dictionary_service import DictionaryService  # noqa: E402
+
+SOURCE_TEXT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'text_examples', 'war_and_peace_wiki_dump.txt')
+
+
+def make_dictionary(terms: int, connections: int, seed: int = 1) -> DictionaryDTO:
+    """Словарь из случайных сочетаний 1-3 слов реального текста и случайных связей между ними"""
+    rng = random.Random(seed)
+    with open(SOURCE_TEXT, encoding='utf-8') as f:
+        words = sorted({word.lower() for word in f.read().split() if word.isalpha()})
+    phrases = [
+        TermDTO(
+            id=i,
+            text=' '.join(rng.choice(words) for _ in range(rng.randint(1, 3))),
+            type='однословное',
+            phrase_type='phrase',
+            tfidf=rng.random()
+        )
+        for i in range(terms)
+    ]
+    links = [ConnectionDTO(rng.randrange(terms), rng.randrange(terms)) for _ in range(connections)]
+    return DictionaryDTO(name='benchmark', tfidf_range=0.1, phrases=phrases, connections=links, document_text='')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--terms', type=int, default=100_000)
+    parser.add_argument('--connections', type=int, default=200_000)
+    args = parser.parse_args()
+
+    create_all()
+    dict_dto = make_dictionary(args.terms, args.connections)
+
+    started = time.perf_counter()
+    dictionary_id = DictionaryService().save_dictionary_by_dto(dict_dto)
+    elapsed = time.perf_counter() - started
+    print(f"Сохранение словаря: {args.terms} терминов, {args.connections} связей - {elapsed:.2f} с")
+
+    DictionaryService().delete_dictionary(dictionary_id)
+    dictionary_purger.purge_pending()
+
+
+if __name__ == '__main__':
+    main()
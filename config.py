@@ -15,3 +15,63 @@ with open('.version', 'r', encoding='utf-8') as f:
 DATABASE_URL = os.getenv('DATABASE_URL')
 
 VL_TIMEZONE: Final = ZoneInfo("Asia/Vladivostok")
+
+# Максимальное кол-во словоформ в общем кэше морфологического разбора
+MORPH_CACHE_SIZE: Final = int(os.getenv('MORPH_CACHE_SIZE', 200_000))
+
+# JSON-файл с дополнительными POS-шаблонами для выделения словосочетаний (см. README)
+POS_PATTERNS_FILE = os.getenv('POS_PATTERNS_FILE')
+
+# Кэш результатов анализа: кол-во записей в памяти и лимит размера на диске
+ANALYSIS_CACHE_DIR = os.path.join(ANALYSIS_DIR, "cache")
+ANALYSIS_CACHE_MEMORY_SIZE: Final = int(os.getenv('ANALYSIS_CACHE_MEMORY_SIZE', 32))
+ANALYSIS_CACHE_DISK_BYTES: Final = int(os.getenv('ANALYSIS_CACHE_DISK_BYTES', 512 * 1024 * 1024))
+
+# Фоновые задачи анализа: кол-во процессов-обработчиков и сколько завершённых задач хранить
+ANALYSIS_JOB_WORKERS: Final = int(os.getenv('ANALYSIS_JOB_WORKERS', 2))
+ANALYSIS_JOB_RETENTION: Final = int(os.getenv('ANALYSIS_JOB_RETENTION', 100))
+# Пакетный анализ нескольких документов: по умолчанию по процессу на ядро
+ANALYSIS_BATCH_WORKERS: Final = int(os.getenv('ANALYSIS_BATCH_WORKERS', os.cpu_count() or 1))
+# Тексты длиннее этого кол-ва символов анализируются по кускам параллельно (map-reduce)
+ANALYSIS_SHARD_SIZE: Final = int(os.getenv('ANALYSIS_SHARD_SIZE', 100_000))
+# Кол-во процессов, считающих куски больших текстов, у каждого процесса-обработчика задач (пул создаётся
+# один раз и живёт вместе с ним). Всего процессов анализа задач: ANALYSIS_JOB_WORKERS * (1 + ANALYSIS_SHARD_WORKERS);
+# по умолчанию ядра делятся между обработчиками, а 1 - куски считаются в самом обработчике, без пула
+ANALYSIS_SHARD_WORKERS: Final = int(os.getenv(
+    'ANALYSIS_SHARD_WORKERS',
+    max((os.cpu_count() or 1) // ANALYSIS_JOB_WORKERS, 1)
+))
+# Хэширующий режим TF-IDF: кол-во корзин для n-грамм (0 - точный подсчёт со словарём всех n-грамм)
+TFIDF_HASH_BUCKETS: Final = int(os.getenv('TFIDF_HASH_BUCKETS', 0))
+# Кластеризация почти-дубликатов фраз: минимальное сходство Жаккара множеств лемм двух фраз кластера
+PHRASE_CLUSTER_THRESHOLD: Final = float(os.getenv('PHRASE_CLUSTER_THRESHOLD', 0.5))
+
+# Поисковые индексы терминов словарей: каталог на диске и кол-во индексов в памяти
+TERM_INDEX_DIR = os.path.join(ANALYSIS_DIR, "term_index")
+TERM_INDEX_MEMORY_SIZE: Final = int(os.getenv('TERM_INDEX_MEMORY_SIZE', 512))
+# Префиксные индексы терминов для автодополнения
+TERM_PREFIX_INDEX_DIR = os.path.join(ANALYSIS_DIR, "term_prefix_index")
+TERM_PREFIX_INDEX_MEMORY_SIZE: Final = int(os.getenv('TERM_PREFIX_INDEX_MEMORY_SIZE', 128))
+# Кол-во графов связей терминов словарей в памяти
+TERM_GRAPH_MEMORY_SIZE: Final = int(os.getenv('TERM_GRAPH_MEMORY_SIZE', 128))
+# Размерность векторов терминов для поиска похожих терминов (pgvector)
+TERM_EMBEDDING_DIM: Final = int(os.getenv('TERM_EMBEDDING_DIM', 256))
+# Кол-во результатов на странице поиска по словарям
+SEARCH_PAGE_SIZE: Final = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+# Кол-во словарей на странице списка словарей
+DICTIONARY_PAGE_SIZE: Final = int(os.getenv('DICTIONARY_PAGE_SIZE', 50))
+# Кэш страниц поиска: кол-во страниц в памяти и время жизни записи в секундах
+SEARCH_CACHE_SIZE: Final = int(os.getenv('SEARCH_CACHE_SIZE', 1024))
+SEARCH_CACHE_TTL: Final = int(os.getenv('SEARCH_CACHE_TTL', 600))
+# Фоновая очистка удалённых словарей: строк за одну транзакцию и интервал проверки в секундах
+DICTIONARY_PURGE_BATCH_SIZE: Final = int(os.getenv('DICTIONARY_PURGE_BATCH_SIZE', 5000))
+DICTIONARY_PURGE_INTERVAL: Final = int(os.getenv('DICTIONARY_PURGE_INTERVAL', 300))
+# Индексы предложений сохранённых документов
+SENTENCE_INDEX_DIR = os.path.join(ANALYSIS_DIR, "sentence_index")
+SENTENCE_INDEX_MEMORY_SIZE: Final = int(os.getenv('SENTENCE_INDEX_MEMORY_SIZE', 64))
+
+# Загружаемые файлы читаются и декодируются потоково, кусками по UPLOAD_CHUNK_SIZE байт
+ANALYSIS_UPLOAD_DIR = os.path.join(ANALYSIS_DIR, "uploads")
+UPLOAD_CHUNK_SIZE: Final = int(os.getenv('UPLOAD_CHUNK_SIZE', 64 * 1024))
+# Защита от gzip-бомб: распакованный файл не больше сжатого во столько раз (первый кусок не проверяется)
+UPLOAD_MAX_COMPRESSION_RATIO: Final = int(os.getenv('UPLOAD_MAX_COMPRESSION_RATIO', 100))
@@ -6,6 +6,9 @@ from fastapi.staticfiles import StaticFiles
 import src.database.models as models
 from src.routers.views import views_router
 from src.routers.api import api_router
+from src.services.analysis_batch import batch_analysis
+from src.services.analysis_jobs import analysis_jobs
+from src.services.dictionary_purger import dictionary_purger
 import uvicorn
 
 from config import version
@@ -15,9 +18,13 @@ from config import version
 async def lifespan(appType: FastAPI):
     # Код, выполняемый при старте приложения
     models.create_all()
+    # Дочищает в том числе словари, удалённые до перезапуска
+    dictionary_purger.start()
     yield
-    # Код, выполняемый при завершении приложения (если нужно)
-    # Например: models.close_all()
+    # Код, выполняемый при завершении приложения
+    analysis_jobs.shutdown()
+    batch_analysis.shutdown()
+    dictionary_purger.shutdown()
 
 
 app = FastAPI(title="Сервис разметки текстовых документов", version=version, lifespan=lifespan)
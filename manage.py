@@ -0,0 +1,86 @@
+"""
+Служебные команды, которые не выполняются при старте приложения.
+
+Запуск из корня проекта (в контейнере: `docker compose exec backend python manage.py ...`):
+    python manage.py deduplicate-terms [--dry-run] [--report removed_terms.json]
+    python manage.py build-indexes
+    python manage.py backfill-embeddings
+"""
+import argparse
+import json
+
+from sqlmodel import Session, select
+
+from database import engine
+from src.database.migrations import add_missing_indexes, deduplicate_terms
+from src.database.models import Document, active_dictionary_ids
+from src.services.sentence_index_service import sentence_indexes
+from src.services.term_index_service import term_indexes
+from src.services.term_prefix_index_service import term_prefix_indexes
+from src.services.term_similarity_service import term_similarity
+
+
+def run_deduplicate_terms(args: argparse.Namespace) -> None:
+    removed = deduplicate_terms(engine, dry_run=args.dry_run)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(removed, f, ensure_ascii=False, indent=2, default=str)
+    print(f"Повторов терминов {'найдено' if args.dry_run else 'удалено'}: {len(removed)} (подробности - в dev.log)")
+    if not args.dry_run:
+        add_missing_indexes(engine)
+
+
+def run_build_indexes(args: argparse.Namespace) -> None:
+    """
+    Индексы терминов и предложений строятся при сохранении словаря; команда достраивает их для словарей,
+    сохранённых до появления индексов или перенесённых из другой базы, чтобы поиск не строил их сам
+    """
+    with Session(engine) as db:
+        dictionary_ids = db.exec(active_dictionary_ids()).all()
+        for dictionary_id in dictionary_ids:
+            term_indexes.refresh(db, dictionary_id)
+            term_prefix_indexes.refresh(db, dictionary_id)
+        document_ids = db.exec(
+            select(Document.id).where(Document.dictionary_id.in_(active_dictionary_ids()))
+        ).all()
+        for document_id in document_ids:
+            sentence_indexes.get(db, document_id)
+    print(f"Проверено индексов: словарей - {len(dictionary_ids)}, документов - {len(document_ids)}")
+
+
+def run_backfill_embeddings(args: argparse.Namespace) -> None:
+    processed = term_similarity.backfill_embeddings(batch_size=args.batch_size)
+    print(f"Терминов без векторов обработано: {processed}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    deduplicate = commands.add_parser(
+        'deduplicate-terms',
+        help='убрать повторы терминов (dictionary_id, text, type) и создать уникальный индекс'
+    )
+    deduplicate.add_argument('--dry-run', action='store_true', help='только найти повторы, ничего не менять')
+    deduplicate.add_argument('--report', help='JSON-файл со списком удаляемых терминов')
+    deduplicate.set_defaults(handler=run_deduplicate_terms)
+
+    build_indexes = commands.add_parser(
+        'build-indexes',
+        help='построить недостающие и устаревшие индексы терминов и предложений'
+    )
+    build_indexes.set_defaults(handler=run_build_indexes)
+
+    backfill = commands.add_parser(
+        'backfill-embeddings',
+        help='заполнить векторы терминов, сохранённых до появления поиска похожих терминов'
+    )
+    backfill.add_argument('--batch-size', type=int, default=500, help='терминов за один запрос к БД')
+    backfill.set_defaults(handler=run_backfill_embeddings)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
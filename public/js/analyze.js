@@ -7,7 +7,8 @@ function clearText() {
 // Обработка загрузки файла
 document.getElementById('fileInput').addEventListener('change', function (e) {
     const file = e.target.files[0];
-    if (!file) return;
+    // Сжатые файлы распаковываются только на сервере
+    if (!file || file.name.endsWith('.gz')) return;
 
     const reader = new FileReader();
     reader.onload = function (e) {
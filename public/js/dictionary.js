@@ -256,6 +256,9 @@ document.addEventListener('DOMContentLoaded', function () {
         dictionary.name = dictionaryName;
 
         if (dictionary.id !== null && dictionary.id !== undefined) {
+            if (window.DICTIONARY_VERSION !== undefined) {
+                dictionary.version = window.DICTIONARY_VERSION;
+            }
             fetch(`/api/dictionary/${dictionary.id}`, {
                 method: 'PATCH',
                 headers: {
@@ -301,10 +304,25 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     });
 
+    // Все словари постранично: следующая страница запрашивается по next_cursor, пока он есть
+    function loadAllDictionaries(cursor = null, loaded = []) {
+        const params = new URLSearchParams({limit: 1000});
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        return fetch(`/api/dictionaries?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success || !data.next_cursor) {
+                    return {...data, data: loaded.concat(data.data || [])};
+                }
+                return loadAllDictionaries(data.next_cursor, loaded.concat(data.data));
+            });
+    }
+
     // Обработчик кнопки "Объединить"
     document.getElementById('addToDictionaryBtn').addEventListener('click', function () {
-        fetch('/api/dictionaries')
-            .then(response => response.json())
+        loadAllDictionaries()
             .then(data => {
                 if (data.success) {
                     // Фильтруем текущий словарь из списка (если мы в режиме редактирования)
@@ -343,15 +361,52 @@ document.addEventListener('DOMContentLoaded', function () {
         }
 
         const currentDictionaryData = getDictionaryData();
-        currentDictionaryData.name = 'dict_for_merge';
-
-        fetch(`/api/dictionary/${targetDictionaryId}/merge`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(currentDictionaryData)
-        })
+        const isSaved = currentDictionaryData.id !== null && currentDictionaryData.id !== undefined;
+
+        let merged;
+        if (isSaved) {
+            // Сохранённый словарь сливается на сервере по id, поэтому сначала сохраняем
+            // несохранённые правки редактора - иначе они пропадут вместе с исходным словарём
+            currentDictionaryData.name = document.getElementById('dictionaryName').value.trim();
+            if (!currentDictionaryData.name) {
+                alert('Введите название словаря');
+                return;
+            }
+            if (window.DICTIONARY_VERSION !== undefined) {
+                currentDictionaryData.version = window.DICTIONARY_VERSION;
+            }
+            merged = fetch(`/api/dictionary/${currentDictionaryData.id}`, {
+                method: 'PATCH',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(currentDictionaryData)
+            })
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        throw new Error('не удалось сохранить изменения словаря: ' + data.message);
+                    }
+                    return fetch(`/api/dictionary/${targetDictionaryId}/merge/dictionaries`, {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json',
+                        },
+                        body: JSON.stringify({source_ids: [Number(currentDictionaryData.id)]})
+                    });
+                });
+        } else {
+            currentDictionaryData.name = 'dict_for_merge';
+            merged = fetch(`/api/dictionary/${targetDictionaryId}/merge`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(currentDictionaryData)
+            });
+        }
+
+        merged
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
@@ -363,7 +418,7 @@ document.addEventListener('DOMContentLoaded', function () {
             })
             .catch(error => {
                 console.error('Error:', error);
-                alert('Произошла ошибка');
+                alert('Ошибка при пополнении словаря: ' + error.message);
             })
             .finally(() => {
                 const modal = bootstrap.Modal.getInstance(document.getElementById('addToDictionaryModal'));
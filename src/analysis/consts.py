@@ -1,5 +1,12 @@
 from typing import Final
 
+# Версия алгоритма анализа. Нужно увеличивать при изменениях, влияющих на результат,
+#   чтобы не отдавать устаревшие результаты из кэша
+ANALYZER_VERSION: Final[str] = '2'
+
+# Максимальная длина n-грамм при выделении словосочетаний
+DEFAULT_NGRAM_COUNT: Final[int] = 3
+
 SINGLE_WORD: Final[str] = 'однословное'
 ADJECTIVAL: Final[str] = 'адъективное'
 GENITIVE: Final[str] = 'генитивное'
@@ -0,0 +1,49 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from config import TERM_EMBEDDING_DIM
+from .tfidf import lemmatize_tokens
+
+_char_hasher = HashingVectorizer(
+    analyzer='char_wb',
+    ngram_range=(2, 4),
+    n_features=TERM_EMBEDDING_DIM,
+    alternate_sign=True,
+    norm='l2',
+    lowercase=True
+)
+
+
+def _lemma_string(text: str) -> str:
+    return ' '.join(lemma for lemma in lemmatize_tokens(text) if lemma is not None)
+
+
+def embed_text(text: str) -> Optional[List[float]]:
+    """
+    Детерминированный эмбеддинг термина без внешних моделей: хэшированные символьные
+    2-4-граммы лемм термина, нормированные по L2. Близкие по написанию леммы
+    (однокоренные слова, разные порядки слов) дают близкие векторы.
+    :return: вектор длины TERM_EMBEDDING_DIM или None, если в тексте нет слов
+    """
+    lemmas = _lemma_string(text)
+    if not lemmas:
+        return None
+    vector = _char_hasher.transform([lemmas]).toarray()[0].astype(np.float32)
+    if not vector.any():
+        return None
+    return vector.tolist()
+
+
+def embed_texts(texts: Sequence[str]) -> List[Optional[List[float]]]:
+    """То же, что embed_text, для многих терминов сразу: векторизатор вызывается один раз на всю пачку"""
+    lemma_strings = [_lemma_string(text) for text in texts]
+    matrix = _char_hasher.transform(lemma_strings).astype(np.float32).tocsr()
+    embeddings = []
+    for i, lemmas in enumerate(lemma_strings):
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        vector = np.zeros(TERM_EMBEDDING_DIM, dtype=np.float32)
+        vector[matrix.indices[start:end]] = matrix.data[start:end]
+        embeddings.append(vector.tolist() if lemmas and vector.any() else None)
+    return embeddings
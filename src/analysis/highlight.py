@@ -0,0 +1,117 @@
+import html
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from .morphology import get_morphology
+
+WORD_PATTERN = re.compile(r'\w+')
+# Между словами одной фразы допускаются только пробелы, дефисы и "лёгкие" знаки препинания
+PHRASE_GAP_PATTERN = re.compile(r'[\s\-,;:]*')
+
+
+class HighlightMatch(NamedTuple):
+    start: int
+    end: int
+    term: str
+
+
+class MultiTermHighlighter:
+    """
+    Выделение сразу нескольких терминов в тексте за один проход.
+    Термины переводятся в последовательности лемм и собираются в автомат Ахо-Корасик,
+    по тексту автомат идёт по леммам слов; лемма каждой словоформы вычисляется один раз на текст.
+    Фраза находится, если её слова идут подряд через пробелы/дефисы/запятые (как и раньше).
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.morph = get_morphology()
+        self.terms: List[str] = []
+        self._lengths: List[int] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for term in dict.fromkeys(terms):
+            lemmas = [self.morph.normal_form(word) for word in WORD_PATTERN.findall(term)]
+            if lemmas:
+                self._add(term, lemmas)
+        self._build_failure_links()
+
+    def _add(self, term: str, lemmas: List[str]) -> None:
+        node = 0
+        for lemma in lemmas:
+            child = self._goto[node].get(lemma)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][lemma] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+        self._out[node].append(len(self.terms))
+        self.terms.append(term)
+        self._lengths.append(len(lemmas))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for lemma, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and lemma not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(lemma, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[HighlightMatch]:
+        """Все вхождения терминов (в том числе пересекающиеся), по позиции начала"""
+        if not self.terms:
+            return []
+
+        lemma_of: Dict[str, str] = {}
+        words: List[Tuple[int, int]] = []
+        matches = []
+        state = 0
+        prev_end = None
+        for word_match in WORD_PATTERN.finditer(text):
+            word = word_match.group()
+            lemma = lemma_of.get(word)
+            if lemma is None:
+                lemma = lemma_of[word] = self.morph.normal_form(word)
+
+            # Фраза не продолжается через точку, скобку и т.п.
+            if prev_end is not None and not PHRASE_GAP_PATTERN.fullmatch(text, prev_end, word_match.start()):
+                state = 0
+            prev_end = word_match.end()
+            words.append(word_match.span())
+
+            while state and lemma not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(lemma, 0)
+            for term_idx in self._out[state]:
+                first_word = len(words) - self._lengths[term_idx]
+                matches.append(HighlightMatch(words[first_word][0], word_match.end(), self.terms[term_idx]))
+
+        matches.sort(key=lambda m: (m.start, -m.end))
+        return matches
+
+    def highlight(self, text: str, tag: str = 'strong') -> Tuple[str, List[HighlightMatch]]:
+        """
+        HTML с выделенными терминами (текст экранируется) и список выделенных вхождений.
+        Из пересекающихся вхождений выделяется самое левое, а из начинающихся в одном месте - самое длинное.
+        """
+        selected = []
+        for match in self.find(text):
+            if not selected or match.start >= selected[-1].end:
+                selected.append(match)
+
+        parts = []
+        position = 0
+        for match in selected:
+            parts.append(html.escape(text[position:match.start]))
+            parts.append(f'<{tag}>{html.escape(text[match.start:match.end])}</{tag}>')
+            position = match.end
+        parts.append(html.escape(text[position:]))
+        return ''.join(parts), selected
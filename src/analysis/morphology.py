@@ -0,0 +1,70 @@
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import pymorphy3
+
+from config import MORPH_CACHE_SIZE
+from src.utils.lru_cache import LRUCache
+
+
+class MorphInfo(NamedTuple):
+    normal_form: str
+    pos: str | None
+
+
+class MorphologyService:
+    """
+    Общий для всего процесса морфологический анализатор.
+    Держит один экземпляр MorphAnalyzer и кэш разборов словоформ: word -> (normal_form, POS).
+    """
+
+    def __init__(self, cache_size: int = MORPH_CACHE_SIZE):
+        self.analyzer = pymorphy3.MorphAnalyzer()
+        self._cache: LRUCache[str, MorphInfo] = LRUCache(cache_size)
+
+    def _parse_uncached(self, word: str) -> MorphInfo:
+        parsed = self.analyzer.parse(word)[0]
+        return MorphInfo(parsed.normal_form, parsed.tag.POS)
+
+    def parse(self, word: str) -> MorphInfo:
+        """Нормальная форма и часть речи наиболее вероятного разбора слова"""
+        return self._cache.get_or_compute(word, self._parse_uncached)
+
+    def normal_form(self, word: str) -> str:
+        return self.parse(word).normal_form
+
+    def pos(self, word: str) -> str | None:
+        return self.parse(word).pos
+
+    def word_forms(self, lemma: str) -> List[str]:
+        """
+        Все словоформы лексем с нормальной формой lemma (в т.ч. супплетивные: человек - люди).
+        Слово, которое лемматизируется в lemma, - одна из этих форм.
+        """
+        forms = {
+            form.word
+            for parsed in self.analyzer.parse(lemma) if parsed.normal_form == lemma
+            for form in parsed.lexeme
+        }
+        forms.add(lemma)
+        return sorted(forms)
+
+    def after_fork(self) -> None:
+        self._cache.reset_lock()
+
+    def stats(self) -> Dict[str, int | float]:
+        return self._cache.stats()
+
+
+_morphology: Optional[MorphologyService] = None
+_morphology_lock = threading.Lock()
+
+
+def get_morphology() -> MorphologyService:
+    """Возвращает общий экземпляр MorphologyService, создавая его при первом обращении"""
+    global _morphology
+    if _morphology is None:
+        with _morphology_lock:
+            if _morphology is None:
+                _morphology = MorphologyService()
+    return _morphology
@@ -0,0 +1,124 @@
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import POS_PATTERNS_FILE
+from src.analysis.consts import PATTERNS, PATTERN_DESCRIPTIONS, PATTERN_COLOR
+
+WILDCARD = '?'
+
+
+class _Node:
+    __slots__ = ('children', 'match')
+
+    def __init__(self):
+        self.children: Dict[str, _Node] = {}
+        # (приоритет, тип шаблона) - меньший приоритет выигрывает, как порядок в PATTERNS
+        self.match: Optional[Tuple[int, str]] = None
+
+
+def flatten_pattern(pattern: Sequence) -> Tuple[str, ...]:
+    """Раскрывает вложенные группы: ('Н', ('П', 'С')) -> ('Н', 'П', 'С')"""
+    flat = []
+    for item in pattern:
+        if isinstance(item, (tuple, list)):
+            flat.extend(flatten_pattern(item))
+        else:
+            flat.append(item)
+    return tuple(flat)
+
+
+class PatternMatcher:
+    """
+    Таблица POS-шаблонов, скомпилированная в префиксное дерево по тегам.
+    Ветка '?' в шаблоне совпадает с любым тегом; вложенные группы раскрываются при компиляции.
+    Классификация занимает O(длина фразы), а результат для каждой последовательности тегов запоминается.
+    """
+
+    def __init__(self, patterns: Dict[str, List[Sequence]]):
+        self._root = _Node()
+        self._memo: Dict[Tuple[str, ...], str | None] = {}
+        self.max_length = 0
+        # Отпечаток таблицы шаблонов: меняется при подключении других пользовательских шаблонов
+        self.fingerprint = hashlib.md5(
+            json.dumps(
+                [(t, [flatten_pattern(p) for p in ps]) for t, ps in patterns.items()],
+                ensure_ascii=False
+            ).encode('utf-8')
+        ).hexdigest()[:8]
+
+        priority = 0
+        for pattern_type, type_patterns in patterns.items():
+            for pattern in type_patterns:
+                self._add(flatten_pattern(pattern), priority, pattern_type)
+                priority += 1
+
+    def _add(self, tags: Tuple[str, ...], priority: int, pattern_type: str):
+        node = self._root
+        for tag in tags:
+            node = node.children.setdefault(tag, _Node())
+        if node.match is None or node.match[0] > priority:
+            node.match = (priority, pattern_type)
+        self.max_length = max(self.max_length, len(tags))
+
+    def match(self, pos_pattern: Iterable[str]) -> str | None:
+        """Возвращает тип первого (по порядку объявления) подходящего шаблона или None"""
+        key = tuple(pos_pattern)
+        if key in self._memo:
+            return self._memo[key]
+
+        nodes = [self._root]
+        for tag in key:
+            next_nodes = []
+            for node in nodes:
+                child = node.children.get(tag)
+                if child is not None:
+                    next_nodes.append(child)
+                if tag != WILDCARD:
+                    child = node.children.get(WILDCARD)
+                    if child is not None:
+                        next_nodes.append(child)
+            nodes = next_nodes
+            if not nodes:
+                break
+
+        matches = [node.match for node in nodes if node.match is not None]
+        result = min(matches)[1] if matches else None
+        self._memo[key] = result
+        return result
+
+
+def load_patterns_file(path: str) -> Dict[str, dict]:
+    """
+    Загружает пользовательские шаблоны из JSON вида:
+    {"тип": {"patterns": [["П", "П", "П", "С"]], "description": "...", "color": "..."}}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError(f"POS patterns file {path} must contain a JSON object")
+    for pattern_type, entry in data.items():
+        if not isinstance(entry, dict) or not isinstance(entry.get('patterns'), list):
+            raise ValueError(f"POS pattern '{pattern_type}' in {path} must have a 'patterns' list")
+    return data
+
+
+def build_pattern_table(extra: Optional[Dict[str, dict]] = None) -> Dict[str, List[Sequence]]:
+    """
+    Объединяет встроенные PATTERNS с пользовательскими шаблонами.
+    Описания и цвета новых типов добавляются в PATTERN_DESCRIPTIONS и PATTERN_COLOR.
+    """
+    table = {pattern_type: list(patterns) for pattern_type, patterns in PATTERNS.items()}
+    for pattern_type, entry in (extra or {}).items():
+        table.setdefault(pattern_type, []).extend(flatten_pattern(p) for p in entry['patterns'])
+        if 'description' in entry:
+            PATTERN_DESCRIPTIONS.setdefault(pattern_type, entry['description'])
+        if 'color' in entry:
+            PATTERN_COLOR.setdefault(pattern_type, entry['color'])
+    return table
+
+
+PATTERN_MATCHER = PatternMatcher(
+    build_pattern_table(load_patterns_file(POS_PATTERNS_FILE) if POS_PATTERNS_FILE else None)
+)
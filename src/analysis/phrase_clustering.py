@@ -0,0 +1,111 @@
+import zlib
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Sequence
+
+import numpy as np
+
+from .tfidf import lemmatize_tokens
+
+# Модуль 2^61 - 1 (простое число Мерсенна): для x < 2^32 и a, b < 2^31 значение a * x + b
+# помещается в uint64 без переполнения
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+def phrase_features(phrase: str) -> FrozenSet[str]:
+    """
+    Множество лемм слов фразы. Части слов через дефис считаются отдельными словами,
+    поэтому "северо-западный" и "северо западный" дают одно множество.
+    """
+    return frozenset(
+        part
+        for lemma in lemmatize_tokens(phrase) if lemma is not None
+        for part in lemma.split('-') if part
+    )
+
+
+class MinHashLSH:
+    """
+    Поиск почти-дубликатов среди множеств признаков за линейное время.
+    Для каждого множества считается MinHash-сигнатура из bands * rows хэш-функций,
+    сигнатура режется на bands полос; множества с совпавшей хотя бы одной полосой - кандидаты.
+    Порог, с которого пары становятся кандидатами с вероятностью ~1/2, - (1 / bands) ^ (1 / rows).
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 4, seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, feature_sets: Sequence[FrozenSet[str]]) -> np.ndarray:
+        """MinHash-сигнатуры (строка на множество); у пустого множества сигнатура из максимумов"""
+        num_perm = self.bands * self.rows
+        signatures = np.full((len(feature_sets), num_perm), _MERSENNE_PRIME, dtype=np.uint64)
+
+        owners, hashes = [], []
+        for i, features in enumerate(feature_sets):
+            for feature in features:
+                owners.append(i)
+                hashes.append(zlib.crc32(feature.encode('utf-8')))
+        if not hashes:
+            return signatures
+
+        values = (np.array(hashes, dtype=np.uint64)[:, None] * self._a + self._b) % _MERSENNE_PRIME
+        # owners идут по возрастанию, поэтому минимум по каждому множеству - reduceat по началам групп
+        owners = np.array(owners)
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        signatures[owners[starts]] = np.minimum.reduceat(values, starts, axis=0)
+        return signatures
+
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Ключи корзин LSH для сигнатуры - по одному на полосу (номер полосы входит в ключ)"""
+        return [
+            band.to_bytes(2, 'little') + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def cluster_phrases(phrases: Sequence[str], threshold: float = 0.5, lsh: MinHashLSH | None = None) -> List[List[int]]:
+    """
+    Группировка почти-дубликатов фраз (пересекающиеся n-граммы, варианты написания через дефис,
+    одно главное слово с разными зависимыми) по сходству Жаккара множеств лемм.
+    Фразы обходятся по порядку (ожидается сортировка по убыванию TF-IDF): фраза присоединяется
+    к самому похожему представителю кластера из своих корзин LSH, а если такого нет - сама
+    становится представителем. Сравнения идут только с представителями из общих корзин, поэтому
+    время линейно по числу фраз, а сравнение с представителем (а не с любым членом кластера)
+    не даёт кластерам расползаться по цепочкам "война" - "война мир" - "мир".
+    :param threshold: минимальное сходство Жаккара фразы и представителя кластера
+    :return: кластеры - списки индексов фраз по возрастанию; первый индекс - представитель кластера
+    """
+    if lsh is None:
+        lsh = MinHashLSH()
+    feature_sets = [phrase_features(phrase) for phrase in phrases]
+    signatures = lsh.signatures(feature_sets)
+
+    # Ключ корзины -> представители кластеров, попавшие в эту корзину
+    buckets: Dict[bytes, List[int]] = defaultdict(list)
+    clusters: Dict[int, List[int]] = {}
+    for i, features in enumerate(feature_sets):
+        keys = lsh.band_keys(signatures[i]) if features else []
+        best, best_similarity = None, threshold
+        for representative in dict.fromkeys(r for key in keys for r in buckets.get(key, ())):
+            similarity = jaccard(features, feature_sets[representative])
+            if similarity > best_similarity or (similarity == best_similarity and best is None):
+                best, best_similarity = representative, similarity
+
+        if best is None:
+            clusters[i] = [i]
+            for key in keys:
+                buckets[key].append(i)
+        else:
+            clusters[best].append(i)
+
+    return list(clusters.values())
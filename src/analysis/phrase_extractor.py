@@ -1,58 +1,87 @@
-from typing import Dict
-
-import pymorphy3
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
+from config import ANALYSIS_SHARD_SIZE, PHRASE_CLUSTER_THRESHOLD, TFIDF_HASH_BUCKETS
 from .consts import *
-from .tfidf import extract_top_ngrams_with_tfidf
-from .utils import match_complex_pattern
+from .morphology import get_morphology
+from .phrase_clustering import cluster_phrases
+from .patterns import PATTERN_MATCHER
+from .tfidf import (
+    extract_top_phrases_hashed,
+    extract_top_phrases_with_tfidf,
+    extract_top_phrases_from_stream,
+    iter_sentence_blocks,
+)
 
 
 class PhraseExtractor:
     def __init__(self):
-        self.morph = pymorphy3.MorphAnalyzer()
+        self.morph = get_morphology()
 
-    def __get_pos(self, word: str) -> str | None:
-        """Определение части речи с обработкой исключений"""
-        parsed = self.morph.parse(word)[0]
-        return parsed.tag.POS
+    def analyze_text_with_stats(
+            self,
+            text: str,
+            executor: Optional[Executor] = None,
+            hash_buckets: int = TFIDF_HASH_BUCKETS
+    ) -> Dict:
+        """
+        Выделение словосочетаний со статистикой.
+        :param executor: пул для параллельного подсчёта n-грамм по кускам большого текста
+        :param hash_buckets: кол-во корзин хэширующего режима (0 - точный подсчёт)
+        """
+        ngram_count = max(DEFAULT_NGRAM_COUNT, PATTERN_MATCHER.max_length)
+        if hash_buckets:
+            # Текст всегда режется на блоки (как и поток): иначе без пула весь текст лемматизировался бы
+            # одним куском, и его токены и n-граммы держались бы в памяти целиком
+            def open_blocks() -> Iterable[str]:
+                return iter_sentence_blocks([text], ANALYSIS_SHARD_SIZE)
+            return self.__analyze_hashed(open_blocks, ngram_count, hash_buckets, executor)
 
-    def __normalize_word(self, word: str) -> str:
-        """Нормализация слова с обработкой исключений"""
-        parsed = self.morph.parse(word)[0]
-        return parsed.normal_form
+        # Шаги 1-2: Извлекаем топ-n n-грамм по TF-IDF, сразу отсекая не подходящие под POS-шаблоны
+        top_phrases = extract_top_phrases_with_tfidf(text, ngram_count=ngram_count, executor=executor)
+        return self.__build_stats(top_phrases)
 
-    def __check_phrase_pattern(self, phrase: str) -> str | None:
+    def analyze_stream_with_stats(
+            self,
+            open_chunks: Callable[[], Iterable[str]],
+            executor: Optional[Executor] = None,
+            hash_buckets: int = TFIDF_HASH_BUCKETS
+    ) -> Dict:
         """
-        Проверяет, соответствует ли фраза одному из POS-шаблонов.
-        Возвращает тип шаблона или None.
+        Выделение словосочетаний для текста, читаемого по кускам (например, из большого файла).
+        Результат совпадает с analyze_text_with_stats для того же текста целиком.
+        :param open_chunks: функция, открывающая поток кусков текста (хэширующий режим читает его дважды)
         """
-        words = phrase.split()
-        pos_tags = [self.__get_pos(word) for word in words]
-        pos_pattern = [POS_TAGS.get(tag, '?') for tag in pos_tags]
+        ngram_count = max(DEFAULT_NGRAM_COUNT, PATTERN_MATCHER.max_length)
+        if hash_buckets:
+            def open_blocks() -> Iterable[str]:
+                return iter_sentence_blocks(open_chunks(), ANALYSIS_SHARD_SIZE)
+            return self.__analyze_hashed(open_blocks, ngram_count, hash_buckets, executor)
 
-        for pattern_type, patterns in PATTERNS.items():
-            for pattern in patterns:
-                if isinstance(pattern, tuple):
-                    if len(pos_pattern) == len(pattern) and all(
-                            p == w or p == '?' for p, w in zip(pattern, pos_pattern)
-                    ):
-                        return pattern_type
-                else:
-                    if match_complex_pattern(pos_pattern, pattern):
-                        return pattern_type
-        return None
+        top_phrases = extract_top_phrases_from_stream(open_chunks(), ngram_count=ngram_count, executor=executor)
+        return self.__build_stats(top_phrases)
 
-    def analyze_text_with_stats(self, text: str) -> Dict:
-        # Шаг 1: Извлекаем топ-n n-грамм по TF-IDF
-        top_ngrams = extract_top_ngrams_with_tfidf(text)
+    def __analyze_hashed(
+            self,
+            open_blocks: Callable[[], Iterable[str]],
+            ngram_count: int,
+            hash_buckets: int,
+            executor: Optional[Executor]
+    ) -> Dict:
+        top_phrases, hashing_stats = extract_top_phrases_hashed(
+            open_blocks,
+            ngram_count=ngram_count,
+            n_buckets=hash_buckets,
+            executor=executor
+        )
+        result = self.__build_stats(top_phrases)
+        result['hashing'] = hashing_stats
+        return result
 
-        # Шаг 2: Фильтруем их по POS-шаблонам
+    @staticmethod
+    def __build_stats(top_phrases: List[Tuple[str, float, str]]) -> Dict:
         phrase_stats = []
-        for phrase, tfidf in top_ngrams:
-            pattern_type = self.__check_phrase_pattern(phrase)
-            if not pattern_type:
-                continue
-
+        for phrase, tfidf, pattern_type in top_phrases:
             phrase_stats.append({
                 'phrase': phrase,
                 'type': pattern_type,
@@ -70,6 +99,35 @@ class PhraseExtractor:
             'unique_phrase_types': len({p['type'] for p in phrase_stats})
         }
 
+    @staticmethod
+    def cluster_analysis_result(result: Dict, threshold: float = PHRASE_CLUSTER_THRESHOLD) -> Dict:
+        """
+        Необязательный этап после анализа: почти-дубликаты фраз сворачиваются в кластеры (MinHash/LSH).
+        В phrases остаются представители кластеров (фраза с наибольшим TF-IDF), остальные фразы
+        кластера (только текст) - в members представителя. Исходный результат не изменяется.
+        """
+        phrases = result['phrases']
+        clusters = cluster_phrases([p['phrase'] for p in phrases], threshold)
+
+        representatives = []
+        for cluster in clusters:
+            representative = dict(phrases[cluster[0]])
+            representative['cluster_size'] = len(cluster)
+            representative['members'] = [phrases[i]['phrase'] for i in cluster[1:]]
+            representatives.append(representative)
+
+        return {
+            **result,
+            'phrases': representatives,
+            'total_phrases': len(representatives),
+            'clustering': {
+                'threshold': threshold,
+                'source_phrases': len(phrases),
+                'clusters': len(representatives),
+                'merged_phrases': len(phrases) - len(representatives),
+            }
+        }
+
     def get_head_noun_lemma(self, phrase: str) -> str:
         """
         Ищет последнее слово с тегом NOUN, возвращает его нормальную форму.
@@ -77,7 +135,7 @@ class PhraseExtractor:
         """
         words = phrase.split()
         for word in reversed(words):
-            parsed = self.morph.parse(word)[0]
-            if parsed.tag.POS == 'NOUN':
-                return parsed.normal_form
+            normal_form, pos = self.morph.parse(word)
+            if pos == 'NOUN':
+                return normal_form
         return ''
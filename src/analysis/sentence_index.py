@@ -0,0 +1,78 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from .consts import ANALYZER_VERSION
+from .tfidf import SENTENCE_BOUNDARY_PATTERN, iter_lemma_ngrams
+
+
+class SentenceIndex:
+    """
+    Инвертированный индекс предложений одного документа.
+    Хранит предложения документа и списки предложений (posting lists)
+    для каждой лемматизированной 1..ngram_count-граммы.
+    Поиск предложений с термином - пересечение списков его n-грамм, без повторной лемматизации текста
+    и без обращения к самому документу.
+    """
+
+    # Версия формата сохранённого индекса (индексы предыдущих форматов строятся заново)
+    FORMAT_VERSION = 2
+
+    def __init__(self, text: str, ngram_count: int = 3):
+        self.version = ANALYZER_VERSION
+        self.format_version = self.FORMAT_VERSION
+        # Метка данных, по которым построен индекс (ставит и сверяет реестр индексов)
+        self.source = None
+        self.ngram_count = ngram_count
+        self.sentences: List[str] = []
+        # Кол-во n-грамм в предложении: при равных условиях короткие предложения выше
+        self.lengths: List[int] = []
+        postings: Dict[str, List[int]] = defaultdict(list)
+
+        for start, end in self._split_sentences(text):
+            sentence_id = len(self.sentences)
+            sentence = text[start:end]
+            ngrams = set(iter_lemma_ngrams(sentence, ngram_count))
+            for ngram in ngrams:
+                postings[ngram].append(sentence_id)
+            self.sentences.append(sentence)
+            self.lengths.append(len(ngrams))
+        self.postings = dict(postings)
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    @staticmethod
+    def _split_sentences(text: str) -> List[Tuple[int, int]]:
+        """Границы предложений без окружающих пробелов - то же деление, что в search_sentences_in_text_with_tfidf"""
+        spans = []
+        start = 0
+        for match in [*SENTENCE_BOUNDARY_PATTERN.finditer(text), None]:
+            end = match.start() if match is not None else len(text)
+            sentence = text[start:end]
+            stripped = sentence.strip()
+            if stripped:
+                offset = start + len(sentence) - len(sentence.lstrip())
+                spans.append((offset, offset + len(stripped)))
+            if match is not None:
+                start = match.end()
+        return spans
+
+    def find(self, query: str, top_k: int = 3) -> List[int]:
+        """
+        Предложения, содержащие все самые длинные лемматизированные n-граммы запроса.
+        :return: id предложений (см. sentences), сначала самые короткие
+        """
+        ngrams = list(iter_lemma_ngrams(query, self.ngram_count))
+        if not ngrams:
+            return []
+        longest = max(ngram.count(' ') for ngram in ngrams)
+        keys = {ngram for ngram in ngrams if ngram.count(' ') == longest}
+
+        posting_lists = sorted((self.postings.get(key, []) for key in keys), key=len)
+        found = set(posting_lists[0])
+        for posting_list in posting_lists[1:]:
+            if not found:
+                break
+            found.intersection_update(posting_list)
+
+        return sorted(found, key=lambda sentence_id: (self.lengths[sentence_id], sentence_id))[:top_k]
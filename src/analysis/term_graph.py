@@ -0,0 +1,114 @@
+from enum import Enum
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+
+class GraphDirection(str, Enum):
+    outgoing = 'out'
+    incoming = 'in'
+    both = 'both'
+
+
+class TermGraph:
+    """
+    Граф связей терминов одного словаря в CSR-представлении (scipy.sparse):
+    для каждой вершины рёбра лежат подряд, поэтому обход соседей не требует поиска по списку связей.
+    Вершины - термины, участвующие хотя бы в одной связи; id терминов переводятся в номера строк
+    двоичным поиском по отсортированному массиву nodes.
+    Обходы, компоненты связности и сильно связные компоненты (циклы) считаются scipy.sparse.csgraph
+    за линейное время от числа вершин и рёбер.
+    """
+
+    def __init__(self, edges: Iterable[Tuple[int, int]]):
+        edges = np.array(list(edges), dtype=np.int64).reshape(-1, 2)
+        self.nodes = np.unique(edges)
+        rows = np.searchsorted(self.nodes, edges[:, 0])
+        cols = np.searchsorted(self.nodes, edges[:, 1])
+        size = len(self.nodes)
+
+        adjacency = sparse.csr_matrix((np.ones(len(edges), dtype=np.int8), (rows, cols)), shape=(size, size))
+        # Повторные связи между одной парой терминов схлопываются в одно ребро
+        adjacency.data[:] = 1
+        self._adjacency = {
+            GraphDirection.outgoing: adjacency,
+            GraphDirection.incoming: adjacency.T.tocsr(),
+            GraphDirection.both: (adjacency + adjacency.T).tocsr(),
+        }
+        self.edge_count = adjacency.nnz
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _node(self, term_id: int) -> Optional[int]:
+        node = int(np.searchsorted(self.nodes, term_id))
+        if node < len(self.nodes) and self.nodes[node] == term_id:
+            return node
+        return None
+
+    def neighbours(self, term_id: int, direction: GraphDirection = GraphDirection.both) -> List[int]:
+        """Непосредственно связанные термины (по возрастанию id)"""
+        node = self._node(term_id)
+        if node is None:
+            return []
+        adjacency = self._adjacency[direction]
+        return self.nodes[adjacency.indices[adjacency.indptr[node]:adjacency.indptr[node + 1]]].tolist()
+
+    def reachable(
+            self,
+            term_id: int,
+            direction: GraphDirection = GraphDirection.outgoing,
+            max_depth: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        Транзитивное замыкание: термины, достижимые из term_id (сам термин не входит).
+        :return: [(id термина, длина кратчайшего пути), ...] в порядке обхода в ширину
+        """
+        node = self._node(term_id)
+        if node is None:
+            return []
+
+        order, predecessors = csgraph.breadth_first_order(
+            self._adjacency[direction], node, directed=True, return_predecessors=True
+        )
+        # В порядке обхода в ширину предшественник вершины всегда встречается раньше неё
+        depth = np.zeros(len(self.nodes), dtype=np.int64)
+        reached = []
+        for current in order[1:]:
+            depth[current] = depth[predecessors[current]] + 1
+            if max_depth is not None and depth[current] > max_depth:
+                break
+            reached.append((int(self.nodes[current]), int(depth[current])))
+        return reached
+
+    def components(self) -> List[List[int]]:
+        """Компоненты связности без учёта направления связей, от больших к меньшим"""
+        if not len(self.nodes):
+            return []
+        return self._group(*csgraph.connected_components(self._adjacency[GraphDirection.outgoing], directed=False))
+
+    def cycles(self) -> List[List[int]]:
+        """
+        Группы терминов, лежащих на циклах: сильно связные компоненты из нескольких терминов
+        и термины, связанные сами с собой. Пустой список - граф ацикличен.
+        """
+        if not len(self.nodes):
+            return []
+        adjacency = self._adjacency[GraphDirection.outgoing]
+        count, labels = csgraph.connected_components(adjacency, directed=True, connection='strong')
+        self_loops = adjacency.diagonal().astype(bool)
+        sizes = np.bincount(labels, minlength=count)
+        on_cycle = (sizes[labels] > 1) | self_loops
+        return self._group(count, np.where(on_cycle, labels, -1))
+
+    def _group(self, count: int, labels: np.ndarray) -> List[List[int]]:
+        """Термины по меткам компонент (метка -1 - вершина не входит ни в одну группу)"""
+        groups = [[] for _ in range(count)]
+        for node, label in enumerate(labels):
+            if label >= 0:
+                groups[label].append(int(self.nodes[node]))
+        groups = [group for group in groups if group]
+        groups.sort(key=lambda group: (-len(group), group[0]))
+        return groups
@@ -0,0 +1,127 @@
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from .consts import ANALYZER_VERSION, DEFAULT_NGRAM_COUNT
+from .tfidf import iter_lemma_ngrams
+
+
+def count_term_ngrams(text: str, ngram_count: int = DEFAULT_NGRAM_COUNT) -> Counter:
+    """Счётчик лемматизированных n-грамм термина или запроса"""
+    return Counter(iter_lemma_ngrams(text, ngram_count))
+
+
+class TermIndex:
+    """
+    TF-IDF индекс терминов одного словаря для поиска терминов, похожих на запрос.
+    Хранит словарь n-грамм, IDF и нормированную по L2 разреженную матрицу терминов,
+    а также лемматизированные n-граммы каждого термина: при обновлении заново
+    лемматизируются только новые и изменённые термины.
+    Веса считаются так же, как в TfidfVectorizer (smooth_idf, norm='l2'), но IDF
+    берётся только по терминам словаря - запрос в него не входит.
+    """
+
+    def __init__(self, ngram_count: int = DEFAULT_NGRAM_COUNT):
+        self.ngram_count = ngram_count
+        self.version = ANALYZER_VERSION
+        # Метка данных, по которым построен индекс (ставит и сверяет реестр индексов)
+        self.source = None
+        self.term_ids: List[int] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(0)
+        self.matrix = sparse.csr_matrix((0, 0))
+        # term_id -> (текст термина, счётчик его лемматизированных n-грамм)
+        self._terms: Dict[int, Tuple[str, Counter]] = {}
+
+    def __len__(self) -> int:
+        return len(self.term_ids)
+
+    def update(self, terms: Iterable[Tuple[int, str]]) -> bool:
+        """
+        Приводит индекс к переданному набору терминов.
+        :param terms: актуальные термины словаря [(id, текст), ...]
+        :return: изменился ли индекс
+        """
+        terms_state = {}
+        changed = False
+        for term_id, text in terms:
+            cached = self._terms.get(term_id)
+            if cached is not None and cached[0] == text:
+                terms_state[term_id] = cached
+            else:
+                terms_state[term_id] = (text, count_term_ngrams(text, self.ngram_count))
+                changed = True
+
+        changed = changed or len(terms_state) != len(self._terms)
+        self._terms = terms_state
+        if changed:
+            self._rebuild()
+        return changed
+
+    def _rebuild(self) -> None:
+        """Пересчёт словаря, IDF и матрицы по уже лемматизированным терминам"""
+        self.term_ids = sorted(self._terms)
+
+        document_frequency = Counter()
+        for term_id in self.term_ids:
+            document_frequency.update(self._terms[term_id][1].keys())
+        features = sorted(document_frequency)
+        self.vocabulary = {feature: i for i, feature in enumerate(features)}
+
+        df = np.fromiter((document_frequency[f] for f in features), dtype=np.float64, count=len(features))
+        self.idf = np.log((1 + len(self.term_ids)) / (1 + df)) + 1
+
+        rows, cols, values = [], [], []
+        for row, term_id in enumerate(self.term_ids):
+            for feature, count in self._terms[term_id][1].items():
+                rows.append(row)
+                cols.append(self.vocabulary[feature])
+                values.append(count)
+        matrix = sparse.csr_matrix(
+            (np.array(values, dtype=np.float64), (rows, cols)),
+            shape=(len(self.term_ids), len(features))
+        )
+        # Поиск выбирает столбцы n-грамм запроса, поэтому матрица хранится по столбцам
+        self.matrix = normalize(matrix.multiply(self.idf).tocsr()).tocsc()
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[int, float]]:
+        """
+        Термины, наиболее похожие на запрос (косинусная схожесть TF-IDF векторов).
+        :return: [(id термина, схожесть), ...] по убыванию схожести, только с ненулевой схожестью
+        """
+        return self.search_ngrams(count_term_ngrams(query, self.ngram_count), top_k)
+
+    def search_ngrams(self, query_ngrams: Counter, top_k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        То же, что search, но по уже посчитанным n-граммам запроса (см. count_term_ngrams) -
+        чтобы не лемматизировать запрос заново для каждого словаря.
+        При равной схожести термины упорядочены по id; top_k=None - все термины с ненулевой схожестью.
+        """
+        if not self.term_ids:
+            return []
+
+        # n-граммы запроса, которых нет в словаре, не влияют на схожесть, но входят в норму запроса
+        unknown_idf = math.log(1 + len(self.term_ids)) + 1
+        cols, values = [], []
+        unknown_norm = 0.0
+        for feature, count in query_ngrams.items():
+            col = self.vocabulary.get(feature)
+            if col is None:
+                unknown_norm += (count * unknown_idf) ** 2
+            else:
+                cols.append(col)
+                values.append(count * self.idf[col])
+        if not cols:
+            return []
+
+        query_vector = np.array(values)
+        query_vector /= math.sqrt(float(query_vector @ query_vector) + unknown_norm)
+        similarities = self.matrix[:, cols] @ query_vector
+
+        (candidates,) = np.nonzero(similarities > 0)
+        top_idx = candidates[np.argsort(-similarities[candidates], kind='stable')][:top_k]
+        return [(self.term_ids[i], float(similarities[i])) for i in top_idx]
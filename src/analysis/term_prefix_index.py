@@ -0,0 +1,134 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Tuple
+
+from .consts import ANALYZER_VERSION
+from .tfidf import WORD_TOKEN_PATTERN, lemmatize_tokens
+
+
+def normalize_prefix(text: str) -> str:
+    """Слова текста в нижнем регистре через один пробел - так хранятся ключи индекса"""
+    return ' '.join(WORD_TOKEN_PATTERN.findall(text.lower()))
+
+
+def _word_suffixes(words: List[str]) -> List[str]:
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class TermPrefixIndex:
+    """
+    Индекс терминов одного словаря для автодополнения по префиксу.
+    Ключи - текст термина и его леммы в нижнем регистре, а также их окончания с каждого
+    следующего слова ("деревня девочка" находится и по "дев"). Ключи лежат в отсортированном
+    массиве, поэтому поиск по префиксу - двоичный поиск начала диапазона и проход по нему.
+    Совпадения с начала термина идут раньше совпадений с середины.
+    При обновлении удаляются и вставляются ключи только изменившихся терминов.
+    """
+
+    # Версия формата сохранённого индекса (индексы предыдущих форматов строятся заново)
+    FORMAT_VERSION = 1
+    # Если изменилась большая доля терминов, массивы выгоднее пересобрать целиком
+    REBUILD_RATIO = 0.1
+
+    def __init__(self):
+        self.version = ANALYZER_VERSION
+        self.format_version = self.FORMAT_VERSION
+        # Метка данных, по которым построен индекс (ставит и сверяет реестр индексов)
+        self.source = None
+        # Отсортированные ключи и id терминов на тех же позициях: с начала термина и с середины
+        self._start_keys: List[str] = []
+        self._start_ids: List[int] = []
+        self._inner_keys: List[str] = []
+        self._inner_ids: List[int] = []
+        # term_id -> (текст термина, ключи с начала, ключи с середины)
+        self._terms: Dict[int, Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    @staticmethod
+    def _make_keys(text: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        words = WORD_TOKEN_PATTERN.findall(text.lower())
+        lemmas = [lemma for lemma in lemmatize_tokens(text) if lemma is not None]
+        start_keys = dict.fromkeys(key for key in (' '.join(words), ' '.join(lemmas)) if key)
+        inner_keys = dict.fromkeys(
+            key for key in _word_suffixes(words)[1:] + _word_suffixes(lemmas)[1:] if key not in start_keys
+        )
+        return tuple(start_keys), tuple(inner_keys)
+
+    def update(self, terms: Iterable[Tuple[int, str]]) -> bool:
+        """
+        Приводит индекс к переданному набору терминов.
+        :param terms: актуальные термины словаря [(id, текст), ...]
+        :return: изменился ли индекс
+        """
+        terms = dict(terms)
+        removed = {term_id for term_id, state in self._terms.items() if terms.get(term_id) != state[0]}
+        added = [term_id for term_id, text in terms.items() if term_id not in self._terms or term_id in removed]
+        if not removed and not added:
+            return False
+
+        if len(removed) + len(added) > self.REBUILD_RATIO * max(len(self._terms), len(terms)):
+            for term_id in removed:
+                del self._terms[term_id]
+            for term_id in added:
+                self._terms[term_id] = (terms[term_id], *self._make_keys(terms[term_id]))
+            self._rebuild()
+            return True
+
+        for term_id in removed:
+            _, start_keys, inner_keys = self._terms.pop(term_id)
+            self._remove(self._start_keys, self._start_ids, start_keys, term_id)
+            self._remove(self._inner_keys, self._inner_ids, inner_keys, term_id)
+        for term_id in added:
+            text = terms[term_id]
+            start_keys, inner_keys = self._make_keys(text)
+            self._terms[term_id] = (text, start_keys, inner_keys)
+            self._insert(self._start_keys, self._start_ids, start_keys, term_id)
+            self._insert(self._inner_keys, self._inner_ids, inner_keys, term_id)
+        return True
+
+    def _rebuild(self) -> None:
+        start = sorted((key, term_id) for term_id, (_, keys, _) in self._terms.items() for key in keys)
+        inner = sorted((key, term_id) for term_id, (_, _, keys) in self._terms.items() for key in keys)
+        self._start_keys = [key for key, _ in start]
+        self._start_ids = [term_id for _, term_id in start]
+        self._inner_keys = [key for key, _ in inner]
+        self._inner_ids = [term_id for _, term_id in inner]
+
+    @staticmethod
+    def _insert(keys: List[str], ids: List[int], new_keys: Iterable[str], term_id: int) -> None:
+        for key in new_keys:
+            # Среди равных ключей id тоже упорядочены
+            pos = bisect_left(keys, key)
+            end = bisect_right(keys, key, pos)
+            pos += bisect_left(ids[pos:end], term_id)
+            keys.insert(pos, key)
+            ids.insert(pos, term_id)
+
+    @staticmethod
+    def _remove(keys: List[str], ids: List[int], old_keys: Iterable[str], term_id: int) -> None:
+        for key in old_keys:
+            pos = bisect_left(keys, key)
+            end = bisect_right(keys, key, pos)
+            pos += bisect_left(ids[pos:end], term_id)
+            del keys[pos]
+            del ids[pos]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """
+        Термины, текст или леммы которых (целиком или с какого-либо слова) начинаются с prefix.
+        :return: [(id термина, текст), ...] - сначала совпадения с начала термина, внутри - по алфавиту ключа
+        """
+        prefix = normalize_prefix(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        found: Dict[int, str] = {}
+        for keys, ids in ((self._start_keys, self._start_ids), (self._inner_keys, self._inner_ids)):
+            pos = bisect_left(keys, prefix)
+            while pos < len(keys) and len(found) < limit and keys[pos].startswith(prefix):
+                term_id = ids[pos]
+                if term_id not in found:
+                    found[term_id] = self._terms[term_id][0]
+                pos += 1
+        return list(found.items())
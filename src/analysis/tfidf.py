@@ -1,39 +1,84 @@
+import math
 import re
+from collections import Counter
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
 from functools import partial
-from typing import List, Tuple
-from pymorphy3 import MorphAnalyzer
-from sklearn.feature_extraction.text import TfidfVectorizer
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
-from src.analysis.utils import html_highlight_phrase_in_sentence
+from config import ANALYSIS_SHARD_SIZE
+from src.analysis.consts import POS_TAGS
+from src.analysis.morphology import get_morphology
+from src.analysis.utils import classify_pos_pattern, html_highlight_phrase_in_sentence
 from src.database.models import Term
 
 
-def lemma_analyzer_with_numbers(text: str, max_n: int) -> List[str]:
-    morph = MorphAnalyzer()
+TOKEN_PATTERN = re.compile(
+    r"[A-Za-zА-Яа-яёЁ0-9]{2,}(?:-[A-Za-zА-Яа-яёЁ0-9]{2,})*|[^\w\s]",
+    flags=re.UNICODE
+)
+WORD_TOKEN_PATTERN = re.compile(r"[A-Za-zА-Яа-яёЁ0-9-]+")
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?<=[.!?])\s+')
+LAST_WHITESPACE_PATTERN = re.compile(r'.*\s', flags=re.DOTALL)
+
+
+def lemmatize_tokens(text: str) -> List[str | None]:
+    """
+    Токенизирует текст и лемматизирует каждую позицию ровно один раз.
+    Вместо знаков препинания (разрывов n-грамм) в результате стоит None.
+    """
+    morph = get_morphology()
+
+    lemmas = []
+    for tok in TOKEN_PATTERN.findall(text):
+        if not WORD_TOKEN_PATTERN.fullmatch(tok):
+            lemmas.append(None)
+        elif '-' in tok:
+            lemmas.append('-'.join(morph.normal_form(p) for p in tok.split('-')))
+        else:
+            lemmas.append(morph.normal_form(tok))
+    return lemmas
+
+
+def tag_lemmas(lemmas: Sequence[str | None]) -> List[str | None]:
+    """
+    POS-теги (в обозначениях POS_TAGS) для лемм из lemmatize_tokens.
+    Тег берётся по самой лемме - так же, как раньше его определял фильтр по шаблонам.
+    """
+    morph = get_morphology()
+    return [
+        POS_TAGS.get(morph.pos(lemma), '?') if lemma is not None else None
+        for lemma in lemmas
+    ]
+
+
+def _word_runs(lemmas: Sequence[str | None]) -> List[int]:
+    """run[i] - кол-во подряд идущих слов (без знаков препинания), начиная с позиции i"""
+    run = [0] * (len(lemmas) + 1)
+    for i in range(len(lemmas) - 1, -1, -1):
+        run[i] = run[i + 1] + 1 if lemmas[i] is not None else 0
+    return run
+
+
+def iter_lemma_ngrams(text: str, max_n: int) -> Iterator[str]:
+    """
+    Генератор лемматизированных 1..max_n-грамм текста, не пересекающих знаки препинания.
+    Порядок выдачи совпадает с lemma_analyzer_with_numbers: сначала все униграммы, затем биграммы и т.д.
+    """
+    lemmas = lemmatize_tokens(text)
+    run = _word_runs(lemmas)
 
-    tokens = re.findall(
-        r"[A-Za-zА-Яа-яёЁ0-9]{2,}(?:-[A-Za-zА-Яа-яёЁ0-9]{2,})*|[^\w\s]",
-        text,
-        flags=re.UNICODE
-    )
-    ngrams = []
     for n in range(1, max_n + 1):
-        for i in range(len(tokens) - n + 1):
-            window = tokens[i:i + n]
-            if all(re.fullmatch(r"[A-Za-zА-Яа-яёЁ0-9-]+", tok) for tok in window):
-                lemmas = []
-                for tok in window:
-                    if '-' in tok:
-                        parts = tok.split('-')
-                        lemmas.append(
-                            '-'.join(morph.parse(p)[0].normal_form for p in parts)
-                        )
-                    else:
-                        lemmas.append(morph.parse(tok)[0].normal_form)
-                ngrams.append(' '.join(lemmas))
-    return ngrams
+        for i in range(len(lemmas) - n + 1):
+            if run[i] >= n:
+                yield lemmas[i] if n == 1 else ' '.join(lemmas[i:i + n])
+
+
+def lemma_analyzer_with_numbers(text: str, max_n: int) -> List[str]:
+    return list(iter_lemma_ngrams(text, max_n))
 
 
 def extract_top_ngrams_with_tfidf(
@@ -43,7 +88,7 @@ def extract_top_ngrams_with_tfidf(
 ) -> List[Tuple[str, float]]:
     # TODO: Надо подумать над разделением по бакетам
     #  чтобы более усреднённые результаты на разных выборках получать (issue #20)
-    bound_lemma_analyzer = partial(lemma_analyzer_with_numbers, max_n=ngram_count)
+    bound_lemma_analyzer = partial(iter_lemma_ngrams, max_n=ngram_count)
     vectorizer = TfidfVectorizer(
         analyzer=bound_lemma_analyzer,
         use_idf=True
@@ -55,6 +100,376 @@ def extract_top_ngrams_with_tfidf(
     return [(features[i], float(scores[i])) for i in top_idx if scores[i] > 0]
 
 
+def _count_ngrams_of_length(
+        lemmas: Sequence[str | None],
+        tags: Sequence[str | None],
+        run: Sequence[int],
+        n: int,
+        pattern_types: Dict[Tuple[str, ...], str]
+) -> Counter:
+    """
+    Считает n-граммы лемм длины n; типы шаблонов новых n-грамм-кандидатов дописываются в pattern_types.
+    Каждая уникальная n-грамма проверяется по шаблонам только один раз.
+    """
+    counts = Counter()
+    for i in range(len(lemmas) - n + 1):
+        if run[i] < n:
+            continue
+        key = tuple(lemmas[i:i + n])
+        counts[key] += 1
+        if counts[key] == 1:
+            pattern_type = classify_pos_pattern(tags[i:i + n])
+            if pattern_type:
+                pattern_types[key] = pattern_type
+    return counts
+
+
+def count_lemma_ngrams(
+        lemmas: Sequence[str | None],
+        tags: Sequence[str | None],
+        max_n: int
+) -> Tuple[Counter, Dict[Tuple[str, ...], str]]:
+    """
+    Считает все 1..max_n-граммы лемм и определяет тип шаблона для тех, чья
+    последовательность тегов подходит под PATTERNS (кандидаты).
+    Счётчики всех n-грамм нужны, чтобы объединить счётчики кусков текста (merge_ngram_counts).
+    :return: (счётчик всех n-грамм, {n-грамма-кандидат: тип шаблона})
+    """
+    counts = Counter()
+    pattern_types = {}
+    run = _word_runs(lemmas)
+    for n in range(1, max_n + 1):
+        # n-граммы разной длины не совпадают, поэтому счётчики просто дописываются
+        dict.update(counts, _count_ngrams_of_length(lemmas, tags, run, n, pattern_types))
+    return counts, pattern_types
+
+
+def count_candidate_ngrams(
+        lemmas: Sequence[str | None],
+        tags: Sequence[str | None],
+        max_n: int
+) -> Tuple[Counter, Dict[Tuple[str, ...], str], int]:
+    """
+    То же, что count_lemma_ngrams, для целого текста: n-граммы считаются по одной длине за раз,
+    после каждой длины остаются только счётчики кандидатов, а остальные n-граммы учитываются
+    лишь в сумме квадратов частот (для нормы). В памяти одновременно - n-граммы одной длины.
+    :return: (счётчик n-грамм-кандидатов, {n-грамма-кандидат: тип шаблона}, сумма квадратов частот всех n-грамм)
+    """
+    counts = Counter()
+    pattern_types = {}
+    sum_squares = 0
+    run = _word_runs(lemmas)
+    for n in range(1, max_n + 1):
+        length_counts = _count_ngrams_of_length(lemmas, tags, run, n, pattern_types)
+        sum_squares += sum(count * count for count in length_counts.values())
+        dict.update(counts, ((key, count) for key, count in length_counts.items() if key in pattern_types))
+        del length_counts  # освобождаем до подсчёта следующей длины
+    return counts, pattern_types, sum_squares
+
+
+def score_candidate_ngrams(
+        counts: Counter,
+        pattern_types: Dict[Tuple[str, ...], str],
+        top_k: int,
+        sum_squares: Optional[int] = None
+) -> List[Tuple[str, float, str]]:
+    """
+    TF-IDF для n-грамм-кандидатов.
+    Для одного документа idf равен 1, поэтому tf-idf - это частота, нормированная по L2
+    на вектор ВСЕХ n-грамм текста; так значения совпадают с TfidfVectorizer без отсечения.
+    :param sum_squares: сумма квадратов частот всех n-грамм, если counts содержит только кандидатов
+    """
+    if not pattern_types:
+        return []
+
+    if sum_squares is None:
+        sum_squares = sum(count * count for count in counts.values())
+    norm = math.sqrt(sum_squares)
+    # Как и в TfidfVectorizer, словарь упорядочен по алфавиту: при равных оценках порядок детерминирован
+    phrases = sorted((' '.join(key), key) for key in pattern_types)
+    scores = np.fromiter((counts[key] for _, key in phrases), dtype=np.float64, count=len(phrases)) / norm
+    top_idx = np.argsort(-scores, kind='stable')[:top_k]
+
+    return [(phrases[i][0], float(scores[i]), pattern_types[phrases[i][1]]) for i in top_idx]
+
+
+def split_text_into_shards(text: str, shard_size: int) -> List[str]:
+    """
+    Делит текст на куски не меньше shard_size символов по границам предложений.
+    Токенизация кусков совпадает с токенизацией целого текста, а n-граммы не пересекают
+    конец предложения, поэтому подсчёт по кускам даёт те же n-граммы, что и по всему тексту.
+    """
+    shards = []
+    start = 0
+    for match in SENTENCE_BOUNDARY_PATTERN.finditer(text):
+        if match.start() - start >= shard_size:
+            shards.append(text[start:match.start()])
+            start = match.end()
+    shards.append(text[start:])
+    return shards
+
+
+def count_text_ngrams(text: str, max_n: int) -> Tuple[Counter, Dict[Tuple[str, ...], str]]:
+    """Шаг map: лемматизация и подсчёт n-грамм для текста (или его куска)"""
+    lemmas = lemmatize_tokens(text)
+    return count_lemma_ngrams(lemmas, tag_lemmas(lemmas), max_n)
+
+
+def iter_sentence_blocks(chunks: Iterable[str], block_size: int) -> Iterator[str]:
+    """
+    Собирает поток кусков текста в блоки не меньше block_size символов, разрезая по границам предложений.
+    В памяти одновременно держится только текущий блок, а не весь текст: блок не длиннее 2 * block_size,
+    а предложение длиннее этого (или текст без знаков конца предложения) режется по последнему пробелу,
+    если пробелов нет - прямо по пределу.
+    """
+    max_block_size = 2 * block_size
+    buffer = ''
+    scan_from = 0
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= block_size:
+            cut = None
+            for match in SENTENCE_BOUNDARY_PATTERN.finditer(buffer, scan_from):
+                if match.start() > max_block_size:
+                    break
+                cut = match
+            if cut is not None:
+                yield buffer[:cut.start()]
+                buffer = buffer[cut.end():]
+            elif len(buffer) >= max_block_size:
+                space = LAST_WHITESPACE_PATTERN.match(buffer, 0, max_block_size)
+                end = space.end() if space else max_block_size
+                yield buffer[:end]
+                buffer = buffer[end:]
+            else:
+                # Границы пока нет - в следующий раз ищем только в дописанной части
+                scan_from = max(len(buffer) - 1, 0)
+                break
+            scan_from = 0
+
+    if buffer:
+        yield buffer
+
+
+def merge_ngram_counts(
+        parts: Iterable[Tuple[Counter, Dict[Tuple[str, ...], str]]]
+) -> Tuple[Counter, Dict[Tuple[str, ...], str]]:
+    """Шаг reduce: объединение частичных счётчиков n-грамм"""
+    counts = Counter()
+    pattern_types = {}
+    for part_counts, part_pattern_types in parts:
+        counts.update(part_counts)
+        pattern_types.update(part_pattern_types)
+    return counts, pattern_types
+
+
+def _iter_parallel_counts(
+        count: Callable[[str], object],
+        blocks: Iterable[str],
+        executor: Executor,
+        max_pending: int
+) -> Iterator:
+    """Считает блоки функцией count в пуле, держа в работе не больше max_pending блоков одновременно"""
+    pending = set()
+    for block in blocks:
+        pending.add(executor.submit(count, block))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    for future in pending:
+        yield future.result()
+
+
+def count_blocks_ngrams(
+        blocks: Iterable[str],
+        max_n: int,
+        executor: Optional[Executor] = None,
+        max_pending: int = 8
+) -> Tuple[Counter, Dict[Tuple[str, ...], str]]:
+    """
+    Подсчёт n-грамм по блокам текста, разрезанного по границам предложений.
+    С executor блоки считаются параллельно (map), счётчики объединяются по мере готовности (reduce).
+    """
+    if executor is None:
+        return merge_ngram_counts(count_text_ngrams(block, max_n) for block in blocks)
+    return merge_ngram_counts(
+        _iter_parallel_counts(partial(count_text_ngrams, max_n=max_n), blocks, executor, max_pending)
+    )
+
+
+def _identity_analyzer(doc: List[str]) -> List[str]:
+    return doc
+
+
+def _make_hasher(n_buckets: int) -> HashingVectorizer:
+    """Хэширует готовые списки n-грамм в n_buckets корзин, значение в корзине - число вхождений"""
+    return HashingVectorizer(
+        analyzer=_identity_analyzer,
+        n_features=n_buckets,
+        alternate_sign=False,
+        norm=None
+    )
+
+
+def _iter_candidate_windows(lemmas: Sequence[str | None], tags: Sequence[str | None], max_n: int):
+    """Все вхождения n-грамм текста: (n-грамма, тип шаблона или None)"""
+    run = _word_runs(lemmas)
+    for n in range(1, max_n + 1):
+        for i in range(len(lemmas) - n + 1):
+            if run[i] >= n:
+                yield ' '.join(lemmas[i:i + n]), classify_pos_pattern(tags[i:i + n])
+
+
+def hash_text_ngrams(text: str, max_n: int, n_buckets: int) -> sparse.csr_matrix:
+    """
+    Шаг map хэширующего режима: счётчики n-грамм по корзинам без словаря самих n-грамм.
+    :return: матрица 2 x n_buckets: строка 0 - все n-граммы (для нормы), строка 1 - только кандидаты
+    """
+    lemmas = lemmatize_tokens(text)
+    all_ngrams = []
+    candidates = []
+    for phrase, pattern_type in _iter_candidate_windows(lemmas, tag_lemmas(lemmas), max_n):
+        all_ngrams.append(phrase)
+        if pattern_type:
+            candidates.append(phrase)
+    return _make_hasher(n_buckets).transform([all_ngrams, candidates])
+
+
+def collect_bucket_phrases(
+        text: str,
+        max_n: int,
+        n_buckets: int,
+        buckets: frozenset
+) -> Tuple[Counter, Dict[str, str]]:
+    """
+    Второй проход хэширующего режима: точные счётчики и типы шаблонов только для
+    n-грамм-кандидатов, попавших в отобранные корзины (обратное отображение корзина -> фраза).
+    """
+    lemmas = lemmatize_tokens(text)
+    counts = Counter()
+    pattern_types = {}
+    for phrase, pattern_type in _iter_candidate_windows(lemmas, tag_lemmas(lemmas), max_n):
+        if pattern_type:
+            counts[phrase] += 1
+            pattern_types[phrase] = pattern_type
+    if not counts:
+        return Counter(), {}
+
+    phrases = list(counts)
+    phrase_buckets = _make_hasher(n_buckets).transform([[phrase] for phrase in phrases]).indices
+    keep = [phrase for phrase, bucket in zip(phrases, phrase_buckets) if int(bucket) in buckets]
+    return Counter({phrase: counts[phrase] for phrase in keep}), {phrase: pattern_types[phrase] for phrase in keep}
+
+
+def _map_blocks(
+        count: Callable[[str], object],
+        blocks: Iterable[str],
+        executor: Optional[Executor],
+        max_pending: int = 8
+) -> Iterator:
+    if executor is None:
+        return (count(block) for block in blocks)
+    return _iter_parallel_counts(count, blocks, executor, max_pending)
+
+
+def extract_top_phrases_hashed(
+        open_blocks: Callable[[], Iterable[str]],
+        ngram_count: int = 3,
+        top_k: int = 10000,
+        n_buckets: int = 2 ** 20,
+        executor: Optional[Executor] = None
+) -> Tuple[List[Tuple[str, float, str]], Dict[str, int | float]]:
+    """
+    Хэширующий режим extract_top_phrases_with_tfidf: память ограничена числом корзин n_buckets,
+    а не размером словаря n-грамм.
+    Первый проход считает n-граммы по корзинам (норма берётся по всем корзинам, кандидаты - по своим),
+    затем отбираются top_k корзин кандидатов. Второй проход восстанавливает фразы и их точные
+    частоты только для отобранных корзин. Коллизии завышают норму, поэтому оценки могут быть
+    немного ниже точных; насколько это существенно, показывает статистика коллизий.
+    :param open_blocks: функция, заново открывающая текст блоками (текст читается дважды)
+    :return: ([(лемматизированная фраза, tf-idf, тип шаблона), ...], статистика хэширования)
+    """
+    totals = sparse.csr_matrix((2, n_buckets), dtype=np.float64)
+    for part in _map_blocks(partial(hash_text_ngrams, max_n=ngram_count, n_buckets=n_buckets), open_blocks(), executor):
+        totals = totals + part
+
+    all_row = totals.getrow(0)
+    candidate_row = totals.getrow(1)
+    occupied = all_row.nnz
+    # Оценка числа различных n-грамм по заполненности корзин (linear counting)
+    estimated_ngrams = (
+        -n_buckets * math.log(1 - occupied / n_buckets) if occupied < n_buckets else float('inf')
+    )
+    stats = {
+        'buckets': n_buckets,
+        'occupied_buckets': occupied,
+        'estimated_ngrams': round(estimated_ngrams) if math.isfinite(estimated_ngrams) else None,
+        'collision_rate': 1 - occupied / estimated_ngrams if occupied else 0.0,
+        'colliding_top_buckets': 0,
+    }
+    if candidate_row.nnz == 0:
+        return [], stats
+
+    norm = math.sqrt(float(all_row.multiply(all_row).sum()))
+    order = np.argsort(-candidate_row.data, kind='stable')[:top_k]
+    top_buckets = frozenset(int(bucket) for bucket in candidate_row.indices[order])
+
+    counts = Counter()
+    pattern_types = {}
+    collect = partial(collect_bucket_phrases, max_n=ngram_count, n_buckets=n_buckets, buckets=top_buckets)
+    for part_counts, part_pattern_types in _map_blocks(collect, open_blocks(), executor):
+        counts.update(part_counts)
+        pattern_types.update(part_pattern_types)
+
+    phrases = sorted(counts)
+    phrase_buckets = _make_hasher(n_buckets).transform([[phrase] for phrase in phrases]).indices
+    stats['colliding_top_buckets'] = sum(1 for n in Counter(phrase_buckets.tolist()).values() if n > 1)
+
+    scores = np.fromiter((counts[phrase] for phrase in phrases), dtype=np.float64, count=len(phrases)) / norm
+    top_idx = np.argsort(-scores, kind='stable')[:top_k]
+    return [(phrases[i], float(scores[i]), pattern_types[phrases[i]]) for i in top_idx], stats
+
+
+def extract_top_phrases_with_tfidf(
+        text: str,
+        ngram_count: int = 3,
+        top_k: int = 10000,
+        executor: Optional[Executor] = None,
+        shard_size: int = ANALYSIS_SHARD_SIZE
+) -> List[Tuple[str, float, str]]:
+    """
+    Топ n-грамм по TF-IDF среди тех, что подходят под POS-шаблоны.
+    В отличие от extract_top_ngrams_with_tfidf, n-граммы, не подходящие ни под один шаблон,
+    отсекаются ещё до подсчёта оценок, а тип шаблона возвращается вместе с фразой.
+    Если передан executor, а текст длиннее shard_size, подсчёт n-грамм выполняется параллельно
+    по кускам текста (map-reduce); результат совпадает с последовательным.
+    :return: [(лемматизированная фраза, tf-idf, тип шаблона), ...]
+    """
+    if executor is not None and len(text) > shard_size:
+        counts, pattern_types = count_blocks_ngrams(split_text_into_shards(text, shard_size), ngram_count, executor)
+        return score_candidate_ngrams(counts, pattern_types, top_k)
+
+    lemmas = lemmatize_tokens(text)
+    counts, pattern_types, sum_squares = count_candidate_ngrams(lemmas, tag_lemmas(lemmas), ngram_count)
+    return score_candidate_ngrams(counts, pattern_types, top_k, sum_squares)
+
+
+def extract_top_phrases_from_stream(
+        chunks: Iterable[str],
+        ngram_count: int = 3,
+        top_k: int = 10000,
+        executor: Optional[Executor] = None,
+        block_size: int = ANALYSIS_SHARD_SIZE
+) -> List[Tuple[str, float, str]]:
+    """
+    То же, что extract_top_phrases_with_tfidf, но для текста, поступающего по кускам:
+    счётчики n-грамм обновляются по мере чтения, весь текст в памяти не собирается.
+    """
+    counts, pattern_types = count_blocks_ngrams(iter_sentence_blocks(chunks, block_size), ngram_count, executor)
+    return score_candidate_ngrams(counts, pattern_types, top_k)
+
+
 def search_phrases_with_tfidf(
         query: str,
         phrases: list[Term],
@@ -69,7 +484,7 @@ def search_phrases_with_tfidf(
     :param top_k: Кол-во фраз в выдаче (результате)
     """
     # Создаем TF-IDF векторизатор с анализатором
-    bound_lemma_analyzer = partial(lemma_analyzer_with_numbers, max_n=ngram_count)
+    bound_lemma_analyzer = partial(iter_lemma_ngrams, max_n=ngram_count)
     vectorizer = TfidfVectorizer(analyzer=bound_lemma_analyzer, use_idf=True)
 
     # Преобразуем фразы и запрос в TF-IDF векторы
@@ -97,8 +512,8 @@ def search_sentences_in_text_with_tfidf(
         ngram_count: int = 3,
         top_k: int = 3
 ):
-    bound_lemma_analyzer = partial(lemma_analyzer_with_numbers, max_n=ngram_count)
-    lemma_query = bound_lemma_analyzer(text=query)[-1]
+    bound_lemma_analyzer = partial(iter_lemma_ngrams, max_n=ngram_count)
+    lemma_query = lemma_analyzer_with_numbers(query, max_n=ngram_count)[-1]
 
     # 1. Разбиваем текст на предложения
     sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
@@ -119,8 +534,7 @@ def search_sentences_in_text_with_tfidf(
 
     result_sentences = []
     for top in top_indices:
-        lemma_sentences = bound_lemma_analyzer(text=sentences[top])
-        if lemma_query in lemma_sentences:
+        if lemma_query in bound_lemma_analyzer(text=sentences[top]):
             if with_html_highlight_phrase:
                 result_sentences.append(
                     html_highlight_phrase_in_sentence(sentences[top], query)
@@ -1,58 +1,18 @@
-import re
-from typing import List
+from typing import Sequence
 
-from pymorphy3 import MorphAnalyzer
+from src.analysis.highlight import MultiTermHighlighter
+from src.analysis.patterns import PATTERN_MATCHER
 
 
-def match_complex_pattern(pos_window: List[str], pattern: List) -> bool:
-    """Проверка сложных шаблонов с вложенными структурами"""
-    if len(pos_window) != len(pattern):
-        return False
-
-    for p, w in zip(pattern, pos_window):
-        if isinstance(p, tuple):
-            # Вложенный шаблон
-            sub_len = len(p)
-            if not any(
-                    all(sp == sw or sp == '?' for sp, sw in zip(p, pos_window[i:i + sub_len]))
-                    for i in range(len(pos_window) - sub_len + 1)
-            ):
-                return False
-        elif p != w and p != '?':
-            return False
-
-    return True
+def classify_pos_pattern(pos_pattern: Sequence[str]) -> str | None:
+    """
+    Проверяет, соответствует ли последовательность POS-тегов одному из шаблонов.
+    Возвращает тип шаблона или None.
+    """
+    return PATTERN_MATCHER.match(pos_pattern)
 
 
 def html_highlight_phrase_in_sentence(sentence: str, lemma_phrase: str) -> str:
-    morph = MorphAnalyzer()
-
-    # Разбиваем лемматизированную фразу на слова
-    lemma_words = lemma_phrase.split()
-
-    # Для каждого слова во фразе находим все возможные формы в предложении
-    word_patterns = []
-    for lemma_word in lemma_words:
-        # Находим все словоформы в предложении, соответствующие лемме
-        possible_forms = set()
-        for word in re.findall(r'\w+', sentence):
-            parsed = morph.parse(word)[0]
-            if parsed.normal_form == lemma_word:
-                possible_forms.add(word)
-
-        # Если не нашли форм, используем саму лемму (на случай, если она есть в тексте)
-        if not possible_forms:
-            possible_forms.add(lemma_word)
-
-        # Создаем часть регулярного выражения для этого слова
-        word_pattern = r'(?:' + '|'.join(re.escape(form) for form in possible_forms) + r')'
-        word_patterns.append(word_pattern)
-
-    # Собираем полное регулярное выражение для фразы
-    # Учитываем возможные пробелы и знаки препинания между словами
-    phrase_pattern = r'(\b' + r'[\s\-,;:]+'.join(word_patterns) + r'\b)'
-
-    # Добавляем выделение тегом strong
-    highlighted = re.sub(phrase_pattern, r'<strong>\1</strong>', sentence, flags=re.IGNORECASE)
-
+    """Выделяет тегом strong вхождения фразы (в любых словоформах) в предложении; текст экранируется"""
+    highlighted, _ = MultiTermHighlighter([lemma_phrase]).highlight(sentence)
     return highlighted
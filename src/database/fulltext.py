@@ -0,0 +1,157 @@
+from functools import reduce
+from typing import Iterable, List, Optional, Sequence
+
+from sqlalchemy import Engine, and_, column, func, literal_column, or_, table, text
+from sqlmodel import Session, select
+
+from src.database.models import Document, Term
+
+# Конфигурация текстового поиска Postgres (стемминг для русского языка)
+FTS_CONFIG = "russian"
+
+# Лексемы tsvector в сумме не длиннее 1 МБ (иначе to_tsvector падает); они не длиннее исходного текста,
+# поэтому индексируются только документы не больше этого размера, остальные проходят фильтр без проверки
+TSVECTOR_MAX_BYTES = 1048575
+
+_POSTGRES_INDEXES = (
+    f"CREATE INDEX IF NOT EXISTS ix_term_text_fts "
+    f"ON term USING GIN (to_tsvector('{FTS_CONFIG}'::regconfig, text))",
+    # Индекс по всем документам не даёт сохранить документ с tsvector больше лимита
+    "DROP INDEX IF EXISTS ix_document_content_fts",
+    f"CREATE INDEX IF NOT EXISTS ix_document_content_limited_fts "
+    f"ON document USING GIN (to_tsvector('{FTS_CONFIG}'::regconfig, content)) "
+    f"WHERE octet_length(content) <= {TSVECTOR_MAX_BYTES}",
+)
+
+# SQLite: FTS5-таблицы поверх term/document (external content), синхронизируемые триггерами
+_SQLITE_FTS_TABLES = {
+    "term_fts": ("term", "text"),
+    "document_fts": ("document", "content"),
+}
+
+
+def _sqlite_fts_statements(fts_table: str, source_table: str, source_column: str) -> List[str]:
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{source_column}, content='{source_table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source_table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {source_column}) VALUES (new.id, new.{source_column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source_table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {source_column}) "
+        f"VALUES ('delete', old.id, old.{source_column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {source_column} ON {source_table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {source_column}) "
+        f"VALUES ('delete', old.id, old.{source_column}); "
+        f"INSERT INTO {fts_table}(rowid, {source_column}) VALUES (new.id, new.{source_column}); END",
+    ]
+
+
+def create_fulltext_indexes(engine: Engine) -> None:
+    """
+    Полнотекстовые индексы для Term.text и Document.content.
+    Postgres - GIN-индексы по to_tsvector('russian', ...) (для документов - до TSVECTOR_MAX_BYTES), SQLite - таблицы FTS5.
+    Для остальных СУБД полнотекстовый поиск не используется.
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            for statement in _POSTGRES_INDEXES:
+                conn.execute(text(statement))
+        elif engine.dialect.name == "sqlite":
+            for fts_table, (source_table, source_column) in _SQLITE_FTS_TABLES.items():
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": fts_table}
+                ).first()
+                for statement in _sqlite_fts_statements(fts_table, source_table, source_column):
+                    conn.execute(text(statement))
+                if not exists:
+                    # Индексируем строки, появившиеся до создания FTS-таблицы
+                    conn.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+
+def fulltext_supported(db: Session) -> bool:
+    return db.get_bind().dialect.name in ("postgresql", "sqlite")
+
+
+def _sqlite_prefix(word: str) -> str:
+    # В FTS5 нет русского стемминга: ищем по префиксу слова без окончания
+    return word[:max(3, len(word) - 2)]
+
+
+def _apply_match(
+        db: Session,
+        statement,
+        fts_table: str,
+        id_column,
+        source_column,
+        words: Iterable[str],
+        max_bytes: Optional[int] = None
+):
+    """
+    Добавляет к запросу условие "в тексте есть хотя бы одно из слов" (OR-запрос).
+    Слова - пользовательский ввод, поэтому синтаксис запросов СУБД в них не разбирается.
+    :param max_bytes: Postgres - тексты длиннее не проиндексированы и проходят условие без проверки
+    """
+    words = sorted({word.lower() for word in words if word})
+    if db.get_bind().dialect.name == "postgresql":
+        # Выражение должно совпадать с выражением GIN-индекса, иначе индекс не будет использован.
+        # plainto_tsquery каждого слова (без операторов и кавычек), объединённые через ||
+        config = literal_column(f"'{FTS_CONFIG}'::regconfig")
+        query = reduce(
+            lambda left, right: left.op("||")(right),
+            (func.plainto_tsquery(config, word) for word in words)
+        )
+        condition = func.to_tsvector(config, source_column).op("@@")(query)
+        if max_bytes is not None:
+            # Граница - литералом, как в условии частичного индекса, чтобы планировщик мог его выбрать
+            size, limit = func.octet_length(source_column), literal_column(str(int(max_bytes)))
+            condition = or_(size > limit, and_(size <= limit, condition))
+        return statement.where(condition)
+
+    fts = table(fts_table, column("rowid"))
+    # Каждое слово - строка FTS5 в двойных кавычках: операторы и спецсимволы внутри не действуют
+    query = " OR ".join('"{}"*'.format(_sqlite_prefix(word).replace('"', '""')) for word in words)
+    return statement.join(fts, fts.c.rowid == id_column).where(literal_column(fts_table).op("MATCH")(query))
+
+
+def match_dictionary_ids(
+        db: Session,
+        words: Sequence[str],
+        dictionary_ids: Optional[Sequence[int]] = None
+) -> Optional[List[int]]:
+    """
+    Словари, в которых есть не скрытые термины хотя бы с одним из слов.
+    :return: id словарей или None, если СУБД не поддерживает полнотекстовый поиск
+    """
+    if not fulltext_supported(db):
+        return None
+    if not words:
+        return []
+
+    statement = select(Term.dictionary_id).distinct().where(Term.hidden == False)  # noqa: E712
+    statement = _apply_match(db, statement, "term_fts", Term.id, Term.text, words)
+    if dictionary_ids:
+        statement = statement.where(Term.dictionary_id.in_(dictionary_ids))
+    return list(db.exec(statement).all())
+
+
+def match_document_ids(
+        db: Session,
+        words: Sequence[str],
+        dictionary_ids: Sequence[int]
+) -> Optional[List[int]]:
+    """
+    Документы словарей, в тексте которых встречается хотя бы одно из слов.
+    :return: id документов или None, если СУБД не поддерживает полнотекстовый поиск
+    """
+    if not fulltext_supported(db):
+        return None
+    if not words:
+        return []
+
+    statement = select(Document.id).where(Document.dictionary_id.in_(dictionary_ids))
+    statement = _apply_match(
+        db, statement, "document_fts", Document.id, Document.content, words, max_bytes=TSVECTOR_MAX_BYTES
+    )
+    return list(db.exec(statement).all())
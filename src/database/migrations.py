@@ -0,0 +1,253 @@
+from typing import Dict, List
+
+from sqlalchemy import (
+    Column,
+    Engine,
+    Integer,
+    MetaData,
+    Table,
+    and_,
+    delete,
+    exists,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel
+
+from config import logger
+from src.database.models import Connection, Term
+
+
+def add_missing_columns(engine: Engine) -> None:
+    """
+    Добавляет в уже существующие таблицы столбцы, появившиеся в моделях позже
+    (create_all создаёт только отсутствующие таблицы).
+    Столбцы NOT NULL без значения по умолчанию автоматически не добавляются.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                definition = f"{preparer.quote(column.name)} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    definition += f" DEFAULT {column.server_default.arg}"
+                elif not column.nullable:
+                    logger.warning(msg=f"Column {table.name}.{column.name} is NOT NULL without default, skipped")
+                    continue
+
+                logger.info(msg=f"Adding column {table.name}.{column.name}")
+                conn.execute(text(f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {definition}"))
+
+
+def add_missing_indexes(engine: Engine) -> None:
+    """
+    Создаёт индексы моделей, которых ещё нет в уже существующих таблицах.
+    Уникальный индекс, которому мешают уже сохранённые повторы, пропускается с предупреждением:
+    повторы убираются отдельной командой (см. deduplicate_terms).
+    """
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            logger.info(msg=f"Creating index {index.name}")
+            try:
+                index.create(engine)
+            except IntegrityError as e:
+                if not index.unique:
+                    raise
+                logger.warning(
+                    msg=f"Unique index {index.name} is not created, table {table.name} has duplicate rows: {e.orig}. "
+                        f"Run `python manage.py deduplicate-terms`"
+                )
+
+
+# Временные таблицы миграции удаляются только после её успешного выполнения: при ошибке Postgres откатывает
+# их создание вместе с транзакцией, а DROP в прерванной транзакции заменил бы исходную ошибку
+
+# Соответствие id повтора термина id оставляемого термина
+_dedupe_term_id_map = Table(
+    "dedupe_term_id_map",
+    MetaData(),
+    Column("old_id", Integer, primary_key=True),
+    Column("new_id", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+# Связи, концы которых переводятся на оставляемые термины
+_dedupe_connection_ids = Table(
+    "dedupe_connection_ids",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    prefixes=["TEMPORARY"],
+)
+
+
+def deduplicate_terms(engine: Engine, dry_run: bool = False) -> List[Dict]:
+    """
+    Разовая миграция перед созданием уникального индекса (dictionary_id, text, type): убирает уже
+    сохранённые повторы терминов. Из повторов остаётся термин с наименьшим id, связи остальных переводятся
+    на него; получившиеся при этом петли и повторы пар (from, to) удаляются. Всё - в одной транзакции.
+    Каждый удалённый термин пишется в лог (с предупреждением, если его tfidf, phrase_type или hidden
+    отличаются от оставленного). Запускается командой `python manage.py deduplicate-terms`.
+    :param dry_run: только посчитать и записать в лог, транзакция откатывается
+    :return: удалённые термины с id оставленного (keeper_id)
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(Term.__tablename__):
+        return []
+
+    term = Term.__table__
+    connection = Connection.__table__
+    keeper = term.alias("keeper")
+    term_map = _dedupe_term_id_map
+    from_map = term_map.alias("from_map")
+    to_map = term_map.alias("to_map")
+    compared_columns = ["tfidf", "phrase_type", "hidden"]
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        term_map.create(conn)
+        _dedupe_connection_ids.create(conn)
+        duplicate = term.alias("duplicate")
+        conn.execute(insert(term_map).from_select(
+            ["old_id", "new_id"],
+            select(duplicate.c.id, func.min(keeper.c.id))
+            .select_from(duplicate.join(keeper, and_(
+                keeper.c.dictionary_id == duplicate.c.dictionary_id,
+                keeper.c.text == duplicate.c.text,
+                keeper.c.type == duplicate.c.type,
+                keeper.c.id < duplicate.c.id,
+            )))
+            .group_by(duplicate.c.id)
+        ))
+
+        removed = [dict(row) for row in conn.execute(
+            select(
+                term.c.id, term.c.dictionary_id, term.c.text, term.c.type,
+                *(term.c[name] for name in compared_columns),
+                term_map.c.new_id.label("keeper_id"),
+                *(keeper.c[name].label(f"keeper_{name}") for name in compared_columns),
+            )
+            .select_from(
+                term.join(term_map, term_map.c.old_id == term.c.id).join(keeper, keeper.c.id == term_map.c.new_id)
+            )
+            .order_by(term.c.id)
+        ).mappings()]
+        for row in removed:
+            differences = [
+                f"{name}={row[name]!r} (kept {row[f'keeper_{name}']!r})"
+                for name in compared_columns
+                if row[name] != row[f"keeper_{name}"]
+            ]
+            message = (
+                f"Duplicate term {row['id']} {row['text']!r} ({row['type']}) of dictionary "
+                f"{row['dictionary_id']} is merged into term {row['keeper_id']}"
+            )
+            if differences:
+                logger.warning(msg=f"{message}, dropped values: {', '.join(differences)}")
+            else:
+                logger.info(msg=message)
+
+        conn.execute(insert(_dedupe_connection_ids).from_select(
+            ["id"],
+            select(connection.c.id).where(or_(
+                connection.c.from_term_id.in_(select(term_map.c.old_id)),
+                connection.c.to_term_id.in_(select(term_map.c.old_id)),
+            ))
+        ))
+        for column, column_map in ((connection.c.from_term_id, from_map), (connection.c.to_term_id, to_map)):
+            conn.execute(
+                update(connection)
+                .where(column.in_(select(column_map.c.old_id)))
+                .values({column.name: select(column_map.c.new_id).where(column_map.c.old_id == column).scalar_subquery()})
+            )
+
+        # Петли и повторы пар, появившиеся после переноса связей; из повторов остаётся
+        # непеределанная связь, а если таких нет - с наименьшим id
+        moved_ids = select(_dedupe_connection_ids.c.id)
+        loops = conn.execute(
+            delete(connection)
+            .where(connection.c.id.in_(moved_ids), connection.c.from_term_id == connection.c.to_term_id)
+        ).rowcount
+        other = connection.alias("other")
+        repeats = conn.execute(
+            delete(connection).where(
+                connection.c.id.in_(moved_ids),
+                exists().where(
+                    other.c.dictionary_id == connection.c.dictionary_id,
+                    other.c.from_term_id == connection.c.from_term_id,
+                    other.c.to_term_id == connection.c.to_term_id,
+                    other.c.id != connection.c.id,
+                    or_(other.c.id.not_in(moved_ids), other.c.id < connection.c.id),
+                )
+            )
+        ).rowcount
+        conn.execute(delete(term).where(term.c.id.in_(select(term_map.c.old_id))))
+
+        logger.info(
+            msg=f"Duplicate terms{' (dry run)' if dry_run else ''}: {len(removed)} terms removed, "
+                f"{loops} self-loop and {repeats} repeated connections removed"
+        )
+        _dedupe_connection_ids.drop(conn)
+        term_map.drop(conn)
+        if dry_run:
+            transaction.rollback()
+        else:
+            transaction.commit()
+    return removed
+
+
+def cascade_foreign_keys(engine: Engine) -> None:
+    """
+    Пересоздаёт внешние ключи существующих таблиц, у которых в моделях появился ON DELETE CASCADE.
+    Только Postgres: в SQLite ограничения существующей таблицы не изменить без её пересоздания.
+    Ограничение добавляется как NOT VALID (без долгой блокировки таблицы) и проверяется отдельно.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {
+            tuple(fk["constrained_columns"]): fk
+            for fk in inspector.get_foreign_keys(table.name)
+        }
+        for foreign_key in table.foreign_keys:
+            if (foreign_key.ondelete or "").upper() != "CASCADE":
+                continue
+            current = existing.get((foreign_key.parent.name,))
+            if current is None or (current["options"].get("ondelete") or "").upper() == "CASCADE":
+                continue
+
+            name = preparer.quote(current["name"])
+            table_name = preparer.quote(table.name)
+            logger.info(msg=f"Adding ON DELETE CASCADE to {table.name}.{foreign_key.parent.name}")
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {table_name} DROP CONSTRAINT {name}, "
+                    f"ADD CONSTRAINT {name} FOREIGN KEY ({preparer.quote(foreign_key.parent.name)}) "
+                    f"REFERENCES {preparer.quote(foreign_key.column.table.name)} "
+                    f"({preparer.quote(foreign_key.column.name)}) ON DELETE CASCADE NOT VALID"
+                ))
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table_name} VALIDATE CONSTRAINT {name}"))
@@ -1,8 +1,12 @@
-from typing import List, Optional
-from sqlmodel import SQLModel, Field, Relationship, Column, Enum
+import uuid
+from typing import Any, List, Optional
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Index
+from sqlalchemy.orm import deferred
+from sqlmodel import SQLModel, Field, Relationship, Column, Enum, Session, select
 from datetime import datetime, UTC
 
-from config import VL_TIMEZONE
+from config import VL_TIMEZONE, TERM_EMBEDDING_DIM
 from database import engine
 from src.models.phrase_type import PhraseType
 
@@ -12,6 +16,9 @@ def _get_current_time():
 
 
 class Dictionary(SQLModel, table=True):
+    # Список словарей постранично: по убыванию (created_at, id)
+    __table_args__ = (Index("ix_dictionary_created_at_id", "created_at", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     tfidf_range: float
@@ -22,6 +29,11 @@ class Dictionary(SQLModel, table=True):
         default_factory=_get_current_time,
         sa_column_kwargs={"onupdate": _get_current_time},
     )
+    # Версия для оптимистичной блокировки: увеличивается при каждом изменении словаря
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    # Время пометки словаря удалённым: такой словарь скрыт из всех запросов,
+    # а его строки удаляются фоновой очисткой (src.services.dictionary_purger)
+    deleted_at: Optional[datetime] = Field(default=None, index=True)
 
     terms: List["Term"] = Relationship(back_populates="dictionary")
     connections: List["Connection"] = Relationship(back_populates="dictionary")
@@ -42,20 +54,34 @@ class Dictionary(SQLModel, table=True):
 
 class Document(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    dictionary_id: int = Field(foreign_key="dictionary.id")
+    dictionary_id: int = Field(foreign_key="dictionary.id", index=True, ondelete="CASCADE")
     content: str
 
     dictionary: Dictionary = Relationship(back_populates="documents")
 
 
+# Вектор для поиска похожих терминов (см. src.analysis.embeddings)
+_term_embedding_column = Column("embedding", Vector(TERM_EMBEDDING_DIM), nullable=True)
+
+
+# Термин с одним текстом и типом в словаре один (на этом индексе держится слияние словарей)
+TERM_UNIQUE_INDEX = "uq_term_dictionary_text_type"
+
+
 class Term(SQLModel, table=True):
+    __table_args__ = (Index(TERM_UNIQUE_INDEX, "dictionary_id", "text", "type", unique=True),)
+    # Вектор нужен только поиску похожих терминов, поэтому с термином он не загружается
+    # (читается при первом обращении к атрибуту или сразу - с undefer(Term.embedding))
+    __mapper_args__ = {"properties": {"embedding": deferred(_term_embedding_column)}}
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    dictionary_id: int = Field(foreign_key="dictionary.id")
+    dictionary_id: int = Field(foreign_key="dictionary.id", index=True, ondelete="CASCADE")
     text: str
     type: str
     phrase_type: PhraseType = Field(sa_column=Column(Enum(PhraseType), index=True))
     tfidf: float
     hidden: bool = False
+    embedding: Optional[Any] = Field(default=None, sa_column=_term_embedding_column)
 
     dictionary: Dictionary = Relationship(back_populates="terms")
     from_connections: List["Connection"] = Relationship(
@@ -69,10 +95,13 @@ class Term(SQLModel, table=True):
 
 
 class Connection(SQLModel, table=True):
+    # Поиск связи по паре терминов (пакетные изменения и слияние словарей)
+    __table_args__ = (Index("ix_connection_dictionary_from_to", "dictionary_id", "from_term_id", "to_term_id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    dictionary_id: int = Field(foreign_key="dictionary.id")
-    from_term_id: int = Field(foreign_key="term.id")
-    to_term_id: int = Field(foreign_key="term.id")
+    dictionary_id: int = Field(foreign_key="dictionary.id", index=True, ondelete="CASCADE")
+    from_term_id: int = Field(foreign_key="term.id", ondelete="CASCADE")
+    to_term_id: int = Field(foreign_key="term.id", ondelete="CASCADE")
 
     dictionary: Dictionary = Relationship(back_populates="connections")
     from_term: Term = Relationship(
@@ -85,5 +114,60 @@ class Connection(SQLModel, table=True):
     )
 
 
+class DatabaseInstance(SQLModel, table=True):
+    """
+    Случайный идентификатор базы, созданный при первом обращении. Им помечаются индексы на диске
+    (src.services.index_store): индекс пересозданной или другой базы с теми же id отличается от своего.
+    """
+    __tablename__ = "database_instance"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    uid: str
+
+
+# Идентификатор базы не меняется, пока работает процесс
+_database_uid: Optional[str] = None
+
+
+def database_uid() -> str:
+    """Идентификатор текущей базы (DatabaseInstance); при одновременном создании остаётся первый"""
+    global _database_uid
+    if _database_uid is None:
+        with Session(engine) as db:
+            if db.exec(select(DatabaseInstance.id)).first() is None:
+                db.add(DatabaseInstance(uid=uuid.uuid4().hex))
+                db.commit()
+            _database_uid = db.exec(select(DatabaseInstance.uid).order_by(DatabaseInstance.id)).first()
+    return _database_uid
+
+
+def active_dictionary_ids():
+    """Подзапрос id словарей, не помеченных удалёнными"""
+    return select(Dictionary.id).where(Dictionary.deleted_at.is_(None))
+
+
+def get_active_dictionary(db: Session, dictionary_id: int) -> Optional[Dictionary]:
+    """Словарь по id; помеченный удалённым считается отсутствующим"""
+    dictionary = db.get(Dictionary, dictionary_id)
+    if dictionary is None or dictionary.deleted_at is not None:
+        return None
+    return dictionary
+
+
 def create_all():
+    # Эти модули импортируют модели, поэтому импорт здесь, а не в начале модуля
+    from src.database.fulltext import create_fulltext_indexes
+    from src.database.migrations import (
+        add_missing_columns,
+        add_missing_indexes,
+        cascade_foreign_keys,
+    )
+    from src.database.vector_search import create_vector_index, enable_vector_extension
+
+    enable_vector_extension(engine)
     SQLModel.metadata.create_all(engine)
+    add_missing_columns(engine)
+    add_missing_indexes(engine)
+    cascade_foreign_keys(engine)
+    create_fulltext_indexes(engine)
+    create_vector_index(engine)
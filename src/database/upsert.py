@@ -0,0 +1,16 @@
+from sqlalchemy import Insert, Table, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session
+
+
+def insert_ignoring_conflicts(db: Session, table: Table) -> Insert:
+    """
+    INSERT ... ON CONFLICT DO NOTHING: строки, нарушающие уникальные индексы, пропускаются.
+    Поддерживается Postgres и SQLite; для остальных СУБД - обычный INSERT.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return insert(table)
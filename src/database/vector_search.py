@@ -0,0 +1,66 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Engine, text
+from sqlmodel import Session, select
+
+from src.database.models import Term, active_dictionary_ids
+
+
+def vector_index_supported(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def enable_vector_extension(engine: Engine) -> None:
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+
+
+def create_vector_index(engine: Engine) -> None:
+    """ANN-индекс HNSW по косинусному расстоянию для Term.embedding (только Postgres + pgvector)"""
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_term_embedding_hnsw "
+                "ON term USING hnsw (embedding vector_cosine_ops)"
+            ))
+
+
+def nearest_terms(
+        db: Session,
+        embedding: Sequence[float],
+        limit: int,
+        dictionary_ids: Optional[Sequence[int]] = None,
+        exclude_term_id: Optional[int] = None
+) -> List[Tuple[Term, float]]:
+    """
+    Не скрытые термины, ближайшие к вектору по косинусной схожести.
+    В Postgres - один запрос по HNSW-индексу, в остальных СУБД - полный перебор в numpy.
+    :return: [(термин, косинусная схожесть), ...] по убыванию схожести
+    """
+    conditions = [
+        Term.hidden == False,  # noqa: E712
+        Term.embedding.is_not(None),
+        Term.dictionary_id.in_(active_dictionary_ids()),
+    ]
+    if dictionary_ids:
+        conditions.append(Term.dictionary_id.in_(dictionary_ids))
+    if exclude_term_id is not None:
+        conditions.append(Term.id != exclude_term_id)
+
+    if vector_index_supported(db):
+        distance = Term.embedding.cosine_distance(embedding)
+        rows = db.exec(select(Term, distance).where(*conditions).order_by(distance).limit(limit)).all()
+        return [(term, 1 - float(term_distance)) for term, term_distance in rows]
+
+    rows = db.exec(select(Term.id, Term.embedding).where(*conditions)).all()
+    if not rows:
+        return []
+    # Векторы нормированы при построении, поэтому косинусная схожесть - скалярное произведение
+    matrix = np.array([row[1] for row in rows], dtype=np.float32)
+    similarities = matrix @ np.asarray(embedding, dtype=np.float32)
+    top_idx = np.argsort(-similarities, kind='stable')[:limit]
+
+    terms = {term.id: term for term in db.exec(select(Term).where(Term.id.in_([rows[i][0] for i in top_idx]))).all()}
+    return [(terms[rows[i][0]], float(similarities[i])) for i in top_idx]
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import List, Optional
 
@@ -29,6 +29,42 @@ class DictionaryDTO:
     connections: List[ConnectionDTO]
     id: Optional[int] = None
     document_text: str = ''
+    version: Optional[int] = None
+
+
+@dataclass
+class DictionaryMergeDTO:
+    # id сохранённых словарей, сливаемых с целевым (после слияния удаляются)
+    source_ids: List[int]
+
+
+@dataclass
+class TermOperationDTO:
+    # add | update | delete
+    op: str
+    # add: term.id - временный (отрицательный) id, на который могут ссылаться связи; update: id термина в БД
+    term: Optional[TermDTO] = None
+    # delete: id термина в БД
+    id: Optional[int] = None
+
+
+@dataclass
+class ConnectionOperationDTO:
+    # add | delete
+    op: str
+    # id термина в БД или временный id термина, добавленного в этом же пакете
+    from_id: int
+    to_id: int
+
+
+@dataclass
+class DictionaryOperationsDTO:
+    # Версия словаря, с которой работал клиент
+    version: int
+    terms: List[TermOperationDTO] = field(default_factory=list)
+    connections: List[ConnectionOperationDTO] = field(default_factory=list)
+    name: Optional[str] = None
+    tfidf_range: Optional[float] = None
 
 
 @dataclass
@@ -38,3 +74,16 @@ class DictionaryShortDTO:
     created_at: datetime | float
     terms_count: int
     connections_count: int
+
+
+@dataclass
+class DictionaryShortPageDTO:
+    dictionaries: List[DictionaryShortDTO]
+    # Курсор следующей страницы (None - страница последняя)
+    next_cursor: Optional[str] = None
+
+
+@dataclass
+class HighlightRequestDTO:
+    text: str
+    terms: List[str]
@@ -1,15 +1,39 @@
+import asyncio
+import os
 from dataclasses import asdict
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Form, File, UploadFile, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlmodel import Session
 from starlette.requests import Request
 import starlette.status as status
 
-from src.services.exceptions import InvalidConnDictDTO
+from src.analysis.highlight import MultiTermHighlighter
+from src.analysis.morphology import get_morphology
+from src.analysis.phrase_extractor import PhraseExtractor
+from src.analysis.term_graph import GraphDirection
+from src.database.models import Term, get_active_dictionary
+from src.services.analysis_batch import BatchDocument, batch_analysis
+from src.services.analysis_cache import analysis_cache
+from src.services.search_cache import search_cache
+from src.services.analysis_jobs import analysis_jobs, JobStatus
+from src.services.exceptions import (
+    DictionaryVersionConflict,
+    InvalidConnDictDTO,
+    InvalidDictionaryOperation,
+    InvalidPageCursor,
+    InvalidSearchCursor,
+)
 from src.services.dictionary_service import DictionaryService
-from src.models.dto import DictionaryDTO
+from src.services.search_service import search_service
+from src.services.term_graph_service import term_graphs, term_to_dict
+from src.services.term_prefix_index_service import term_prefix_indexes
+from src.services.term_similarity_service import term_similarity
+from src.models.dto import DictionaryDTO, DictionaryMergeDTO, DictionaryOperationsDTO, HighlightRequestDTO
 from src.services.text_service import TextService
-from config import ANALYSIS_DIR, logger
+from config import ANALYSIS_DIR, DICTIONARY_PAGE_SIZE, PHRASE_CLUSTER_THRESHOLD, SEARCH_PAGE_SIZE, logger
+from database import get_session
 
 api_router = APIRouter(prefix="/api", tags=["api"], default_response_class=JSONResponse)
 
@@ -35,6 +59,251 @@ async def save_analysis(request: Request) -> JSONResponse:
         )
 
 
+@api_router.get("/analysis/cache", name="analysis_cache_stats")
+async def get_analysis_cache_stats() -> JSONResponse:
+    """Статистика кэшей: результаты анализа, морфологический разбор и страницы поиска"""
+    return JSONResponse(content={
+        "success": True,
+        "data": {
+            "analysis": analysis_cache.stats(),
+            "morphology": get_morphology().stats(),
+            "search": search_cache.stats(),
+        }
+    })
+
+
+@api_router.post("/analysis/jobs", name="submit_analysis_job")
+async def submit_analysis_job(
+        text: Optional[str] = Form(None),
+        file: UploadFile = File(None)
+) -> JSONResponse:
+    """Постановка текста или файла в очередь на анализ"""
+    if file and file.filename:
+        # Файл (в т.ч. сжатый gzip) читается и анализируется потоково, целиком в память не загружается
+        try:
+            file_path, content_hash = await TextService.spool_upload_file(file)
+        except Exception as e:
+            logger.error(msg=f"Error reading file: {str(e)}", exc_info=True)
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"success": False, "message": "Произошла ошибка при чтении файла"}
+            )
+        job = analysis_jobs.submit_file(file_path, content_hash)
+    elif text:
+        job = analysis_jobs.submit(text)
+    else:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "message": "Был введён пустой текст или не выбран файл"}
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"success": True, "job_id": job.id, "data": job.to_dict()}
+    )
+
+
+@api_router.get("/analysis/jobs/{job_id}", name="get_analysis_job")
+async def get_analysis_job(job_id: str) -> JSONResponse:
+    """Статус задачи анализа"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "message": "Задача анализа не найдена"}
+        )
+
+    return JSONResponse(content={"success": True, "data": job.to_dict()})
+
+
+@api_router.get("/analysis/jobs/{job_id}/result", name="get_analysis_job_result")
+async def get_analysis_job_result(
+        job_id: str,
+        cluster: bool = Query(False),
+        cluster_threshold: float = Query(PHRASE_CLUSTER_THRESHOLD, gt=0, le=1)
+) -> JSONResponse:
+    """Результат завершённой задачи анализа; с cluster - почти-дубликаты фраз свёрнуты в кластеры"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "message": "Задача анализа не найдена"}
+        )
+    if job.refresh_status() != JobStatus.done:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"success": False, "message": "Задача анализа не завершена успешно", "data": job.to_dict()}
+        )
+
+    result = job.result
+    if cluster:
+        # Кластеризация - CPU-работа, в event loop её не выполняем
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, PhraseExtractor.cluster_analysis_result, result, cluster_threshold
+        )
+    return JSONResponse(content={"success": True, "data": result})
+
+
+@api_router.get("/analysis/jobs/{job_id}/events", name="stream_analysis_job")
+async def stream_analysis_job(job_id: str):
+    """Поток изменений статуса задачи анализа (server-sent events)"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "message": "Задача анализа не найдена"}
+        )
+
+    return StreamingResponse(analysis_jobs.iter_events(job), media_type="text/event-stream")
+
+
+@api_router.delete("/analysis/jobs/{job_id}", name="cancel_analysis_job")
+async def cancel_analysis_job(job_id: str) -> JSONResponse:
+    """Отмена задачи анализа"""
+    job = analysis_jobs.cancel(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "message": "Задача анализа не найдена"}
+        )
+
+    return JSONResponse(content={"success": True, "data": job.to_dict()})
+
+
+@api_router.post("/analysis/batch", name="analyze_batch")
+async def analyze_batch(
+        texts: List[str] = Form(None),
+        files: List[UploadFile] = File(None),
+        phrases_limit: Optional[int] = Query(None, ge=0)
+) -> JSONResponse:
+    """Пакетный анализ нескольких текстов и/или файлов"""
+    documents = [BatchDocument(f"text_{idx}", content=text) for idx, text in enumerate(texts or []) if text]
+    try:
+        for file in files or []:
+            if not file.filename:
+                continue
+            # Файл (в т.ч. сжатый gzip) сохраняется и анализируется потоково, целиком в память не загружается
+            try:
+                file_path, content_hash = await TextService.spool_upload_file(file)
+            except Exception as e:
+                logger.error(msg=f"Error reading file {file.filename}: {str(e)}", exc_info=True)
+                return JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"success": False, "message": f"Произошла ошибка при чтении файла {file.filename}"}
+                )
+            documents.append(BatchDocument(file.filename, file_path=file_path, content_hash=content_hash))
+
+        if not documents:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"success": False, "message": "Не переданы тексты или файлы для анализа"}
+            )
+
+        try:
+            data = await batch_analysis.analyze(documents, phrases_limit)
+            return JSONResponse(content={"success": True, "data": data})
+        except Exception as e:
+            logger.error(msg=f"Batch analysis error: {str(e)}", exc_info=True)
+            return JSONResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content={"success": False, "message": str(e)}
+            )
+    finally:
+        for document in documents:
+            if document.file_path is not None:
+                os.remove(document.file_path)
+
+
+@api_router.post("/highlight", name="highlight_terms")
+async def highlight_terms(highlight_dto: HighlightRequestDTO) -> JSONResponse:
+    """Выделение нескольких терминов (в любых словоформах) в тексте за один проход"""
+    html, matches = MultiTermHighlighter(highlight_dto.terms).highlight(highlight_dto.text)
+    return JSONResponse(content={
+        "success": True,
+        "data": {
+            "html": html,
+            "matches": [match._asdict() for match in matches],
+        }
+    })
+
+
+@api_router.get("/search", name="search_terms")
+def search_terms(
+        query: str = Query(..., min_length=1),
+        dictionary_id: Optional[List[int]] = Query(None),
+        limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=100),
+        cursor: Optional[str] = Query(None),
+        with_sentences: bool = Query(True),
+        db: Session = Depends(get_session)
+) -> JSONResponse:
+    """Поиск терминов по всем словарям (или по выбранным dictionary_id) с постраничной выдачей"""
+    try:
+        page = search_service.search(db, query, dictionary_id, limit, cursor, with_sentences)
+        return JSONResponse(content={
+            "success": True,
+            "data": {
+                "results": [result.to_dict() for result in page.results],
+                "next_cursor": page.next_cursor,
+            }
+        })
+    except InvalidSearchCursor as e:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "message": str(e)}
+        )
+    except Exception as e:
+        logger.error(msg=f"Search error: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": "Произошла ошибка при поиске"}
+        )
+
+
+@api_router.get("/terms/similar", name="similar_terms")
+async def get_similar_terms(
+        text: Optional[str] = Query(None),
+        term_id: Optional[int] = Query(None),
+        dictionary_id: Optional[List[int]] = Query(None),
+        limit: int = Query(10, ge=1, le=100),
+        db: Session = Depends(get_session)
+) -> JSONResponse:
+    """Поиск похожих терминов во всех словарях (или в выбранных dictionary_id) по тексту или термину"""
+    if not text and term_id is None:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "message": "Нужно передать text или term_id"}
+        )
+
+    try:
+        similar = term_similarity.find_similar(db, text, term_id, dictionary_id, limit)
+        if similar is None:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "Термин не найден"}
+            )
+
+        return JSONResponse(content={
+            "success": True,
+            "data": [
+                {
+                    "id": term.id,
+                    "dictionary_id": term.dictionary_id,
+                    "text": term.text,
+                    "type": term.type,
+                    "phrase_type": term.phrase_type.value,
+                    "similarity": similarity,
+                }
+                for term, similarity in similar
+            ]
+        })
+    except Exception as e:
+        logger.error(msg=f"Similar terms search error: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": "Произошла ошибка при поиске похожих терминов"}
+        )
+
+
 @api_router.post("/dictionary")
 async def save_dictionary(
         dict_dto: DictionaryDTO,
@@ -87,6 +356,11 @@ async def update_dictionary(
             )
 
         return JSONResponse(content={"success": True, "message": "Словарь обновлён"})
+    except DictionaryVersionConflict as e:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"success": False, "message": str(e), "data": {"version": e.current_version}}
+        )
     except InvalidConnDictDTO as e:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -103,6 +377,44 @@ async def update_dictionary(
         )
 
 
+@api_router.post("/dictionary/{dictionary_id}/operations", name="dictionary_operations")
+async def apply_dictionary_operations(
+        ops: DictionaryOperationsDTO,
+        dictionary_id: int,
+        dict_service: DictionaryService = Depends(DictionaryService)
+) -> JSONResponse:
+    """
+    Пакет операций над терминами и связями словаря (добавление, изменение, удаление).
+    version - версия словаря, с которой работал клиент; если словарь успел измениться, возвращается 409
+    с текущей версией, и клиент должен перечитать словарь.
+    """
+    try:
+        new_version = dict_service.apply_operations(dictionary_id, ops)
+        if new_version is None:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "Словарь не найден"}
+            )
+
+        return JSONResponse(content={"success": True, "data": {"version": new_version}})
+    except DictionaryVersionConflict as e:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"success": False, "message": str(e), "data": {"version": e.current_version}}
+        )
+    except (InvalidDictionaryOperation, InvalidConnDictDTO) as e:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "message": str(e)}
+        )
+    except Exception as e:
+        logger.error(msg=f"Error applying dictionary operations: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": "Произошла ошибка при изменении словаря"}
+        )
+
+
 @api_router.delete("/dictionary/{dictionary_id}", name="delete_dictionary")
 async def delete_dictionary(
         dictionary_id: int,
@@ -127,18 +439,138 @@ async def delete_dictionary(
         )
 
 
+@api_router.get("/dictionary/{dictionary_id}/terms/complete", name="complete_terms")
+async def complete_terms(
+        dictionary_id: int,
+        prefix: str = Query(..., min_length=1),
+        limit: int = Query(10, ge=1, le=50),
+        db: Session = Depends(get_session)
+) -> JSONResponse:
+    """Автодополнение терминов словаря по префиксу текста или лемм термина"""
+    if get_active_dictionary(db, dictionary_id) is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "message": "Словарь не найден"}
+        )
+
+    try:
+        completions = term_prefix_indexes.complete(db, dictionary_id, prefix, limit)
+        return JSONResponse(content={
+            "success": True,
+            "data": [{"id": term_id, "text": text} for term_id, text in completions]
+        })
+    except Exception as e:
+        logger.error(msg=f"Term completion error: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": str(e)}
+        )
+
+
+def _graph_term_not_found(db: Session, dictionary_id: int, term_id: Optional[int] = None) -> JSONResponse | None:
+    """Ответ 404, если нет словаря или термина в нём"""
+    if get_active_dictionary(db, dictionary_id) is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "message": "Словарь не найден"}
+        )
+    if term_id is not None:
+        term = db.get(Term, term_id)
+        if term is None or term.dictionary_id != dictionary_id:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "Термин не найден в словаре"}
+            )
+    return None
+
+
+@api_router.get("/dictionary/{dictionary_id}/graph/terms/{term_id}/neighbours", name="term_neighbours")
+async def get_term_neighbours(
+        dictionary_id: int,
+        term_id: int,
+        direction: GraphDirection = Query(GraphDirection.both),
+        db: Session = Depends(get_session)
+) -> JSONResponse:
+    """Термины, непосредственно связанные с термином (out - исходящие связи, in - входящие)"""
+    not_found = _graph_term_not_found(db, dictionary_id, term_id)
+    if not_found is not None:
+        return not_found
+
+    neighbour_ids = term_graphs.get(db, dictionary_id).neighbours(term_id, direction)
+    terms = term_graphs.load_terms(db, dictionary_id, neighbour_ids)
+    return JSONResponse(content={
+        "success": True,
+        "data": [term_to_dict(terms[neighbour_id]) for neighbour_id in neighbour_ids if neighbour_id in terms]
+    })
+
+
+@api_router.get("/dictionary/{dictionary_id}/graph/terms/{term_id}/reachable", name="term_reachable")
+async def get_term_reachable(
+        dictionary_id: int,
+        term_id: int,
+        direction: GraphDirection = Query(GraphDirection.outgoing),
+        max_depth: Optional[int] = Query(None, ge=1),
+        phrase_type: Optional[List[str]] = Query(None),
+        db: Session = Depends(get_session)
+) -> JSONResponse:
+    """Транзитивное замыкание: все термины, достижимые из термина по связям, с длиной пути (depth)"""
+    not_found = _graph_term_not_found(db, dictionary_id, term_id)
+    if not_found is not None:
+        return not_found
+
+    return JSONResponse(content={
+        "success": True,
+        "data": term_graphs.reachable_terms(db, dictionary_id, term_id, direction, max_depth, phrase_type)
+    })
+
+
+@api_router.get("/dictionary/{dictionary_id}/graph/components", name="term_graph_components")
+async def get_term_graph_components(dictionary_id: int, db: Session = Depends(get_session)) -> JSONResponse:
+    """Компоненты связности графа связей словаря (id терминов), от больших к меньшим"""
+    not_found = _graph_term_not_found(db, dictionary_id)
+    if not_found is not None:
+        return not_found
+
+    graph = term_graphs.get(db, dictionary_id)
+    return JSONResponse(content={
+        "success": True,
+        "data": {"terms": len(graph), "connections": graph.edge_count, "components": graph.components()}
+    })
+
+
+@api_router.get("/dictionary/{dictionary_id}/graph/cycles", name="term_graph_cycles")
+async def get_term_graph_cycles(dictionary_id: int, db: Session = Depends(get_session)) -> JSONResponse:
+    """Циклы в связях словаря: группы терминов (сильно связные компоненты), лежащих на циклах"""
+    not_found = _graph_term_not_found(db, dictionary_id)
+    if not_found is not None:
+        return not_found
+
+    cycles = term_graphs.get(db, dictionary_id).cycles()
+    return JSONResponse(content={"success": True, "data": {"has_cycles": bool(cycles), "cycles": cycles}})
+
+
 @api_router.get("/dictionaries", name="get_all_dictionaries")
-async def get_all_dicts(dict_service: DictionaryService = Depends(DictionaryService)) -> JSONResponse:
-    """Получение списка словарей с краткой сводкой для каждого"""
+async def get_all_dicts(
+        limit: int = Query(DICTIONARY_PAGE_SIZE, ge=1, le=1000),
+        cursor: Optional[str] = Query(None),
+        dict_service: DictionaryService = Depends(DictionaryService)
+) -> JSONResponse:
+    """Получение страницы списка словарей с краткой сводкой для каждого (следующая - по next_cursor)"""
     try:
-        dictionaries_dto = dict_service.get_short_dictionaries_from_db(True)
+        page = dict_service.get_short_dictionaries_from_db(True, limit, cursor)
 
         return JSONResponse(
             content={
                 "success": True,
-                "data": [asdict(dto) for dto in dictionaries_dto]
+                "data": [asdict(dto) for dto in page.dictionaries],
+                "next_cursor": page.next_cursor
             }
         )
+    except InvalidPageCursor as e:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "message": str(e)}
+        )
     except Exception as e:
         logger.error(msg=f"Error getting dictionaries: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -165,7 +597,7 @@ async def merge_dictionaries(
         return JSONResponse(
             content={"success": True, "message": "Словари успешно объединены"}
         )
-    except InvalidConnDictDTO as e:
+    except (InvalidConnDictDTO, InvalidDictionaryOperation) as e:
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content={
@@ -179,3 +611,34 @@ async def merge_dictionaries(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"success": False, "message": str(e)}
         )
+
+
+@api_router.post("/dictionary/{target_dict_id}/merge/dictionaries")
+async def merge_saved_dictionaries(
+        target_dict_id: int,
+        merge_dto: DictionaryMergeDTO,
+        dict_service: DictionaryService = Depends(DictionaryService)
+) -> JSONResponse:
+    """Слияние одного или нескольких сохранённых словарей с целевым (по id, без передачи содержимого)"""
+    try:
+        merged = dict_service.merge_dictionaries_by_ids(merge_dto.source_ids, target_dict_id)
+        if not merged:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "Целевой словарь не найден"}
+            )
+
+        return JSONResponse(
+            content={"success": True, "message": "Словари успешно объединены"}
+        )
+    except InvalidDictionaryOperation as e:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"success": False, "message": str(e)}
+        )
+    except Exception as e:
+        logger.error(msg=f"Error merging dictionaries: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": str(e)}
+        )
@@ -1,5 +1,7 @@
+import asyncio
+from concurrent.futures import CancelledError
 from dataclasses import asdict
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter, UploadFile, Form, File, Depends, Query
 from sqlmodel import Session, select
@@ -8,10 +10,12 @@ from starlette.requests import Request
 from starlette.responses import HTMLResponse
 from starlette.templating import Jinja2Templates
 
+from src.services.analysis_jobs import analysis_jobs
 from src.services.phrase_service import PhraseService
 from src.services.dictionary_service import DictionaryService
+from src.services.exceptions import InvalidPageCursor, InvalidSearchCursor
+from src.services.search_service import search_service
 from src.services.text_service import TextService
-from src.analysis.tfidf import search_phrases_with_tfidf, search_sentences_in_text_with_tfidf
 from config import logger, ANALYSIS_DIR
 from database import get_session
 from src.database.models import Dictionary, PhraseType
@@ -40,7 +44,7 @@ async def analyze_text(
         request: Request,
         text: Optional[str] = Form(None),
         file: UploadFile = File(None),
-        phrase_extractor: PhraseExtractor = Depends(PhraseExtractor)
+        cluster: bool = Form(False)
 ) -> HTMLResponse:
     """Обработка и отображение заданного для анализа текста"""
     if not text and not file.filename:
@@ -51,10 +55,12 @@ async def analyze_text(
             "error": "Был введён пустой текст или не выбран файл"
         })
 
-    content = text or ""
+    job = None
     if file and file.filename:
+        # Файл (в т.ч. сжатый gzip) читается и анализируется потоково, целиком в память не загружается
         try:
-            content = (await file.read()).decode("utf-8")
+            file_path, content_hash = await TextService.spool_upload_file(file)
+            job = analysis_jobs.submit_file(file_path, content_hash)
         except Exception as e:
             logger.error(msg=f"Error reading file: {str(e)}", exc_info=True)
             return templates.TemplateResponse("index.html.jinja", {
@@ -64,18 +70,39 @@ async def analyze_text(
             })
 
     try:
-        analysis = phrase_extractor.analyze_text_with_stats(content)
-
-        for phrase in analysis["phrases"]:
-            phrase["color"] = PATTERN_COLOR.get(phrase["type"], "black")
+        # Анализ выполняется в пуле процессов, повторный анализ того же текста отдаётся из кэша
+        analysis = await analysis_jobs.wait(job or analysis_jobs.submit(text))
+        # Кластеризация быстрее анализа, поэтому применяется к результату из кэша, а не кэшируется сама;
+        # выполняется в потоке, чтобы не занимать event loop
+        if cluster:
+            analysis = await asyncio.get_running_loop().run_in_executor(
+                None, PhraseExtractor.cluster_analysis_result, analysis
+            )
+
+        # Результат задачи общий для всех её ожидающих (и отдаётся через API), поэтому цвет
+        # добавляется в копии фраз, а не в сам результат
+        analysis = {
+            **analysis,
+            "phrases": [
+                {**phrase, "color": PATTERN_COLOR.get(phrase["type"], "black")} for phrase in analysis["phrases"]
+            ]
+        }
 
         return templates.TemplateResponse("index.html.jinja", {
             "request": request,
             "pattern_with_colors": PATTERN_COLOR,
             "result_analysis": analysis,
-            "text_analysis": text
+            "text_analysis": text,
+            "cluster": cluster
         })
 
+    except CancelledError:
+        logger.warning(msg="Analysis job was cancelled")
+        return templates.TemplateResponse("index.html.jinja", {
+            "request": request,
+            "pattern_with_colors": PATTERN_COLOR,
+            "error": "Анализ текста был отменён"
+        })
     except Exception as e:
         logger.error(msg=f"Analysis error {str(e)}", exc_info=True)
         return templates.TemplateResponse("index.html.jinja", {
@@ -115,13 +142,22 @@ async def create_dictionary(
 @views_router.get("/dictionaries", name="list_dictionaries")
 async def list_dictionaries(
         request: Request,
+        cursor: Optional[str] = Query(None),
         dict_service: DictionaryService = Depends(DictionaryService)
 ) -> HTMLResponse:
-    """Страница со списком всех словарей"""
+    """Страница со списком словарей (постранично)"""
     try:
+        page = dict_service.get_short_dictionaries_from_db(cursor=cursor)
         return templates.TemplateResponse("dictionaries_list.html.jinja", {
             "request": request,
-            "dictionaries": dict_service.get_short_dictionaries_from_db()
+            "dictionaries": page.dictionaries,
+            "next_cursor": page.next_cursor,
+            "is_first_page": cursor is None
+        })
+    except InvalidPageCursor:
+        return templates.TemplateResponse("error.html.jinja", {
+            "request": request,
+            "error": "Некорректная ссылка на страницу списка словарей"
         })
     except Exception as e:
         logger.error(msg=f"Error listing dictionaries: {str(e)}", exc_info=True)
@@ -167,52 +203,31 @@ async def edit_dictionary(
 
 
 @views_router.get("/search", name="search")
-async def search(
+def search(
         request: Request,
         query: Optional[str] = Query(None),
+        dictionary_id: Optional[List[int]] = Query(None),
+        cursor: Optional[str] = Query(None),
         db: Session = Depends(get_session)
 ) -> HTMLResponse:
     """Страница поиска по словарям"""
-    # TODO: Переосмыслить поиск в issue #20
-    result = []
+    page = None
     if (query is not None) and (query != ""):
-        dictionaries = db.exec(
-            select(Dictionary)
-            .order_by(Dictionary.updated_at)
-            .limit(3)
-        ).all()
-
-        for dictionary in dictionaries:
-            dict_entry = {
-                "dictionary": dictionary,
-                "terms": []
-            }
-
-            # 1. Ищем все подходящие термины.
-            # Вытягивает только не скрытые термины.
-            #   Можно было бы сделать это в запросе, но я так и не разобрался как нормально это сделать...
-            dict_terms = [t for t in dictionary.terms if t.hidden is False]
-            terms_with_sims = search_phrases_with_tfidf(query=query, phrases=dict_terms)
-
-            for term, sim in terms_with_sims:
-                term_entry = {
-                    "term": term,
-                    "similarity": sim,
-                    "sentences": []
-                }
-                # 2. Поиск термина во всех текстах словаря
-                for document in dictionary.documents:
-                    if document.content == "":
-                        continue
-                    sentences = search_sentences_in_text_with_tfidf(
-                        query=term.text,
-                        text=document.content
-                    )
-                    term_entry["sentences"] = term_entry["sentences"] + sentences
-                dict_entry["terms"].append(term_entry)
-            result.append(dict_entry)
+        try:
+            page = search_service.search(db, query, dictionary_id, cursor=cursor)
+        except InvalidSearchCursor as e:
+            logger.error(msg=f"Error search: {str(e)}", exc_info=True)
+            return templates.TemplateResponse("error.html.jinja", {
+                "request": request,
+                "error": "Некорректная ссылка на страницу результатов поиска"
+            })
 
     return templates.TemplateResponse("search.html.jinja", {
         "request": request,
-        "search_results": result
+        "dictionaries": db.exec(
+            select(Dictionary.id, Dictionary.name).where(Dictionary.deleted_at.is_(None)).order_by(Dictionary.name)
+        ).all(),
+        "selected_dictionary_ids": dictionary_id or [],
+        "search_results": page.results if page else [],
+        "next_cursor": page.next_cursor if page else None,
     })
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from config import ANALYSIS_BATCH_WORKERS, logger
+from src.services.analysis_cache import analysis_cache
+from src.services.worker_pool import analyze_file_in_worker, analyze_text_in_worker, create_process_pool
+
+
+@dataclass
+class BatchDocument:
+    """Документ пакета: текст или файл, сохранённый TextService.spool_upload_file (с хэшем его содержимого)"""
+    name: str
+    content: Optional[str] = None
+    file_path: Optional[str] = None
+    content_hash: Optional[str] = None
+
+    def cache_key(self) -> str:
+        if self.file_path is not None:
+            return analysis_cache.make_key_from_hash(self.content_hash)
+        return analysis_cache.make_key(self.content)
+
+
+class BatchAnalysisService:
+    """
+    Пакетный анализ множества документов.
+    Документы раздаются по пулу процессов (по умолчанию - по процессу на ядро),
+    уже проанализированные ранее тексты берутся из кэша анализа.
+    """
+
+    def __init__(self, max_workers: int = ANALYSIS_BATCH_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = create_process_pool(self.max_workers)
+            return self._executor
+
+    async def analyze(self, documents: List[BatchDocument], phrases_limit: Optional[int] = None) -> Dict:
+        """
+        :param documents: тексты и файлы (файлы читаются обработчиками потоково и остаются на диске)
+        :param phrases_limit: сколько фраз каждого документа вернуть (по умолчанию все)
+        :return: результаты по каждому документу и общая сводка
+        """
+        loop = asyncio.get_running_loop()
+        # Хэширование текстов и чтение кэша с диска - вне event loop
+        keys = await loop.run_in_executor(None, lambda: [document.cache_key() for document in documents])
+        results = await loop.run_in_executor(None, lambda: [analysis_cache.get(key) for key in keys])
+        from_cache = [result is not None for result in results]
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            executor = self._get_executor()
+            futures = [asyncio.wrap_future(self._submit(executor, documents[i])) for i in pending]
+            computed = await asyncio.gather(*futures, return_exceptions=True)
+            for i, result in zip(pending, computed):
+                if isinstance(result, BaseException):
+                    logger.error(
+                        msg=f"Batch analysis of '{documents[i].name}' failed: {str(result)}", exc_info=result
+                    )
+                    continue
+                results[i] = result
+            stored = [i for i in pending if results[i] is not None]
+            await loop.run_in_executor(None, lambda: [analysis_cache.put(keys[i], results[i]) for i in stored])
+
+        summary = self.summarize([result for result in results if result is not None])
+
+        document_entries = []
+        for document, result, cached in zip(documents, results, from_cache):
+            if result is None:
+                document_entries.append({
+                    "name": document.name, "success": False, "message": "Ошибка при анализе документа"
+                })
+                continue
+            if phrases_limit is not None:
+                # Новый словарь: сам результат (в т.ч. взятый из кэша) не меняется
+                result = {**result, "phrases": result["phrases"][:phrases_limit]}
+            document_entries.append({"name": document.name, "success": True, "from_cache": cached, "result": result})
+
+        return {"documents": document_entries, "summary": summary}
+
+    @staticmethod
+    def _submit(executor: ProcessPoolExecutor, document: BatchDocument) -> Future:
+        if document.file_path is not None:
+            # Пакет уже занимает по процессу на документ, поэтому файл считается без своего пула кусков
+            return executor.submit(analyze_file_in_worker, document.file_path, 1)
+        return executor.submit(analyze_text_in_worker, document.content)
+
+    @staticmethod
+    def summarize(results: List[Dict], top_k: int = 100) -> Dict:
+        """
+        Общая сводка по документам: кол-во фраз по типам и самые распространённые фразы
+        (по числу документов, в которых они встретились, затем по сумме TF-IDF).
+        """
+        document_frequency = Counter()
+        tfidf_sum = defaultdict(float)
+        phrase_types = {}
+        type_counts = Counter()
+
+        for result in results:
+            for phrase in result["phrases"]:
+                text = phrase["phrase"]
+                document_frequency[text] += 1
+                tfidf_sum[text] += phrase["tfidf_score"]
+                phrase_types[text] = phrase["type"]
+                type_counts[phrase["type"]] += 1
+
+        top_phrases = sorted(document_frequency, key=lambda p: (-document_frequency[p], -tfidf_sum[p], p))[:top_k]
+
+        return {
+            "total_documents": len(results),
+            "total_phrases": sum(result["total_phrases"] for result in results),
+            "unique_phrases": len(document_frequency),
+            "phrase_types": dict(type_counts),
+            "top_phrases": [
+                {
+                    "phrase": text,
+                    "type": phrase_types[text],
+                    "documents": document_frequency[text],
+                    "tfidf_sum": tfidf_sum[text],
+                }
+                for text in top_phrases
+            ],
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+batch_analysis = BatchAnalysisService()
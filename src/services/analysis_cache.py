@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+from typing import Callable, Dict
+
+from config import (
+    ANALYSIS_CACHE_DIR,
+    ANALYSIS_CACHE_MEMORY_SIZE,
+    ANALYSIS_CACHE_DISK_BYTES,
+    TFIDF_HASH_BUCKETS,
+    logger,
+)
+from src.analysis.consts import ANALYZER_VERSION
+from src.analysis.patterns import PATTERN_MATCHER
+from src.services.text_service import TextService
+from src.utils.lru_cache import LRUCache
+
+
+class AnalysisCache:
+    """
+    Двухуровневый кэш результатов analyze_text_with_stats: LRU в памяти + JSON-файлы на диске.
+    Ключ - хэш содержимого текста вместе с версией анализатора, набором POS-шаблонов
+    и режимом подсчёта TF-IDF (точный или хэширующий с заданным числом корзин).
+    При превышении лимита размера на диске удаляются давно не использованные файлы.
+    """
+
+    def __init__(
+            self,
+            directory: str = ANALYSIS_CACHE_DIR,
+            memory_size: int = ANALYSIS_CACHE_MEMORY_SIZE,
+            disk_max_bytes: int = ANALYSIS_CACHE_DISK_BYTES
+    ):
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        # В памяти храним сериализованный JSON: каждый get отдаёт независимую копию результата
+        self._memory: LRUCache[str, str] = LRUCache(memory_size)
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._disk_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.json')
+        )
+
+    @staticmethod
+    def make_key(content: str) -> str:
+        return AnalysisCache.make_key_from_hash(TextService.get_text_content_hash(content))
+
+    @staticmethod
+    def make_key_from_hash(content_hash: str) -> str:
+        mode = f"h{TFIDF_HASH_BUCKETS}_" if TFIDF_HASH_BUCKETS else ""
+        return f"{ANALYZER_VERSION}_{PATTERN_MATCHER.fingerprint}_{mode}{content_hash}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Dict | None:
+        raw = self._memory.get(key)
+        if raw is None:
+            raw = self._read_disk(key)
+            if raw is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            with self._lock:
+                self.disk_hits += 1
+            self._memory.put(key, raw)
+        return json.loads(raw)
+
+    def put(self, key: str, result: Dict) -> None:
+        raw = json.dumps(result, ensure_ascii=False)
+        self._memory.put(key, raw)
+        self._write_disk(key, raw)
+
+    def get_or_compute(self, content: str, compute: Callable[[str], Dict]) -> Dict:
+        key = self.make_key(content)
+        result = self.get(key)
+        if result is None:
+            result = compute(content)
+            self.put(key, result)
+        return result
+
+    def _read_disk(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = f.read()
+            # Обновляем mtime - по нему вытесняются давно не использованные записи
+            os.utime(path)
+            return raw
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, raw: str) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(raw)
+            size = os.path.getsize(tmp_path)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(msg=f"Error writing analysis cache: {str(e)}", exc_info=True)
+            return
+
+        with self._lock:
+            self._disk_bytes += size - old_size
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk(keep=path)
+
+    def _evict_disk(self, keep: str) -> None:
+        """Удаляет самые старые по mtime файлы, пока размер кэша не уложится в лимит"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            if entry.path == keep:
+                continue
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._disk_bytes -= size
+            self.disk_evictions += 1
+
+    def stats(self) -> Dict[str, int | float]:
+        memory = self._memory.stats()
+        total = memory['hits'] + self.disk_hits + self.misses
+        return {
+            'memory_size': memory['size'],
+            'memory_hits': memory['hits'],
+            'memory_evictions': memory['evictions'],
+            'disk_bytes': self._disk_bytes,
+            'disk_hits': self.disk_hits,
+            'disk_evictions': self.disk_evictions,
+            'misses': self.misses,
+            'hit_rate': (memory['hits'] + self.disk_hits) / total if total else 0.0,
+        }
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,247 @@
+import asyncio
+import enum
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, CancelledError
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from config import ANALYSIS_JOB_WORKERS, ANALYSIS_JOB_RETENTION, ANALYSIS_SHARD_SIZE, ANALYSIS_SHARD_WORKERS, logger
+from src.services.analysis_cache import analysis_cache
+from src.services.worker_pool import (
+    analyze_file_in_worker,
+    analyze_sharded_text_in_worker,
+    analyze_text_in_worker,
+    create_process_pool,
+)
+
+
+class JobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+FINISHED_STATUSES = {JobStatus.done, JobStatus.failed, JobStatus.cancelled}
+
+
+@dataclass
+class AnalysisJob:
+    id: str
+    status: JobStatus = JobStatus.queued
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    result: Optional[Dict] = field(default=None, repr=False)
+    error: Optional[str] = None
+    from_cache: bool = False
+    future: Optional[Future] = field(default=None, repr=False)
+    # Ожидающие завершения корутины: (event loop, asyncio.Future)
+    _waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def finish(self, status: JobStatus, result: Optional[Dict] = None, error: Optional[str] = None) -> bool:
+        """
+        Переводит задачу в конечный статус (только один раз) и будит ожидающих.
+        Вызывается из любого потока: колбэка future, обработчика запроса на отмену.
+        :return: False, если задача уже была завершена
+        """
+        with self._lock:
+            if self.finished:
+                return False
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self.status = status
+            waiters, self._waiters = self._waiters, []
+
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve_waiter, waiter)
+            except RuntimeError:
+                # Event loop ожидающего уже закрыт
+                pass
+        return True
+
+    async def wait_finished(self) -> None:
+        """Дожидается конечного статуса без опроса"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.finished:
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        await waiter
+
+    def refresh_status(self) -> JobStatus:
+        # Пул процессов не сообщает о начале выполнения, поэтому спрашиваем у future
+        with self._lock:
+            if self.status == JobStatus.queued and self.future is not None and self.future.running():
+                self.status = JobStatus.running
+            return self.status
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.refresh_status().value,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "from_cache": self.from_cache,
+        }
+
+
+def _resolve_waiter(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AnalysisJobManager:
+    """
+    Очередь фоновых задач анализа текста.
+    CPU-тяжёлый анализ выполняется в ограниченном пуле процессов, а не в event loop,
+    поэтому остальные запросы продолжают обслуживаться во время анализа больших текстов.
+    Тексты длиннее ANALYSIS_SHARD_SIZE и файлы целиком обрабатывает процесс пула: куски больших текстов
+    считаются в его собственном постоянном пуле из shard_workers процессов, объединение и оценка - в нём самом,
+    так что в веб-процесс возвращается только итоговый результат.
+    """
+
+    def __init__(
+            self,
+            max_workers: int = ANALYSIS_JOB_WORKERS,
+            retention: int = ANALYSIS_JOB_RETENTION,
+            shard_workers: int = ANALYSIS_SHARD_WORKERS
+    ):
+        self.max_workers = max_workers
+        self.retention = retention
+        self.shard_workers = shard_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: OrderedDict[str, AnalysisJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = create_process_pool(self.max_workers)
+            return self._executor
+
+    def submit(self, content: str) -> AnalysisJob:
+        def start() -> Future:
+            if len(content) > ANALYSIS_SHARD_SIZE:
+                return self._get_executor().submit(analyze_sharded_text_in_worker, content, self.shard_workers)
+            return self._get_executor().submit(analyze_text_in_worker, content)
+
+        return self._submit(analysis_cache.make_key(content), start)
+
+    def submit_file(self, file_path: str, content_hash: str) -> AnalysisJob:
+        """
+        Анализ текста из файла (см. TextService.spool_upload_file): файл читается потоково
+        и удаляется после завершения задачи.
+        """
+        job = self._submit(
+            analysis_cache.make_key_from_hash(content_hash),
+            lambda: self._get_executor().submit(analyze_file_in_worker, file_path, self.shard_workers)
+        )
+        if job.future is None:
+            os.remove(file_path)
+        else:
+            job.future.add_done_callback(lambda _: os.remove(file_path))
+        return job
+
+    def _submit(self, cache_key: str, start: Callable[[], Future]) -> AnalysisJob:
+        job = AnalysisJob(id=uuid.uuid4().hex)
+
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            job.from_cache = True
+            job.finish(JobStatus.done, result=cached)
+        else:
+            job.future = start()
+            job.future.add_done_callback(lambda future: self._on_done(job, cache_key, future))
+
+        self._remember(job)
+        return job
+
+    def _on_done(self, job: AnalysisJob, cache_key: str, future: Future):
+        if future.cancelled():
+            job.finish(JobStatus.cancelled)
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(msg=f"Analysis job {job.id} failed: {str(e)}", exc_info=e)
+            job.finish(JobStatus.failed, error=str(e))
+            return
+
+        analysis_cache.put(cache_key, result)
+        # Задачу могли отменить уже во время выполнения - тогда результат только кэшируем
+        job.finish(JobStatus.done, result=result)
+
+    def _remember(self, job: AnalysisJob):
+        with self._lock:
+            self._jobs[job.id] = job
+            # Забываем самые старые завершённые задачи сверх лимита
+            for job_id in [j.id for j in self._jobs.values() if j.finished]:
+                if len(self._jobs) <= self.retention:
+                    break
+                del self._jobs[job_id]
+
+    def get(self, job_id: str) -> AnalysisJob | None:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> AnalysisJob | None:
+        """
+        Отменяет задачу. Ожидающая в очереди задача снимается с выполнения,
+        у уже выполняющейся отбрасывается результат (процесс-обработчик нельзя прервать без потери пула).
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+
+        # Успешная отмена future завершает задачу через _on_done
+        if job.future is None or not job.future.cancel():
+            job.finish(JobStatus.cancelled)
+        return job
+
+    async def wait(self, job: AnalysisJob) -> Dict:
+        """
+        Дожидается результата задачи, не блокируя event loop.
+        :raises CancelledError: (concurrent.futures) задача отменена - обычное Exception, а не asyncio.CancelledError
+        """
+        await job.wait_finished()
+
+        if job.status == JobStatus.failed:
+            raise RuntimeError(job.error)
+        if job.status == JobStatus.cancelled:
+            raise CancelledError(f"Analysis job {job.id} was cancelled")
+        return job.result
+
+    async def iter_events(self, job: AnalysisJob, interval: float = 0.5) -> AsyncIterator[str]:
+        """Поток server-sent events с изменениями статуса задачи"""
+        last_status = None
+        while True:
+            status = job.refresh_status()
+            if status != last_status:
+                last_status = status
+                yield f"data: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+            if job.finished:
+                break
+            await asyncio.sleep(interval)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+analysis_jobs = AnalysisJobManager()
@@ -0,0 +1,99 @@
+import threading
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from config import DICTIONARY_PURGE_BATCH_SIZE, DICTIONARY_PURGE_INTERVAL, logger
+from database import engine
+from src.database.models import Connection, Dictionary, Document, Term
+from src.services.sentence_index_service import sentence_indexes
+
+
+class DictionaryPurger:
+    """
+    Фоновое удаление строк словарей, помеченных удалёнными (Dictionary.deleted_at).
+    Строки удаляются пачками по batch_size, каждая пачка - в своей короткой транзакции,
+    поэтому удаление большого словаря не держит долгих блокировок и не занимает обработчик запроса.
+    Поток просыпается раз в interval секунд или сразу после wake().
+    """
+
+    def __init__(self, batch_size: int = DICTIONARY_PURGE_BATCH_SIZE, interval: int = DICTIONARY_PURGE_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="dictionary-purger", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def shutdown(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        # Флаг прерывает только фоновый поток; после его остановки purge_pending можно вызывать напрямую
+        self._stopped.clear()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                self.purge_pending()
+            except Exception as e:
+                logger.error(msg=f"Dictionary purge error: {str(e)}", exc_info=True)
+            self._wakeup.wait(self.interval)
+
+    def purge_pending(self) -> int:
+        """
+        Удаляет все словари, помеченные удалёнными.
+        :return: кол-во удалённых словарей
+        """
+        with engine.connect() as conn:
+            dictionary_ids = conn.execute(
+                select(Dictionary.id).where(Dictionary.deleted_at.is_not(None)).order_by(Dictionary.deleted_at)
+            ).scalars().all()
+
+        purged = 0
+        for dictionary_id in dictionary_ids:
+            if self._stopped.is_set():
+                break
+            self.purge(dictionary_id)
+            purged += 1
+        return purged
+
+    def purge(self, dictionary_id: int) -> None:
+        """Удаляет связи, термины и документы словаря пачками, затем сам словарь"""
+        for table in (Connection.__table__, Term.__table__, Document.__table__):
+            while not self._stopped.is_set():
+                with engine.begin() as conn:
+                    ids = conn.execute(
+                        select(table.c.id).where(table.c.dictionary_id == dictionary_id).limit(self.batch_size)
+                    ).scalars().all()
+                    if ids:
+                        conn.execute(delete(table).where(table.c.id.in_(ids)))
+                if table is Document.__table__:
+                    for document_id in ids:
+                        sentence_indexes.drop(document_id)
+                if len(ids) < self.batch_size:
+                    break
+
+        if self._stopped.is_set():
+            return
+        with engine.begin() as conn:
+            conn.execute(
+                delete(Dictionary.__table__)
+                .where(Dictionary.__table__.c.id == dictionary_id, Dictionary.__table__.c.deleted_at.is_not(None))
+            )
+        logger.info(msg=f"Dictionary {dictionary_id} purged")
+
+
+dictionary_purger = DictionaryPurger()
@@ -1,14 +1,79 @@
-from typing import List, Type
-
-from sqlalchemy import delete
+import base64
+import binascii
+import json
+from datetime import datetime, UTC
+from typing import Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    and_,
+    bindparam,
+    delete,
+    exists,
+    false,
+    func,
+    insert,
+    inspect,
+    literal,
+    or_,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import select, Session
 
 from src.models.phrase_type import PhraseType
-from src.services.exceptions import InvalidConnDictDTO
+from config import DICTIONARY_PAGE_SIZE, VL_TIMEZONE
+from src.services.exceptions import (
+    DatabaseMigrationRequired,
+    DictionaryVersionConflict,
+    InvalidConnDictDTO,
+    InvalidDictionaryOperation,
+    InvalidPageCursor,
+)
+from src.services.dictionary_purger import dictionary_purger
+from src.services.search_cache import search_cache
+from src.services.sentence_index_service import sentence_indexes
+from src.services.term_graph_service import term_graphs
+from src.services.term_index_service import term_indexes
+from src.services.term_prefix_index_service import term_prefix_indexes
+from src.analysis.embeddings import embed_text, embed_texts
 from src.analysis.phrase_extractor import PhraseExtractor
 from database import get_session
-from src.database.models import Dictionary, Document, Term, Connection
-from src.models.dto import DictionaryShortDTO, DictionaryDTO, TermDTO, ConnectionDTO
+from src.database.models import (
+    TERM_UNIQUE_INDEX,
+    Connection,
+    Dictionary,
+    Document,
+    Term,
+    active_dictionary_ids,
+    get_active_dictionary,
+)
+from src.database.upsert import insert_ignoring_conflicts
+from src.models.dto import (
+    ConnectionDTO,
+    DictionaryDTO,
+    DictionaryOperationsDTO,
+    DictionaryShortDTO,
+    DictionaryShortPageDTO,
+    TermDTO,
+    TermOperationDTO,
+)
+
+
+# Временная таблица соответствия id терминов исходных словарей id терминов целевого при слиянии.
+# Удаляется только после успешного слияния: при ошибке Postgres откатывает её создание вместе с транзакцией,
+# а DROP в прерванной транзакции заменил бы исходную ошибку на InFailedSqlTransaction
+_merge_term_id_map = Table(
+    "merge_term_id_map",
+    MetaData(),
+    Column("old_id", Integer, primary_key=True),
+    Column("new_id", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+)
 
 
 class DictionaryService:
@@ -16,34 +81,78 @@ class DictionaryService:
         self.phrase_extractor = PhraseExtractor()
         self.gen_session = get_session()
 
+    @staticmethod
+    def encode_page_cursor(created_at: datetime, dictionary_id: int) -> str:
+        raw = json.dumps([created_at.isoformat(), dictionary_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def decode_page_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            created_at, dictionary_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return datetime.fromisoformat(created_at), int(dictionary_id)
+        except (binascii.Error, UnicodeError, ValueError, TypeError) as e:
+            raise InvalidPageCursor(f"Некорректный курсор списка словарей: {cursor}") from e
+
     def get_short_dictionaries_from_db(
             self,
-            with_timestamp: bool = False
-    ) -> List[DictionaryShortDTO]:
-        with next(self.gen_session) as db:
-            dictionaries = db.exec(select(Dictionary)).all()
-
-            dictionaries_data = [
-                DictionaryShortDTO(
-                    id=dictionary.id,
-                    name=dictionary.name,
-                    created_at=dictionary.created_at_local
-                    if not with_timestamp
-                    else dictionary.created_at_local.timestamp(),
-                    terms_count=len(dictionary.terms),
-                    connections_count=len(dictionary.connections)
-                )
-                for dictionary in dictionaries
-            ]
-
-            # Сортировка по дате создания (DESC)
-            dictionaries_data.sort(key=lambda x: x.created_at, reverse=True)
+            with_timestamp: bool = False,
+            limit: int = DICTIONARY_PAGE_SIZE,
+            cursor: Optional[str] = None
+    ) -> DictionaryShortPageDTO:
+        """
+        Страница списка словарей по убыванию даты создания.
+        Кол-во терминов и связей считается в том же запросе подзапросами только для словарей страницы,
+        а страницы задаются курсором (created_at, id) последнего словаря - без OFFSET,
+        поэтому время загрузки страницы не зависит ни от её номера, ни от размера словарей.
+        :param cursor: next_cursor предыдущей страницы
+        """
+        terms_count = (
+            select(func.count(Term.id))
+            .where(Term.dictionary_id == Dictionary.id)
+            .correlate(Dictionary)
+            .scalar_subquery()
+        )
+        connections_count = (
+            select(func.count(Connection.id))
+            .where(Connection.dictionary_id == Dictionary.id)
+            .correlate(Dictionary)
+            .scalar_subquery()
+        )
+        statement = (
+            select(Dictionary.id, Dictionary.name, Dictionary.created_at, terms_count, connections_count)
+            .where(Dictionary.deleted_at.is_(None))
+            .order_by(Dictionary.created_at.desc(), Dictionary.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor:
+            created_at, dictionary_id = self.decode_page_cursor(cursor)
+            statement = statement.where(or_(
+                Dictionary.created_at < created_at,
+                and_(Dictionary.created_at == created_at, Dictionary.id < dictionary_id)
+            ))
 
-            return dictionaries_data
+        with next(self.gen_session) as db:
+            rows = db.exec(statement).all()
+
+        page = rows[:limit]
+        next_cursor = self.encode_page_cursor(page[-1][2], page[-1][0]) if len(rows) > limit else None
+
+        dictionaries_data = []
+        for dictionary_id, name, created_at, dictionary_terms_count, dictionary_connections_count in page:
+            created_at_local = created_at.astimezone(VL_TIMEZONE)
+            dictionaries_data.append(DictionaryShortDTO(
+                id=dictionary_id,
+                name=name,
+                created_at=created_at_local if not with_timestamp else created_at_local.timestamp(),
+                terms_count=dictionary_terms_count,
+                connections_count=dictionary_connections_count
+            ))
+        return DictionaryShortPageDTO(dictionaries=dictionaries_data, next_cursor=next_cursor)
 
     def get_dict_with_terms_and_connections(self, dictionary_id) -> DictionaryDTO | None:
         with next(self.gen_session) as db:
-            dictionary = db.get(Dictionary, dictionary_id)
+            dictionary = get_active_dictionary(db, dictionary_id)
             if not dictionary:
                 return None
 
@@ -84,7 +193,8 @@ class DictionaryService:
                 name=dictionary.name,
                 tfidf_range=dictionary.tfidf_range,
                 phrases=dict_terms,
-                connections=connections
+                connections=connections,
+                version=dictionary.version
             )
 
     def save_dictionary_by_dto(self, dict_dto: DictionaryDTO) -> int:
@@ -98,10 +208,11 @@ class DictionaryService:
                 db.add(dict_obj)
                 db.flush()
 
-                db.add(Document(
+                document_obj = Document(
                     content=dict_dto.document_text,
                     dictionary_id=dict_obj.id
-                ))
+                )
+                db.add(document_obj)
 
                 # 3) Обрабатываем термины и связи
                 try:
@@ -109,19 +220,27 @@ class DictionaryService:
                 except Exception as e:
                     raise e
 
-                return dict_obj.id
+            term_indexes.refresh(db, dict_obj.id)
+            term_prefix_indexes.refresh(db, dict_obj.id)
+            sentence_indexes.build(document_obj.id, document_obj.content)
+            return dict_obj.id
 
     def update_dictionary_by_dto(self, dict_dto: DictionaryDTO, dict_id) -> bool:
         with next(self.gen_session) as db:
             with db.begin():
                 # 1) Находим словарь
-                dict_obj = db.get(Dictionary, dict_id)
+                dict_obj = get_active_dictionary(db, dict_id)
                 if not dict_obj:
                     return False
+                if dict_dto.version is not None and dict_dto.version != dict_obj.version:
+                    raise DictionaryVersionConflict(dict_obj.version)
 
                 # Обновляем свойства словаря
                 dict_obj.name = dict_dto.name
                 dict_obj.tfidf_range = dict_dto.tfidf_range
+                # Версия словаря для кэша поиска меняется, даже если поля самого словаря те же
+                dict_obj.updated_at = datetime.now(UTC)
+                dict_obj.version += 1
                 db.add(dict_obj)
                 db.flush()
 
@@ -131,28 +250,190 @@ class DictionaryService:
                 except InvalidConnDictDTO as e:
                     raise e
 
+            term_indexes.refresh(db, dict_id)
+            term_prefix_indexes.refresh(db, dict_id)
+
+        term_graphs.drop(dict_id)
+        search_cache.invalidate(dict_id)
         return True
 
-    def delete_dictionary(self, dictionary_id: int) -> bool:
+    def apply_operations(self, dictionary_id: int, ops: DictionaryOperationsDTO) -> Optional[int]:
+        """
+        Применяет пакет операций над терминами и связями словаря в одной транзакции.
+        Версия словаря сверяется и увеличивается одним UPDATE ... WHERE version = :version
+        (оптимистичная блокировка), операции выполняются пачками: по одному запросу на вид операции,
+        а не на каждый термин, поэтому стоимость пропорциональна размеру пакета, а не словаря.
+        :return: новая версия словаря или None, если словарь не найден
+        :raises DictionaryVersionConflict: словарь уже изменён (версия не совпала)
+        :raises InvalidDictionaryOperation, InvalidConnDictDTO: некорректные операции
+        """
+        deleted_ids, updated_terms, added_terms = self._split_term_operations(ops.terms)
+
         with next(self.gen_session) as db:
             with db.begin():
-                # 1) Находим словарь
-                dict_obj = db.get(Dictionary, dictionary_id)
-                if not dict_obj:
-                    return False
+                values = {"version": Dictionary.version + 1, "updated_at": datetime.now(UTC)}
+                if ops.name is not None:
+                    values["name"] = ops.name
+                if ops.tfidf_range is not None:
+                    values["tfidf_range"] = ops.tfidf_range
+                bumped = db.exec(
+                    update(Dictionary)
+                    .where(
+                        Dictionary.id == dictionary_id,
+                        Dictionary.version == ops.version,
+                        Dictionary.deleted_at.is_(None)
+                    )
+                    .values(**values)
+                )
+                if bumped.rowcount == 0:
+                    current_version = db.exec(select(Dictionary.version).where(
+                        Dictionary.id == dictionary_id, Dictionary.deleted_at.is_(None)
+                    )).first()
+                    if current_version is None:
+                        return None
+                    raise DictionaryVersionConflict(current_version)
+
+                # Все упомянутые id существующих терминов проверяются одним запросом
+                referenced_ids = set(deleted_ids) | {term_dto.id for term_dto in updated_terms} | {
+                    term_id
+                    for conn in ops.connections
+                    for term_id in (conn.from_id, conn.to_id)
+                    if term_id > 0
+                }
+                existing_ids = set(db.exec(
+                    select(Term.id).where(Term.dictionary_id == dictionary_id, Term.id.in_(referenced_ids))
+                ).all()) if referenced_ids else set()
+                missing_ids = (set(deleted_ids) | {term_dto.id for term_dto in updated_terms}) - existing_ids
+                if missing_ids:
+                    raise InvalidDictionaryOperation(f"Термины не найдены в словаре: {sorted(missing_ids)}")
+
+                if deleted_ids:
+                    db.exec(delete(Connection).where(  # type: ignore
+                        Connection.dictionary_id == dictionary_id,
+                        or_(Connection.from_term_id.in_(deleted_ids), Connection.to_term_id.in_(deleted_ids))
+                    ))
+                    db.exec(delete(Term).where(Term.id.in_(deleted_ids)))  # type: ignore
+
+                try:
+                    if updated_terms:
+                        embeddings = embed_texts([term_dto.text for term_dto in updated_terms])
+                        db.connection().execute(
+                            update(Term.__table__).where(Term.__table__.c.id == bindparam("term_id")),
+                            [
+                                {
+                                    "term_id": term_dto.id,
+                                    "phrase_type": PhraseType.from_value(term_dto.phrase_type),
+                                    "text": term_dto.text,
+                                    "type": term_dto.type,
+                                    "tfidf": term_dto.tfidf,
+                                    "hidden": term_dto.hidden,
+                                    "embedding": embedding,
+                                }
+                                for term_dto, embedding in zip(updated_terms, embeddings)
+                            ]
+                        )
 
-                # 2) Удаляем связанные документы
-                db.exec(delete(Document).where(Document.dictionary_id == dictionary_id))  # type: ignore
+                    # Временные id добавленных терминов -> id в БД
+                    new_ids = self._insert_terms(db, dictionary_id, added_terms)
+                except IntegrityError:
+                    raise InvalidDictionaryOperation("Термин с таким текстом и типом уже есть в словаре")
+
+                temp_id_mapping = {term_dto.id: new_id for term_dto, new_id in zip(added_terms, new_ids)}
+                alive_ids = existing_ids - set(deleted_ids)
+
+                def resolve(term_id: int) -> int:
+                    resolved = temp_id_mapping.get(term_id) if term_id < 0 else (term_id if term_id in alive_ids else None)
+                    if resolved is None:
+                        raise InvalidConnDictDTO(f"Неверный ID термина в связи: {term_id}")
+                    return resolved
+
+                removed_pairs = set()
+                added_pairs = {}
+                for conn in ops.connections:
+                    pair = (resolve(conn.from_id), resolve(conn.to_id))
+                    if conn.op == 'add':
+                        added_pairs[pair] = None
+                    elif conn.op == 'delete':
+                        removed_pairs.add(pair)
+                        added_pairs.pop(pair, None)
+                    else:
+                        raise InvalidDictionaryOperation(f"Неизвестная операция над связью: {conn.op}")
+
+                if removed_pairs:
+                    db.exec(delete(Connection).where(  # type: ignore
+                        Connection.dictionary_id == dictionary_id,
+                        tuple_(Connection.from_term_id, Connection.to_term_id).in_(removed_pairs)
+                    ))
+                if added_pairs:
+                    # Уже существующие связи не дублируются
+                    existing_pairs = set(db.exec(
+                        select(Connection.from_term_id, Connection.to_term_id).where(
+                            Connection.dictionary_id == dictionary_id,
+                            tuple_(Connection.from_term_id, Connection.to_term_id).in_(list(added_pairs))
+                        )
+                    ).all())
+                    rows = [
+                        {"dictionary_id": dictionary_id, "from_term_id": from_id, "to_term_id": to_id}
+                        for from_id, to_id in added_pairs if (from_id, to_id) not in existing_pairs
+                    ]
+                    if rows:
+                        db.connection().execute(insert(Connection.__table__), rows)
 
-                # 2) Удаляем все связи словаря
-                db.exec(delete(Connection).where(Connection.dictionary_id == dictionary_id))  # type: ignore
+                new_version = db.exec(select(Dictionary.version).where(Dictionary.id == dictionary_id)).one()
 
-                # 3) Удаляем все термины словаря
-                db.exec(delete(Term).where(Term.dictionary_id == dictionary_id))  # type: ignore
+            if ops.terms:
+                term_indexes.refresh(db, dictionary_id)
+                term_prefix_indexes.refresh(db, dictionary_id)
 
-                # 4) Удаляем сам словарь
-                db.delete(dict_obj)
+        term_graphs.drop(dictionary_id)
+        search_cache.invalidate(dictionary_id)
+        return new_version
 
+    @staticmethod
+    def _split_term_operations(term_ops: List[TermOperationDTO]) -> Tuple[List[int], List[TermDTO], List[TermDTO]]:
+        """Операции над терминами -> (id удаляемых, изменяемые термины, добавляемые термины)"""
+        deleted_ids, updated_terms, added_terms = [], [], []
+        for term_op in term_ops:
+            if term_op.op == 'delete':
+                if term_op.id is None:
+                    raise InvalidDictionaryOperation("Для удаления термина нужен id")
+                deleted_ids.append(term_op.id)
+            elif term_op.op in ('add', 'update'):
+                if term_op.term is None or term_op.term.id is None:
+                    raise InvalidDictionaryOperation(f"Для операции {term_op.op} нужен термин с id")
+                if (term_op.op == 'add') != (term_op.term.id < 0):
+                    raise InvalidDictionaryOperation(
+                        "У добавляемого термина id должен быть временным (отрицательным), у изменяемого - id из БД"
+                    )
+                (added_terms if term_op.op == 'add' else updated_terms).append(term_op.term)
+            else:
+                raise InvalidDictionaryOperation(f"Неизвестная операция над термином: {term_op.op}")
+
+        touched = deleted_ids + [term_dto.id for term_dto in updated_terms + added_terms]
+        if len(touched) != len(set(touched)):
+            raise InvalidDictionaryOperation("Термин упомянут в нескольких операциях пакета")
+        return deleted_ids, updated_terms, added_terms
+
+    def delete_dictionary(self, dictionary_id: int) -> bool:
+        """
+        Помечает словарь удалённым одним UPDATE: с этого момента он скрыт из всех запросов,
+        а связи, термины и документы удаляет пачками фоновая очистка (dictionary_purger).
+        """
+        with next(self.gen_session) as db:
+            with db.begin():
+                deleted = db.exec(
+                    update(Dictionary)
+                    .where(Dictionary.id == dictionary_id, Dictionary.deleted_at.is_(None))
+                    .values(deleted_at=datetime.now(UTC))
+                )
+                if deleted.rowcount == 0:
+                    return False
+
+        term_indexes.drop(dictionary_id)
+        term_prefix_indexes.drop(dictionary_id)
+        term_graphs.drop(dictionary_id)
+        search_cache.invalidate(dictionary_id)
+        dictionary_purger.wake()
         return True
 
     def merge_dictionaries(
@@ -160,132 +441,246 @@ class DictionaryService:
             source_dict_data: DictionaryDTO,
             target_dict_id: int
     ) -> bool:
+        """
+        Слияние словаря из DTO с целевым. Сохранённый словарь (с id) сливается по данным из БД,
+        несохранённый (результат анализа) сначала записывается как временный словарь.
+        """
+        if source_dict_data.id:
+            return self.merge_dictionaries_by_ids([source_dict_data.id], target_dict_id)
+
         with next(self.gen_session) as db:
-            # по любому не всё тут учтено, но оно и не надо на самом деле сильно запариваться
             with db.begin():
-                target_dict = db.get(Dictionary, target_dict_id)
-                if not target_dict:
+                if not get_active_dictionary(db, target_dict_id):
                     return False
-                target_dict.tfidf_range = 0
-                db.add(target_dict)
-                db.flush()
 
-                # Добавляем текстовый документ к словарю в который сливаем
-                if source_dict_data.id:
-                    existing_docs = db.exec(
-                        select(Document).where(Document.dictionary_id == source_dict_data.id)
-                    ).all()
-                    for existing_doc in existing_docs:
-                        existing_doc.dictionary_id = target_dict.id
-                        db.add(existing_doc)
-                else:
-                    document_obj = Document(content=source_dict_data.document_text, dictionary_id=target_dict_id)
-                    db.add(document_obj)
+                source_dict = Dictionary(name=source_dict_data.name, tfidf_range=source_dict_data.tfidf_range)
+                db.add(source_dict)
                 db.flush()
-
-                # Умное слияние терминов - учитываем существование в базе
-                existing_terms = db.exec(
-                    select(Term).where(Term.dictionary_id == target_dict_id)
-                ).all()
-                for existing_term in existing_terms:
-                    existing_term.hidden = False
-                    db.add(existing_term)
+                document_obj = Document(content=source_dict_data.document_text, dictionary_id=source_dict.id)
+                db.add(document_obj)
                 db.flush()
-                term_index = {
-                    (t.text, t.type): t.id
-                    for t in existing_terms
-                }
-                old_id_to_new_id = {}
+                self._process_terms_for_new_dictionary(db, source_dict_data, source_dict.id)
 
-                for term_dto in source_dict_data.phrases:
-                    term_key = (term_dto.text, term_dto.type)
-                    if term_key in term_index:
-                        old_id_to_new_id[term_dto.id] = term_index[term_key]
-                    else:
-                        t = Term(
-                            dictionary_id=target_dict_id,
-                            phrase_type=term_dto.phrase_type,
-                            text=term_dto.text,
-                            type=term_dto.type,
-                            tfidf=term_dto.tfidf,
-                            hidden=False
-                        )
-                        db.add(t)
-                        db.flush()
-                        term_index[term_key] = t.id
-                        if term_dto.id is not None:
-                            old_id_to_new_id[term_dto.id] = t.id
-
-                for conn in source_dict_data.connections:
-                    from_id = old_id_to_new_id.get(conn.from_id)
-                    to_id = old_id_to_new_id.get(conn.to_id)
-                    if not from_id or not to_id:
-                        raise InvalidConnDictDTO(f"Неверные ID связей: from={conn.from_id}, to={conn.to_id}")
-
-                    c = Connection(
-                        dictionary_id=target_dict_id,
-                        from_term_id=from_id,
-                        to_term_id=to_id,
-                    )
-                    db.add(c)
+                self._merge_into(db, target_dict_id, [source_dict.id])
 
-                # Удаление исходного словаря, если есть
-                if source_dict_data.id:
-                    source_dict_obj = db.get(Dictionary, source_dict_data.id)
-                    if source_dict_obj:
-                        db.exec(
-                            delete(Connection).where(Connection.dictionary_id == source_dict_obj.id))  # type: ignore
-                        db.exec(delete(Term).where(Term.dictionary_id == source_dict_obj.id))  # type: ignore
-                        db.delete(source_dict_obj)
+            term_indexes.refresh(db, target_dict_id)
+            term_prefix_indexes.refresh(db, target_dict_id)
+            sentence_indexes.build(document_obj.id, document_obj.content)
 
+        term_graphs.drop(target_dict_id)
+        search_cache.invalidate(target_dict_id)
+        dictionary_purger.wake()
         return True
 
+    def merge_dictionaries_by_ids(self, source_dict_ids: List[int], target_dict_id: int) -> bool:
+        """
+        Слияние нескольких сохранённых словарей с целевым в одной транзакции.
+        Исходные словари после слияния помечаются удалёнными.
+        :return: False, если целевой словарь не найден
+        :raises InvalidDictionaryOperation: исходный словарь не найден или совпадает с целевым
+        """
+        source_dict_ids = list(dict.fromkeys(source_dict_ids))
+        if not source_dict_ids:
+            raise InvalidDictionaryOperation("Не выбраны словари для слияния")
+        if target_dict_id in source_dict_ids:
+            raise InvalidDictionaryOperation("Словарь нельзя слить с самим собой")
+
+        with next(self.gen_session) as db:
+            with db.begin():
+                if not get_active_dictionary(db, target_dict_id):
+                    return False
+                found_ids = set(db.exec(
+                    active_dictionary_ids().where(Dictionary.id.in_(source_dict_ids))
+                ).all())
+                missing_ids = [dict_id for dict_id in source_dict_ids if dict_id not in found_ids]
+                if missing_ids:
+                    raise InvalidDictionaryOperation(f"Словари не найдены: {missing_ids}")
+
+                self._merge_into(db, target_dict_id, source_dict_ids)
+
+            term_indexes.refresh(db, target_dict_id)
+            term_prefix_indexes.refresh(db, target_dict_id)
+
+        for dict_id in [target_dict_id, *source_dict_ids]:
+            term_graphs.drop(dict_id)
+            search_cache.invalidate(dict_id)
+        for dict_id in source_dict_ids:
+            term_indexes.drop(dict_id)
+            term_prefix_indexes.drop(dict_id)
+        dictionary_purger.wake()
+        return True
+
+    @staticmethod
+    def _merge_into(db: Session, target_dict_id: int, source_dict_ids: List[int]) -> None:
+        """
+        Слияние словарей внутри БД фиксированным числом запросов, независимо от их размера:
+        термины копируются одним INSERT ... SELECT ... ON CONFLICT DO NOTHING по уникальному индексу
+        (dictionary_id, text, type), соответствие id терминов источников и цели записывается во временную
+        таблицу, по которой одним INSERT ... SELECT переносятся связи (без повторов).
+        Эмбеддинги копируются из исходных терминов, а не считаются заново.
+        """
+        term = Term.__table__
+        connection = Connection.__table__
+        source_term = term.alias("source_term")
+        conn = db.connection()
+
+        # Без уникального индекса ON CONFLICT не отсеет повторы, и термины цели задвоятся
+        if TERM_UNIQUE_INDEX not in {index["name"] for index in inspect(conn).get_indexes(term.name)}:
+            raise DatabaseMigrationRequired(
+                f"Слияние словарей недоступно: в таблице {term.name} нет уникального индекса {TERM_UNIQUE_INDEX}, "
+                f"сначала выполните `python manage.py deduplicate-terms`"
+            )
+
+        # Все термины цели становятся видимыми, как и добавленные
+        conn.execute(update(term).where(term.c.dictionary_id == target_dict_id).values(hidden=False))
+
+        # При повторах между источниками остаётся термин с меньшим id
+        copy_columns = ["phrase_type", "text", "type", "tfidf", "embedding"]
+        conn.execute(
+            insert_ignoring_conflicts(db, term).from_select(
+                ["dictionary_id", "hidden", *copy_columns],
+                select(literal(target_dict_id), false(), *(source_term.c[name] for name in copy_columns))
+                .where(source_term.c.dictionary_id.in_(source_dict_ids))
+                .order_by(source_term.c.id)
+            )
+        )
+
+        # SQLite: таблица могла остаться в соединении пула после неудачного слияния
+        _merge_term_id_map.drop(conn, checkfirst=True)
+        _merge_term_id_map.create(conn)
+        conn.execute(
+            insert(_merge_term_id_map).from_select(
+                ["old_id", "new_id"],
+                select(source_term.c.id, term.c.id)
+                .select_from(source_term.join(term, and_(
+                    term.c.dictionary_id == target_dict_id,
+                    term.c.text == source_term.c.text,
+                    term.c.type == source_term.c.type,
+                )))
+                .where(source_term.c.dictionary_id.in_(source_dict_ids))
+            )
+        )
+
+        from_map = _merge_term_id_map.alias("from_map")
+        to_map = _merge_term_id_map.alias("to_map")
+        existing = connection.alias("existing")
+        conn.execute(
+            insert(connection).from_select(
+                ["dictionary_id", "from_term_id", "to_term_id"],
+                select(literal(target_dict_id), from_map.c.new_id, to_map.c.new_id)
+                .distinct()
+                .select_from(
+                    connection
+                    .join(from_map, from_map.c.old_id == connection.c.from_term_id)
+                    .join(to_map, to_map.c.old_id == connection.c.to_term_id)
+                )
+                .where(
+                    connection.c.dictionary_id.in_(source_dict_ids),
+                    ~exists().where(
+                        existing.c.dictionary_id == target_dict_id,
+                        existing.c.from_term_id == from_map.c.new_id,
+                        existing.c.to_term_id == to_map.c.new_id,
+                    )
+                )
+            )
+        )
+        _merge_term_id_map.drop(conn)
+
+        # Документы переходят к цели, исходные словари помечаются удалёнными (их строки удалит dictionary_purger)
+        conn.execute(
+            update(Document.__table__)
+            .where(Document.__table__.c.dictionary_id.in_(source_dict_ids))
+            .values(dictionary_id=target_dict_id)
+        )
+        conn.execute(
+            update(Dictionary.__table__)
+            .where(Dictionary.__table__.c.id.in_(source_dict_ids))
+            .values(deleted_at=datetime.now(UTC))
+        )
+
+        conn.execute(
+            update(Dictionary.__table__)
+            .where(Dictionary.__table__.c.id == target_dict_id)
+            .values(tfidf_range=0, updated_at=datetime.now(UTC), version=Dictionary.__table__.c.version + 1)
+        )
+
     @staticmethod
     def _process_terms_for_new_dictionary(
             db: Session,
             dict_dto: DictionaryDTO,
             dictionary_id: int
     ):
-        """Обработка терминов для нового словаря."""
-        terms = []
-        term_id_mapping = {}  # {старый_id: новый_объект_термина}
-
-        for term_dto in dict_dto.phrases:
-            term = Term(
-                dictionary_id=dictionary_id,
-                phrase_type=term_dto.phrase_type,
-                text=term_dto.text,
-                type=term_dto.type,
-                tfidf=term_dto.tfidf,
-                hidden=term_dto.hidden
-            )
-            terms.append(term)
-            db.add(term)
-
-        db.flush()
-
-        # Создаем маппинг старых ID к новым
-        for term_dto, term in zip(dict_dto.phrases, terms):
-            if term_dto.id is not None:
-                term_id_mapping[term_dto.id] = term.id
+        """
+        Обработка терминов для нового словаря пачками: термины вставляются многострочными
+        INSERT ... RETURNING id (id возвращаются в порядке строк), связи проверяются по
+        соответствию id из DTO новым id в памяти и вставляются одним executemany.
+        """
+        phrases, aliases = DictionaryService._deduplicate_terms(dict_dto.phrases)
+        new_ids = DictionaryService._insert_terms(db, dictionary_id, phrases)
+
+        # Маппинг ID терминов из DTO к новым ID
+        term_id_mapping = {
+            term_dto.id: new_id
+            for term_dto, new_id in zip(phrases, new_ids)
+            if term_dto.id is not None
+        }
 
-        # Создаем связи
+        # Связи могут ссылаться только на термины самого словаря
+        connections = {}
         for conn in dict_dto.connections:
-            from_id = term_id_mapping.get(conn.from_id, conn.from_id)
-            to_id = term_id_mapping.get(conn.to_id, conn.to_id)
-
-            # Проверяем, что оба термина существуют
-            if not db.get(Term, from_id) or not db.get(Term, to_id):
+            from_id = term_id_mapping.get(aliases.get(conn.from_id, conn.from_id))
+            to_id = term_id_mapping.get(aliases.get(conn.to_id, conn.to_id))
+            if from_id is None or to_id is None:
                 raise InvalidConnDictDTO(f"Неверные ID связей: from={conn.from_id}, to={conn.to_id}")
+            connections[(from_id, to_id)] = None
 
-            db.add(Connection(
-                dictionary_id=dictionary_id,
-                from_term_id=from_id,
-                to_term_id=to_id
-            ))
+        if connections:
+            db.connection().execute(insert(Connection.__table__), [
+                {"dictionary_id": dictionary_id, "from_term_id": from_id, "to_term_id": to_id}
+                for from_id, to_id in connections
+            ])
 
         return None
 
+    @staticmethod
+    def _deduplicate_terms(term_dtos: List[TermDTO]) -> Tuple[List[TermDTO], Dict[int, int]]:
+        """
+        Убирает повторы (text, type) - в словаре такой термин может быть только один.
+        :return: термины без повторов и id повторов из DTO -> id оставленного термина с тем же ключом
+        """
+        kept: Dict[Tuple[str, str], TermDTO] = {}
+        aliases = {}
+        for term_dto in term_dtos:
+            first = kept.setdefault((term_dto.text, term_dto.type), term_dto)
+            if first is not term_dto and term_dto.id is not None:
+                aliases[term_dto.id] = first.id
+        return list(kept.values()), aliases
+
+    @staticmethod
+    def _insert_terms(db: Session, dictionary_id: int, term_dtos: List[TermDTO]) -> List[int]:
+        """
+        Многострочная Core-вставка терминов (без ORM-объектов на каждую строку) с RETURNING id.
+        :return: id новых терминов в порядке term_dtos
+        """
+        if not term_dtos:
+            return []
+        embeddings = embed_texts([term_dto.text for term_dto in term_dtos])
+        return db.connection().execute(
+            insert(Term.__table__).returning(Term.__table__.c.id, sort_by_parameter_order=True),
+            [
+                {
+                    "dictionary_id": dictionary_id,
+                    "phrase_type": PhraseType.from_value(term_dto.phrase_type),
+                    "text": term_dto.text,
+                    "type": term_dto.type,
+                    "tfidf": term_dto.tfidf,
+                    "hidden": term_dto.hidden,
+                    "embedding": embedding,
+                }
+                for term_dto, embedding in zip(term_dtos, embeddings)
+            ]
+        ).scalars().all()
+
     @staticmethod
     def _process_terms_and_connections_optimized(
             db: Session,
@@ -293,21 +688,41 @@ class DictionaryService:
             dictionary: Type[Dictionary]
     ):
         """Оптимизированная функция для обработки терминов и связей словаря."""
+        phrases, aliases = DictionaryService._deduplicate_terms(dict_dto.phrases)
+
         # Получаем текущие термины и связи из БД
         existing_terms = {term.id: term for term in dictionary.terms}
+        # Векторы терминов не загружаются, нужно только знать, у каких их нет
+        missing_embedding_ids = set(db.exec(
+            select(Term.id).where(Term.dictionary_id == dictionary.id, Term.embedding.is_(None))
+        ).all())
+        kept_ids = {term_dto.id for term_dto in phrases}
+        removed_ids = [term_id for term_id in existing_terms if term_id not in kept_ids]
+
+        # Удаляем термины, которые не пришли в DTO, вместе с их связями до вставки новых:
+        # новый термин может повторять текст и тип удаляемого
+        if removed_ids:
+            db.exec(delete(Connection).where(  # type: ignore
+                Connection.dictionary_id == dictionary.id,
+                or_(Connection.from_term_id.in_(removed_ids), Connection.to_term_id.in_(removed_ids))
+            ))
+            db.exec(delete(Term).where(Term.id.in_(removed_ids)))  # type: ignore
+
         existing_connections = {
             (conn.from_term_id, conn.to_term_id): conn
-            for conn in dictionary.connections
+            for conn in db.exec(select(Connection).where(Connection.dictionary_id == dictionary.id)).all()
         }
 
         # Словарь для маппинга старых ID (из DTO) в новые ID (из БД)
         old_id_to_new_id = {}
 
         # Обрабатываем термины
-        for term_dto in dict_dto.phrases:
+        for term_dto in phrases:
             if term_dto.id and term_dto.id in existing_terms:
                 # Обновляем существующий термин
                 term = existing_terms[term_dto.id]
+                if term.text != term_dto.text or term.id in missing_embedding_ids:
+                    term.embedding = embed_text(term_dto.text)
                 term.phrase_type = term_dto.phrase_type
                 term.text = term_dto.text
                 term.type = term_dto.type
@@ -315,8 +730,6 @@ class DictionaryService:
                 term.hidden = term_dto.hidden
                 db.add(term)
                 old_id_to_new_id[term_dto.id] = term.id
-                # Удаляем из словаря, чтобы оставить только термины для удаления
-                existing_terms.pop(term_dto.id)
             else:
                 # Создаем новый термин
                 term = Term(
@@ -325,27 +738,27 @@ class DictionaryService:
                     text=term_dto.text,
                     type=term_dto.type,
                     tfidf=term_dto.tfidf,
-                    hidden=term_dto.hidden
+                    hidden=term_dto.hidden,
+                    embedding=embed_text(term_dto.text)
                 )
                 db.add(term)
                 db.flush()
                 if term_dto.id is not None:
                     old_id_to_new_id[term_dto.id] = term.id
 
-        # Удаляем оставшиеся термины (которые не пришли в DTO)
-        for term_id in existing_terms:
-            db.delete(existing_terms[term_id])
-
         # Обрабатываем связи
         new_connections = set()
         for conn in dict_dto.connections:
-            from_id = old_id_to_new_id.get(conn.from_id, conn.from_id)
-            to_id = old_id_to_new_id.get(conn.to_id, conn.to_id)
+            from_id = old_id_to_new_id.get(aliases.get(conn.from_id, conn.from_id))
+            to_id = old_id_to_new_id.get(aliases.get(conn.to_id, conn.to_id))
 
+            # Связи могут ссылаться только на термины, оставшиеся в словаре
             if not from_id or not to_id:
                 raise InvalidConnDictDTO(f"Неверные ID связей: from={conn.from_id}, to={conn.to_id}")
 
             connection_key = (from_id, to_id)
+            if connection_key in new_connections:
+                continue
             new_connections.add(connection_key)
 
             if connection_key not in existing_connections:
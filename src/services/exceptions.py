@@ -1,2 +1,24 @@
 class InvalidConnDictDTO(Exception):
     pass
+
+
+class InvalidSearchCursor(Exception):
+    pass
+
+
+class InvalidPageCursor(Exception):
+    pass
+
+
+class InvalidDictionaryOperation(Exception):
+    pass
+
+
+class DatabaseMigrationRequired(Exception):
+    pass
+
+
+class DictionaryVersionConflict(Exception):
+    def __init__(self, current_version: int):
+        super().__init__(f"Словарь был изменён: текущая версия {current_version}")
+        self.current_version = current_version
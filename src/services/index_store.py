@@ -0,0 +1,73 @@
+import os
+import pickle
+from typing import Generic, Hashable, Optional, Type, TypeVar
+
+from config import logger
+from src.analysis.consts import ANALYZER_VERSION
+from src.utils.lru_cache import LRUCache
+
+K = TypeVar('K', bound=Hashable)
+T = TypeVar('T')
+
+
+class PickledIndexStore(Generic[K, T]):
+    """
+    Хранилище поисковых индексов: LRU в памяти + pickle-файлы на диске (переживают перезапуск).
+    Индексы, сохранённые другой версией анализатора или в другом формате, считаются отсутствующими.
+    Индекс должен иметь атрибут version, равный ANALYZER_VERSION на момент построения,
+    и может задавать версию своего формата в FORMAT_VERSION/format_version.
+    """
+
+    def __init__(self, directory: str, memory_size: int, index_type: Type[T]):
+        self.directory = directory
+        self.index_type = index_type
+        self._memory: LRUCache[K, T] = LRUCache(memory_size)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: K) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: K) -> Optional[T]:
+        index = self._memory.get(key)
+        if index is None:
+            index = self._read_disk(key)
+            if index is not None:
+                self._memory.put(key, index)
+        return index
+
+    def put(self, key: K, index: T, persist: bool = True) -> None:
+        self._memory.put(key, index)
+        if persist:
+            self._write_disk(key, index)
+
+    def drop(self, key: K) -> None:
+        self._memory.pop(key)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _read_disk(self, key: K) -> Optional[T]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                index = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(msg=f"Error reading index {self._path(key)}: {str(e)}", exc_info=True)
+            return None
+        if not isinstance(index, self.index_type) or getattr(index, 'version', None) != ANALYZER_VERSION:
+            return None
+        if getattr(index, 'format_version', 1) != getattr(self.index_type, 'FORMAT_VERSION', 1):
+            return None
+        return index
+
+    def _write_disk(self, key: K, index: T) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(msg=f"Error writing index {path}: {str(e)}", exc_info=True)
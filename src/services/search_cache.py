@@ -0,0 +1,77 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from config import SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL
+from src.utils.lru_cache import LRUCache
+
+# Ключ кэша: (ключ запроса, фильтр словарей, курсор, limit, with_sentences,
+#             id опрошенных словарей, отпечаток их версий)
+SearchCacheKey = Tuple[Hashable, Tuple[int, ...], str, int, bool, frozenset, str]
+
+
+@dataclass(frozen=True)
+class CachedSearchPage:
+    """Страница поиска без ORM-объектов: ключи результатов, курсор и найденные предложения"""
+    keys: Tuple[Tuple[float, int, int], ...]
+    next_cursor: Optional[str]
+    sentences: Dict[int, List[str]]
+
+
+class SearchCache:
+    """
+    Кэш страниц поиска по словарям (LRU + TTL).
+    Ключ включает n-граммы запроса и (id, version) каждого опрошенного словаря, поэтому
+    после изменения, слияния или удаления словаря старые записи просто перестают находиться;
+    DictionaryService дополнительно удаляет их явно, чтобы не занимать место до вытеснения.
+    """
+
+    def __init__(self, maxsize: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL):
+        self._entries: LRUCache[SearchCacheKey, CachedSearchPage] = LRUCache(maxsize, ttl=ttl)
+
+    @staticmethod
+    def make_key(
+            query_key: Hashable,
+            dictionary_ids: Optional[Sequence[int]],
+            cursor: Optional[str],
+            limit: int,
+            with_sentences: bool,
+            versions: Iterable[Tuple[int, int]]
+    ) -> SearchCacheKey:
+        """
+        :param query_key: всё, от чего зависит ранжирование запроса (n-граммы лемм с частотами и слова
+            полнотекстового фильтра): словоформы с одинаковыми n-граммами дают одну запись
+        :param versions: (id, version) словарей, по которым идёт поиск
+        """
+        versions = sorted(versions)
+        fingerprint = hashlib.md5(
+            ';'.join(f"{dictionary_id}:{version}" for dictionary_id, version in versions).encode('utf-8')
+        ).hexdigest()
+        return (
+            query_key,
+            tuple(sorted(set(dictionary_ids or ()))),
+            cursor or '',
+            limit,
+            with_sentences,
+            frozenset(dictionary_id for dictionary_id, _ in versions),
+            fingerprint,
+        )
+
+    def get(self, key: SearchCacheKey) -> Optional[CachedSearchPage]:
+        return self._entries.get(key)
+
+    def put(self, key: SearchCacheKey, page: CachedSearchPage) -> None:
+        self._entries.put(key, page)
+
+    def invalidate(self, dictionary_id: int) -> int:
+        """Удаляет страницы, в поиске которых участвовал словарь; возвращает кол-во удалённых"""
+        return self._entries.remove_if(lambda key: dictionary_id in key[5])
+
+    def invalidate_all(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        return self._entries.stats()
+
+
+search_cache = SearchCache()
@@ -0,0 +1,218 @@
+import base64
+import binascii
+import heapq
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlmodel import Session, select
+
+from config import SEARCH_PAGE_SIZE
+from src.analysis.morphology import get_morphology
+from src.analysis.term_index import count_term_ngrams
+from src.analysis.tfidf import WORD_TOKEN_PATTERN, lemmatize_tokens
+from src.database.fulltext import match_dictionary_ids, match_document_ids
+from src.database.models import Dictionary, Document, Term
+from src.services.exceptions import InvalidSearchCursor
+from src.services.search_cache import CachedSearchPage, search_cache
+from src.services.sentence_index_service import sentence_indexes
+from src.services.term_index_service import term_indexes
+
+
+# Порядок выдачи: по убыванию схожести, при равной схожести - по id словаря и термина
+SearchKey = Tuple[float, int, int]
+
+
+@dataclass
+class SearchResult:
+    dictionary: Dictionary
+    term: Term
+    similarity: float
+    sentences: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            "dictionary": {"id": self.dictionary.id, "name": self.dictionary.name},
+            "term": {
+                "id": self.term.id,
+                "text": self.term.text,
+                "type": self.term.type,
+                "phrase_type": self.term.phrase_type.value,
+            },
+            "similarity": self.similarity,
+            "sentences": self.sentences,
+        }
+
+
+@dataclass
+class SearchPage:
+    results: List[SearchResult]
+    next_cursor: Optional[str] = None
+
+
+class SearchService:
+    """
+    Поиск терминов по всем словарям (или по выбранным) с общим ранжированием.
+    Запрос лемматизируется один раз и раздаётся по индексам терминов всех словарей (scatter),
+    кандидаты словарей сливаются через кучу в общий top-k (gather).
+    Страницы выдачи задаются курсором - ключом последнего результата предыдущей страницы.
+    Если СУБД поддерживает полнотекстовый поиск, словари и документы предварительно отбираются
+    в SQL: из БД выходят только id подходящих строк.
+    Готовые страницы (ключи результатов и предложения) кэшируются в search_cache с учётом
+    версий (Dictionary.version) опрошенных словарей; из БД при попадании читаются только сами строки.
+    """
+
+    @staticmethod
+    def _fulltext_words(text: str) -> List[str]:
+        """
+        Слова текста и все формы их лемм - для OR-запроса к полнотекстовому индексу.
+        Индекс сравнивает основы слов, а ранжирование - леммы: без форм лемм фильтр отсекал бы термины
+        с той же леммой, но другой основой (запрос "человек" - термин "люди")
+        """
+        morph = get_morphology()
+        words = {word.lower() for word in WORD_TOKEN_PATTERN.findall(text) if len(word.strip('-')) > 1}
+        for lemma in {lemma for lemma in lemmatize_tokens(text) if lemma is not None}:
+            words.update(morph.word_forms(lemma) if '-' not in lemma else [lemma])
+        return sorted(words)
+
+    @staticmethod
+    def encode_cursor(key: SearchKey) -> str:
+        return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> SearchKey:
+        try:
+            neg_similarity, dictionary_id, term_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return float(neg_similarity), int(dictionary_id), int(term_id)
+        except (binascii.Error, UnicodeError, ValueError, TypeError) as e:
+            raise InvalidSearchCursor(f"Некорректный курсор поиска: {cursor}") from e
+
+    def search(
+            self,
+            db: Session,
+            query: str,
+            dictionary_ids: Optional[Sequence[int]] = None,
+            limit: int = SEARCH_PAGE_SIZE,
+            cursor: Optional[str] = None,
+            with_sentences: bool = True
+    ) -> SearchPage:
+        """
+        :param dictionary_ids: в каких словарях искать (по умолчанию - во всех)
+        :param cursor: next_cursor предыдущей страницы
+        :param with_sentences: искать ли предложения документов с найденными терминами
+        """
+        after = self.decode_cursor(cursor) if cursor else None
+        query_ngrams = count_term_ngrams(query)
+        if not query_ngrams:
+            return SearchPage(results=[])
+        fulltext_words = self._fulltext_words(query)
+
+        # Версии словарей - часть ключа кэша: изменённый словарь даёт новый ключ
+        statement = select(Dictionary.id, Dictionary.version).where(Dictionary.deleted_at.is_(None))
+        if dictionary_ids:
+            statement = statement.where(Dictionary.id.in_(dictionary_ids))
+        versions = db.exec(statement).all()
+        # Ранжирование зависит только от n-грамм запроса и слов полнотекстового фильтра,
+        # поэтому ключ строится из них, а не из текста запроса
+        cache_key = search_cache.make_key(
+            (tuple(sorted(query_ngrams.items())), tuple(fulltext_words)),
+            dictionary_ids, cursor, limit, with_sentences, versions
+        )
+
+        cached = search_cache.get(cache_key)
+        if cached is None:
+            page, next_cursor = self._rank(
+                db, query_ngrams, fulltext_words, dictionary_ids, dict(versions), limit, after
+            )
+            terms = self._load_terms(db, page)
+            sentences = {}
+            if with_sentences:
+                sentences = {term_id: self._find_sentences(db, term) for term_id, term in terms.items()}
+            cached = CachedSearchPage(keys=tuple(page), next_cursor=next_cursor, sentences=sentences)
+            search_cache.put(cache_key, cached)
+        else:
+            terms = self._load_terms(db, cached.keys)
+
+        return SearchPage(results=self._load_results(db, cached, terms), next_cursor=cached.next_cursor)
+
+    def _rank(
+            self,
+            db: Session,
+            query_ngrams: Dict[str, int],
+            fulltext_words: List[str],
+            dictionary_ids: Optional[Sequence[int]],
+            versions: Dict[int, int],
+            limit: int,
+            after: Optional[SearchKey]
+    ) -> Tuple[List[SearchKey], Optional[str]]:
+        """Ключи результатов страницы и курсор следующей страницы"""
+        # Словари без единого термина со словами запроса не опрашиваем
+        searched_ids = match_dictionary_ids(db, fulltext_words, dictionary_ids)
+        if searched_ids is None:
+            searched_ids = list(versions)
+        else:
+            # Полнотекстовый индекс не знает об удалённых словарях
+            searched_ids = [dictionary_id for dictionary_id in searched_ids if dictionary_id in versions]
+
+        # Scatter: от каждого словаря нужно не больше limit + 1 кандидатов после курсора
+        candidates = []
+        for dictionary_id in searched_ids:
+            keys = (
+                (-similarity, dictionary_id, term_id)
+                for term_id, similarity in term_indexes.search_ngrams(
+                    db, dictionary_id, query_ngrams, version=versions[dictionary_id]
+                )
+            )
+            if after is not None:
+                keys = (key for key in keys if key > after)
+            candidates.append(list(islice(keys, limit + 1)))
+
+        # Gather: списки уже упорядочены, слияние через кучу даёт общий порядок
+        top = list(islice(heapq.merge(*candidates), limit + 1))
+        page = top[:limit]
+        next_cursor = self.encode_cursor(page[-1]) if len(top) > limit else None
+        return page, next_cursor
+
+    def _find_sentences(self, db: Session, term: Term) -> List[str]:
+        """Предложения документов словаря с термином; документы без слов термина отсекаются в SQL"""
+        document_ids = match_document_ids(db, self._fulltext_words(term.text), [term.dictionary_id])
+        if document_ids is None:
+            document_ids = db.exec(select(Document.id).where(Document.dictionary_id == term.dictionary_id)).all()
+
+        sentences = []
+        for document_id in sorted(document_ids):
+            sentences += sentence_indexes.find_sentences(db, document_id, query=term.text)
+        return sentences
+
+    @staticmethod
+    def _load_terms(db: Session, page: Sequence[SearchKey]) -> Dict[int, Term]:
+        if not page:
+            return {}
+        return {term.id: term for term in db.exec(select(Term).where(Term.id.in_([key[2] for key in page]))).all()}
+
+    @staticmethod
+    def _load_results(db: Session, cached: CachedSearchPage, terms: Dict[int, Term]) -> List[SearchResult]:
+        if not cached.keys:
+            return []
+
+        dictionary_ids = {dictionary_id for _, dictionary_id, _ in cached.keys}
+        dictionaries = {d.id: d for d in db.exec(
+            select(Dictionary).where(Dictionary.id.in_(dictionary_ids), Dictionary.deleted_at.is_(None))
+        ).all()}
+
+        results = []
+        for neg_similarity, dictionary_id, term_id in cached.keys:
+            term = terms.get(term_id)
+            if term is None or dictionary_id not in dictionaries:
+                continue
+            results.append(SearchResult(
+                dictionary=dictionaries[dictionary_id],
+                term=term,
+                similarity=-neg_similarity,
+                sentences=list(cached.sentences.get(term_id, []))
+            ))
+        return results
+
+
+search_service = SearchService()
@@ -0,0 +1,64 @@
+from typing import List
+
+from sqlmodel import Session
+
+from config import SENTENCE_INDEX_DIR, SENTENCE_INDEX_MEMORY_SIZE
+from src.analysis.sentence_index import SentenceIndex
+from src.analysis.highlight import MultiTermHighlighter
+from src.database.models import Document, database_uid
+from src.services.index_store import PickledIndexStore
+
+
+class SentenceIndexRegistry:
+    """
+    Индексы предложений документов (SentenceIndex): LRU в памяти + pickle-файлы на диске.
+    Индекс строится при сохранении документа (для уже сохранённых - `python manage.py build-indexes`);
+    документ без индекса индексируется при первом поиске.
+    Текст документа после сохранения не меняется, поэтому индекс помечается только идентификатором базы:
+    индекс документа с тем же id из пересозданной или другой базы строится заново.
+    """
+
+    def __init__(self, directory: str = SENTENCE_INDEX_DIR, memory_size: int = SENTENCE_INDEX_MEMORY_SIZE):
+        self._store: PickledIndexStore[int, SentenceIndex] = PickledIndexStore(
+            directory, memory_size, SentenceIndex
+        )
+
+    def build(self, document_id: int, content: str) -> SentenceIndex:
+        index = SentenceIndex(content)
+        index.source = database_uid()
+        self._store.put(document_id, index)
+        return index
+
+    def get(self, db: Session, document_id: int) -> SentenceIndex | None:
+        index = self._store.get(document_id)
+        if index is None or index.source != database_uid():
+            document = db.get(Document, document_id)
+            if document is None:
+                return None
+            index = self.build(document_id, document.content)
+        return index
+
+    def drop(self, document_id: int) -> None:
+        self._store.drop(document_id)
+
+    def find_sentences(
+            self,
+            db: Session,
+            document_id: int,
+            query: str,
+            with_html_highlight_phrase: bool = True,
+            top_k: int = 3
+    ) -> List[str]:
+        """Предложения документа, содержащие термин query"""
+        index = self.get(db, document_id)
+        if index is None:
+            return []
+
+        sentences = [index.sentences[i] for i in index.find(query, top_k)]
+        if with_html_highlight_phrase:
+            highlighter = MultiTermHighlighter([query])
+            return [highlighter.highlight(sentence)[0] for sentence in sentences]
+        return sentences
+
+
+sentence_indexes = SentenceIndexRegistry()
@@ -0,0 +1,70 @@
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from config import TERM_GRAPH_MEMORY_SIZE
+from src.analysis.term_graph import GraphDirection, TermGraph
+from src.database.models import Connection, Term
+from src.utils.lru_cache import LRUCache
+
+
+class TermGraphRegistry:
+    """
+    Графы связей терминов словарей (TermGraph) в LRU-кэше в памяти.
+    Граф строится одним запросом связей словаря при первом обращении;
+    DictionaryService сбрасывает его при изменении, слиянии и удалении словаря.
+    """
+
+    def __init__(self, memory_size: int = TERM_GRAPH_MEMORY_SIZE):
+        self._graphs: LRUCache[int, TermGraph] = LRUCache(memory_size)
+
+    def get(self, db: Session, dictionary_id: int) -> TermGraph:
+        graph = self._graphs.get(dictionary_id)
+        if graph is None:
+            edges = db.exec(
+                select(Connection.from_term_id, Connection.to_term_id)
+                .where(Connection.dictionary_id == dictionary_id)
+            ).all()
+            graph = TermGraph(edges)
+            self._graphs.put(dictionary_id, graph)
+        return graph
+
+    def drop(self, dictionary_id: int) -> None:
+        self._graphs.pop(dictionary_id)
+
+    @staticmethod
+    def load_terms(db: Session, dictionary_id: int, term_ids: List[int]) -> Dict[int, Term]:
+        """Термины словаря по id (для ответа API)"""
+        if not term_ids:
+            return {}
+        return {
+            term.id: term
+            for term in db.exec(
+                select(Term).where(Term.dictionary_id == dictionary_id, Term.id.in_(term_ids))
+            ).all()
+        }
+
+    def reachable_terms(
+            self,
+            db: Session,
+            dictionary_id: int,
+            term_id: int,
+            direction: GraphDirection = GraphDirection.outgoing,
+            max_depth: Optional[int] = None,
+            phrase_types: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """Термины, достижимые из term_id, с длиной пути; phrase_types - оставить только эти типы фраз"""
+        reached = self.get(db, dictionary_id).reachable(term_id, direction, max_depth)
+        terms = self.load_terms(db, dictionary_id, [reached_id for reached_id, _ in reached])
+        return [
+            {**term_to_dict(terms[reached_id]), "depth": depth}
+            for reached_id, depth in reached
+            if reached_id in terms and (not phrase_types or terms[reached_id].phrase_type.value in phrase_types)
+        ]
+
+
+def term_to_dict(term: Term) -> Dict:
+    return {"id": term.id, "text": term.text, "type": term.type, "phrase_type": term.phrase_type.value}
+
+
+term_graphs = TermGraphRegistry()
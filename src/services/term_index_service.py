@@ -0,0 +1,101 @@
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from config import TERM_INDEX_DIR, TERM_INDEX_MEMORY_SIZE
+from src.analysis.term_index import TermIndex
+from src.database.models import Dictionary, Term, database_uid
+from src.services.index_store import PickledIndexStore
+
+
+def load_index_terms(db: Session, dictionary_id: int) -> List[Tuple[int, str]]:
+    """Индексируемые (видимые) термины словаря [(id, текст), ...]"""
+    return db.exec(
+        select(Term.id, Term.text)
+        .where(Term.dictionary_id == dictionary_id, Term.hidden == False)  # noqa: E712
+    ).all()
+
+
+def load_index_source(db: Session, dictionary_id: int, version: Optional[int] = None) -> Tuple[str, Optional[int]]:
+    """
+    Метка индекса словаря: идентификатор базы и версия словаря (Dictionary.version растёт при каждом изменении).
+    Индекс с другой меткой построен по чужой базе или по устаревшим терминам (в т.ч. другим процессом).
+    :param version: уже известная версия словаря, чтобы не запрашивать её ещё раз
+    """
+    if version is None:
+        version = db.exec(select(Dictionary.version).where(Dictionary.id == dictionary_id)).first()
+    return database_uid(), version
+
+
+class TermIndexRegistry:
+    """
+    Индексы терминов словарей (TermIndex): LRU в памяти + pickle-файлы на диске.
+    Индекс строится при сохранении/изменении словаря через DictionaryService и помечается версией словаря;
+    при поиске индекс с другой меткой (словарь изменён другим процессом, база пересоздана)
+    сверяется с текущими терминами словаря - заново лемматизируются только изменившиеся.
+    """
+
+    def __init__(self, directory: str = TERM_INDEX_DIR, memory_size: int = TERM_INDEX_MEMORY_SIZE):
+        self._store: PickledIndexStore[int, TermIndex] = PickledIndexStore(directory, memory_size, TermIndex)
+        self._locks: Dict[int, threading.Lock] = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, dictionary_id: int) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks[dictionary_id]
+
+    def _sync(self, dictionary_id: int, terms: Iterable[Tuple[int, str]], source: Tuple) -> TermIndex:
+        """Вызывается под блокировкой словаря"""
+        index = self._store.get(dictionary_id)
+        if index is None:
+            index = TermIndex()
+        changed = index.update(terms)
+        changed = changed or index.source != source
+        index.source = source
+        self._store.put(dictionary_id, index, persist=changed)
+        return index
+
+    def update(self, dictionary_id: int, terms: Iterable[Tuple[int, str]], source: Tuple) -> None:
+        """
+        Приводит индекс словаря к переданным (видимым) терминам [(id, текст), ...].
+        Изменившийся индекс сохраняется на диск.
+        :param source: метка индекса (load_index_source), полученная не позже терминов
+        """
+        with self._lock(dictionary_id):
+            self._sync(dictionary_id, terms, source)
+
+    def refresh(self, db: Session, dictionary_id: int) -> None:
+        """Переиндексация словаря по терминам из БД"""
+        # Метка читается до терминов: термины не старее её, а более новые термины исправит следующая сверка
+        source = load_index_source(db, dictionary_id)
+        self.update(dictionary_id, load_index_terms(db, dictionary_id), source)
+
+    def drop(self, dictionary_id: int) -> None:
+        with self._lock(dictionary_id):
+            self._store.drop(dictionary_id)
+
+    def search_ngrams(
+            self,
+            db: Session,
+            dictionary_id: int,
+            query_ngrams: Counter,
+            top_k: Optional[int] = None,
+            version: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Поиск по индексу словаря. Индекс, которого ещё нет или с устаревшей меткой,
+        сначала сверяется с терминами из БД.
+        :param version: текущая версия словаря, если уже известна
+        :return: [(id термина, схожесть), ...]
+        """
+        source = load_index_source(db, dictionary_id, version)
+        with self._lock(dictionary_id):
+            index = self._store.get(dictionary_id)
+            if index is None or index.source != source:
+                index = self._sync(dictionary_id, load_index_terms(db, dictionary_id), source)
+            return index.search_ngrams(query_ngrams, top_k)
+
+
+term_indexes = TermIndexRegistry()
@@ -0,0 +1,67 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlmodel import Session
+
+from config import TERM_PREFIX_INDEX_DIR, TERM_PREFIX_INDEX_MEMORY_SIZE
+from src.analysis.term_prefix_index import TermPrefixIndex
+from src.services.index_store import PickledIndexStore
+from src.services.term_index_service import load_index_source, load_index_terms
+
+
+class TermPrefixIndexRegistry:
+    """
+    Префиксные индексы терминов словарей (TermPrefixIndex) для автодополнения:
+    LRU в памяти + pickle-файлы на диске. Как и TermIndex, строятся при сохранении/изменении
+    словаря через DictionaryService по видимым терминам, помечаются версией словаря и сверяются
+    с терминами из БД, если метка устарела; переиндексируются только изменившиеся термины.
+    """
+
+    def __init__(self, directory: str = TERM_PREFIX_INDEX_DIR, memory_size: int = TERM_PREFIX_INDEX_MEMORY_SIZE):
+        self._store: PickledIndexStore[int, TermPrefixIndex] = PickledIndexStore(
+            directory, memory_size, TermPrefixIndex
+        )
+        self._locks: Dict[int, threading.Lock] = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, dictionary_id: int) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks[dictionary_id]
+
+    def _sync(self, db: Session, dictionary_id: int, source: Tuple) -> TermPrefixIndex:
+        """Вызывается под блокировкой словаря"""
+        index = self._store.get(dictionary_id)
+        if index is None:
+            index = TermPrefixIndex()
+        changed = index.update(load_index_terms(db, dictionary_id))
+        changed = changed or index.source != source
+        index.source = source
+        self._store.put(dictionary_id, index, persist=changed)
+        return index
+
+    def refresh(self, db: Session, dictionary_id: int) -> None:
+        """Переиндексация словаря по терминам из БД"""
+        source = load_index_source(db, dictionary_id)
+        with self._lock(dictionary_id):
+            self._sync(db, dictionary_id, source)
+
+    def drop(self, dictionary_id: int) -> None:
+        with self._lock(dictionary_id):
+            self._store.drop(dictionary_id)
+
+    def complete(self, db: Session, dictionary_id: int, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """
+        Автодополнение термина словаря по префиксу. Индекс, которого ещё нет или с устаревшей меткой,
+        сначала сверяется с терминами из БД.
+        :return: [(id термина, текст), ...]
+        """
+        source = load_index_source(db, dictionary_id)
+        with self._lock(dictionary_id):
+            index = self._store.get(dictionary_id)
+            if index is None or index.source != source:
+                index = self._sync(db, dictionary_id, source)
+            return index.complete(prefix, limit)
+
+
+term_prefix_indexes = TermPrefixIndexRegistry()
@@ -0,0 +1,82 @@
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import undefer
+from sqlmodel import Session, select
+
+from config import logger
+from database import get_session
+from src.analysis.embeddings import embed_text
+from src.database.models import Term, active_dictionary_ids, get_active_dictionary
+from src.database.vector_search import nearest_terms
+
+
+class TermSimilarityService:
+    """Поиск похожих терминов во всех словарях по векторам Term.embedding"""
+
+    def find_similar(
+            self,
+            db: Session,
+            text: Optional[str] = None,
+            term_id: Optional[int] = None,
+            dictionary_ids: Optional[Sequence[int]] = None,
+            limit: int = 10
+    ) -> List[Tuple[Term, float]] | None:
+        """
+        Термины, похожие на текст или на существующий термин (сам термин в выдачу не входит).
+        :return: [(термин, схожесть), ...] или None, если термин term_id не найден
+        """
+        if term_id is not None:
+            term = db.get(Term, term_id, options=[undefer(Term.embedding)])
+            if term is None or get_active_dictionary(db, term.dictionary_id) is None:
+                return None
+            embedding = term.embedding if term.embedding is not None else embed_text(term.text)
+        else:
+            embedding = embed_text(text or '')
+
+        if embedding is None:
+            return []
+        return nearest_terms(db, embedding, limit, dictionary_ids, exclude_term_id=term_id)
+
+    @staticmethod
+    def backfill_embeddings(batch_size: int = 500) -> int:
+        """
+        Заполняет векторы терминов, сохранённых до появления Term.embedding.
+        Запускается командой `python manage.py backfill-embeddings`, а не при старте приложения:
+        на большой базе это долго, а до заполнения такие термины просто не находятся как похожие.
+        :return: кол-во обработанных терминов
+        """
+        processed = 0
+        last_id = 0
+        with next(get_session()) as db:
+            while True:
+                rows = db.exec(
+                    select(Term.id, Term.text)
+                    .where(
+                        Term.embedding.is_(None),
+                        Term.id > last_id,
+                        Term.dictionary_id.in_(active_dictionary_ids())
+                    )
+                    .order_by(Term.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+
+                values = [
+                    {"id": term_id, "embedding": embedding}
+                    for term_id, term_text in rows
+                    if (embedding := embed_text(term_text)) is not None
+                ]
+                if values:
+                    db.execute(update(Term), values)
+                    db.commit()
+                processed += len(rows)
+                last_id = rows[-1][0]
+
+        if processed:
+            logger.info(msg=f"Term embeddings backfilled: {processed}")
+        return processed
+
+
+term_similarity = TermSimilarityService()
@@ -1,6 +1,76 @@
+import codecs
 import json
 import hashlib
 import os
+import tempfile
+import zlib
+from typing import Iterator, Tuple
+
+from fastapi import UploadFile
+
+from config import ANALYSIS_UPLOAD_DIR, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_COMPRESSION_RATIO
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class TextStreamDecoder:
+    """
+    Инкрементальное декодирование UTF-8 по кускам байт.
+    Байты многобайтового символа, разрезанного границей куска, дожидаются следующего куска.
+    Сжатый gzip поток распаковывается на лету (определяется по сигнатуре в начале), в том числе
+    склеенный из нескольких архивов. Распаковка идёт кусками не больше chunk_size байт и прерывается,
+    если распакованных данных больше сжатых в max_ratio раз.
+    """
+
+    def __init__(self, chunk_size: int = UPLOAD_CHUNK_SIZE, max_ratio: int = UPLOAD_MAX_COMPRESSION_RATIO):
+        self.chunk_size = chunk_size
+        self.max_ratio = max_ratio
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._decompressor = None
+        self._compressed_size = 0
+        self._decompressed_size = 0
+        self._started = False
+
+    def feed(self, data: bytes) -> str:
+        if not self._started:
+            self._started = True
+            if data.startswith(GZIP_MAGIC):
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._decompressor is not None:
+            data = self._decompress(data)
+        return self._decoder.decode(data)
+
+    def finish(self) -> str:
+        tail = b''
+        if self._decompressor is not None:
+            tail = self._decompressor.flush()
+            self._count(0, len(tail))
+            if not self._decompressor.eof:
+                raise ValueError("Сжатый файл обрезан")
+        return self._decoder.decode(tail, final=True)
+
+    def _decompress(self, data: bytes) -> bytes:
+        output = []
+        while data:
+            if self._decompressor.eof:
+                # Следующий архив склеенного файла; нулевые байты после архива - выравнивание, как в gzip
+                data = data.lstrip(b'\x00')
+                if not data:
+                    break
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+            part = self._decompressor.decompress(data, self.chunk_size)
+            rest = self._decompressor.unconsumed_tail or self._decompressor.unused_data
+            self._count(len(data) - len(rest), len(part))
+            output.append(part)
+            data = rest
+        return b''.join(output)
+
+    def _count(self, compressed: int, decompressed: int) -> None:
+        self._compressed_size += compressed
+        self._decompressed_size += decompressed
+        if self._decompressed_size > max(self._compressed_size * self.max_ratio, self.chunk_size):
+            raise ValueError("Сжатый файл распаковывается в слишком большой объём")
 
 
 class TextService:
@@ -26,3 +96,37 @@ class TextService:
     def get_content_file(file_path):
         with open(file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
+
+    @staticmethod
+    async def spool_upload_file(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, str]:
+        """
+        Потоково сохраняет загруженный файл (UTF-8, возможно сжатый gzip) во временный текстовый файл.
+        В памяти одновременно находится только один кусок.
+        :return: (путь к временному файлу, хэш содержимого как у get_text_content_hash)
+        """
+        os.makedirs(ANALYSIS_UPLOAD_DIR, exist_ok=True)
+        decoder = TextStreamDecoder()
+        content_hash = hashlib.md5()
+
+        fd, path = tempfile.mkstemp(suffix='.txt', dir=ANALYSIS_UPLOAD_DIR)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as out:
+                while chunk := await file.read(chunk_size):
+                    text = decoder.feed(chunk)
+                    content_hash.update(text.encode('utf-8'))
+                    out.write(text)
+                text = decoder.finish()
+                content_hash.update(text.encode('utf-8'))
+                out.write(text)
+        except Exception:
+            os.remove(path)
+            raise
+
+        return path, content_hash.hexdigest()
+
+    @staticmethod
+    def iter_text_file(file_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator[str]:
+        """Читает текстовый файл кусками по chunk_size символов"""
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from typing import Dict, Optional
+
+from config import ANALYSIS_SHARD_SIZE
+from src.analysis.morphology import get_morphology
+from src.analysis.phrase_extractor import PhraseExtractor
+from src.services.text_service import TextService
+
+# Экземпляр анализатора внутри процесса-обработчика
+_phrase_extractor: Optional[PhraseExtractor] = None
+# Пул для кусков больших текстов внутри процесса-обработчика задач
+_shard_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _init_worker():
+    """Готовим анализатор при старте процесса, а не на первой задаче"""
+    global _phrase_extractor, _shard_pool
+    get_morphology().after_fork()
+    _phrase_extractor = PhraseExtractor()
+    # Пул родителя (если процесс порождён обработчиком задач) ребёнку не принадлежит
+    _shard_pool = None
+
+
+def _get_phrase_extractor() -> PhraseExtractor:
+    global _phrase_extractor
+    if _phrase_extractor is None:
+        _phrase_extractor = PhraseExtractor()
+    return _phrase_extractor
+
+
+def analyze_text_in_worker(content: str) -> Dict:
+    return _get_phrase_extractor().analyze_text_with_stats(content)
+
+
+def _get_shard_pool(shard_workers: int) -> Optional[ProcessPoolExecutor]:
+    """
+    Пул для кусков больших текстов, один на процесс-обработчик: создаётся при первом большом тексте
+    и переиспользуется следующими задачами (останавливается вместе с процессом-обработчиком).
+    При shard_workers <= 1 пула нет - куски считаются в самом обработчике.
+    """
+    global _shard_pool
+    if shard_workers <= 1:
+        return None
+    if _shard_pool is None:
+        _shard_pool = create_process_pool(shard_workers)
+        # Процесс пула завершается через os._exit, не вызывая atexit-обработчики concurrent.futures,
+        # и перед выходом ждёт своих детей: пул останавливается финализатором multiprocessing.
+        # Приоритет выше, чем у финализаторов очередей пула (10): они закрывают очередь задач,
+        # через которую пул рассылает процессам команду завершения
+        Finalize(None, _shard_pool.shutdown, exitpriority=100)
+    return _shard_pool
+
+
+def analyze_sharded_text_in_worker(content: str, shard_workers: int) -> Dict:
+    """
+    Анализ большого текста по кускам. Куски считаются в пуле процесса-обработчика, а объединение
+    счётчиков и оценка TF-IDF идут в самом обработчике, а не в веб-процессе:
+    туда возвращается только итоговый список фраз.
+    """
+    return _get_phrase_extractor().analyze_text_with_stats(content, executor=_get_shard_pool(shard_workers))
+
+
+def analyze_file_in_worker(file_path: str, shard_workers: int) -> Dict:
+    """Потоковый анализ текстового файла; по кускам в пуле - только файл больше ANALYSIS_SHARD_SIZE"""
+    executor = _get_shard_pool(shard_workers) if os.path.getsize(file_path) > ANALYSIS_SHARD_SIZE else None
+    return _get_phrase_extractor().analyze_stream_with_stats(
+        lambda: TextService.iter_text_file(file_path),
+        executor=executor
+    )
+
+
+def create_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Пул процессов для CPU-тяжёлого анализа вне event loop.
+    Словари pymorphy загружаются в родительском процессе до создания пула:
+    при запуске через fork процессы-обработчики наследуют их (copy-on-write), а не грузят заново.
+    """
+    get_morphology()
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    else:
+        mp_context = None
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context, initializer=_init_worker)
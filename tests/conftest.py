@@ -0,0 +1,51 @@
+"""
+Тесты работают с временной базой SQLite: DATABASE_URL задаётся до импорта модулей приложения.
+Запуск из корня проекта: `python -m pytest` (зависимости - requirements-dev.txt).
+"""
+import os
+import tempfile
+
+import pytest
+
+_database_dir = tempfile.mkdtemp(prefix="tests_db_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'app.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+
+SAMPLE_TEXT_FILE = os.path.join(os.path.dirname(__file__), "..", "text_examples", "war_and_peace_wiki_dump.txt")
+
+
+@pytest.fixture(scope="session")
+def client() -> TestClient:
+    """Приложение с выполненным lifespan (таблицы созданы, фоновые службы запущены)"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def sample_text() -> str:
+    with open(SAMPLE_TEXT_FILE, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def create_dictionary(client):
+    """Сохраняет словарь через API: create_dictionary(name, [текст термина, ...], [(i, j), ...]) -> id"""
+    def create(name, terms, connections=(), document_text=""):
+        phrases = [
+            {"id": i, "text": text, "type": "однословное", "phrase_type": "term", "tfidf": 0.1, "hidden": False}
+            for i, text in enumerate(terms)
+        ]
+        response = client.post("/api/dictionary", json={
+            "name": name,
+            "tfidf_range": 0.1,
+            "phrases": phrases,
+            "connections": [{"from_id": i, "to_id": j} for i, j in connections],
+            "document_text": document_text or " ".join(terms),
+        })
+        assert response.status_code == 201, response.text
+        return response.json()["dictionary_id"]
+
+    return create
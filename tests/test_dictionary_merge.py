@@ -0,0 +1,58 @@
+"""Слияние сохранённых словарей в БД: термины без повторов, связи переводятся на id терминов цели"""
+from sqlmodel import Session, select
+
+from database import engine
+from src.database.models import Connection, Dictionary, Document, Term, active_dictionary_ids
+
+
+def dictionary_terms(db: Session, dictionary_id: int) -> dict:
+    """текст термина -> id"""
+    return {term.text: term.id for term in db.exec(select(Term).where(Term.dictionary_id == dictionary_id)).all()}
+
+
+def dictionary_connections(db: Session, dictionary_id: int) -> list:
+    return sorted(
+        (connection.from_term_id, connection.to_term_id)
+        for connection in db.exec(select(Connection).where(Connection.dictionary_id == dictionary_id)).all()
+    )
+
+
+def test_merge_remaps_terms_and_connections(client, create_dictionary):
+    target_id = create_dictionary("цель", ["кот", "пёс"], [(0, 1)])
+    first_id = create_dictionary("источник 1", ["кот", "мышь", "пёс"], [(0, 1), (0, 2)])
+    second_id = create_dictionary("источник 2", ["мышь", "сыр"], [(0, 1)])
+
+    response = client.post(
+        f"/api/dictionary/{target_id}/merge/dictionaries", json={"source_ids": [first_id, second_id]}
+    )
+    assert response.status_code == 200, response.text
+
+    with Session(engine) as db:
+        terms = dictionary_terms(db, target_id)
+        # Повторы (dictionary_id, text, type) не копируются, термины цели сохраняют свои id
+        assert sorted(terms) == ["кот", "мышь", "пёс", "сыр"]
+        # Связь кот -> пёс есть и в цели, и в источнике - остаётся одна
+        assert dictionary_connections(db, target_id) == sorted([
+            (terms["кот"], terms["пёс"]),
+            (terms["кот"], terms["мышь"]),
+            (terms["мышь"], terms["сыр"]),
+        ])
+
+        # Источники помечены удалёнными (или уже дочищены dictionary_purger)
+        assert db.exec(active_dictionary_ids().where(Dictionary.id.in_([first_id, second_id]))).all() == []
+        documents = db.exec(select(Document.dictionary_id).where(Document.dictionary_id.in_(
+            [target_id, first_id, second_id]
+        ))).all()
+        assert documents == [target_id] * 3
+
+
+def test_merge_rejects_missing_and_self(client, create_dictionary):
+    target_id = create_dictionary("цель 2", ["кот"])
+
+    itself = client.post(f"/api/dictionary/{target_id}/merge/dictionaries", json={"source_ids": [target_id]})
+    missing = client.post(f"/api/dictionary/{target_id}/merge/dictionaries", json={"source_ids": [987654]})
+
+    assert itself.status_code == 400
+    assert missing.status_code == 400
+    with Session(engine) as db:
+        assert sorted(dictionary_terms(db, target_id)) == ["кот"]
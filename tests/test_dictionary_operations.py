@@ -0,0 +1,51 @@
+"""Пакет операций над словарём: версия словаря защищает от перезаписи чужих изменений (409)"""
+from src.services.dictionary_service import DictionaryService
+
+
+def test_operations_bump_version(client, create_dictionary):
+    dictionary_id = create_dictionary("операции", ["кошка", "собака"])
+    dictionary = DictionaryService().get_dict_with_terms_and_connections(dictionary_id)
+    cat, dog = (term.id for term in dictionary.phrases)
+
+    response = client.post(f"/api/dictionary/{dictionary_id}/operations", json={
+        "version": dictionary.version,
+        "connections": [{"op": "add", "from_id": cat, "to_id": dog}],
+    })
+
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["version"] == dictionary.version + 1
+    updated = DictionaryService().get_dict_with_terms_and_connections(dictionary_id)
+    assert [(c.from_id, c.to_id) for c in updated.connections] == [(cat, dog)]
+
+
+def test_stale_version_is_rejected(client, create_dictionary):
+    dictionary_id = create_dictionary("конфликт", ["кошка", "собака"])
+    dictionary = DictionaryService().get_dict_with_terms_and_connections(dictionary_id)
+    cat, dog = (term.id for term in dictionary.phrases)
+
+    # Два клиента прочитали одну версию, первый успел сохранить изменения
+    first = client.post(f"/api/dictionary/{dictionary_id}/operations", json={
+        "version": dictionary.version,
+        "name": "переименован",
+    })
+    assert first.status_code == 200, first.text
+
+    second = client.post(f"/api/dictionary/{dictionary_id}/operations", json={
+        "version": dictionary.version,
+        "terms": [{"op": "delete", "id": dog}],
+        "connections": [{"op": "add", "from_id": cat, "to_id": dog}],
+    })
+
+    assert second.status_code == 409
+    assert second.json()["data"]["version"] == dictionary.version + 1
+    # Устаревший пакет не применён ни частично
+    current = DictionaryService().get_dict_with_terms_and_connections(dictionary_id)
+    assert current.name == "переименован"
+    assert sorted(term.id for term in current.phrases) == [cat, dog]
+    assert current.connections == []
+
+
+def test_operations_on_missing_dictionary(client):
+    response = client.post("/api/dictionary/987654/operations", json={"version": 1, "name": "нет"})
+
+    assert response.status_code == 404
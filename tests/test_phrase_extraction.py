@@ -0,0 +1,71 @@
+"""Подсчёт n-грамм по кускам (в пуле процессов) и потоком даёт тот же результат, что и по всему тексту"""
+import pytest
+
+from src.analysis.phrase_extractor import PhraseExtractor
+from src.analysis.tfidf import (
+    extract_top_phrases_from_stream,
+    extract_top_phrases_hashed,
+    extract_top_phrases_with_tfidf,
+    iter_sentence_blocks,
+)
+from src.services.worker_pool import analyze_file_in_worker, create_process_pool
+
+# Меньше текста-примера, чтобы он делился на несколько кусков
+SHARD_SIZE = 5000
+HASH_BUCKETS = 2 ** 16
+
+
+def iter_chunks(text: str, size: int = 777):
+    """Поток кусков, режущих слова и предложения посередине"""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+@pytest.fixture(scope="module")
+def pool():
+    executor = create_process_pool(2)
+    yield executor
+    executor.shutdown()
+
+
+def test_sharded_counts_match_serial(sample_text, pool):
+    serial = extract_top_phrases_with_tfidf(sample_text)
+    sharded = extract_top_phrases_with_tfidf(sample_text, executor=pool, shard_size=SHARD_SIZE)
+
+    assert serial
+    assert sharded == serial
+
+
+def test_sharded_hashing_matches_serial(sample_text, pool):
+    def open_blocks():
+        return iter_sentence_blocks([sample_text], SHARD_SIZE)
+
+    serial = extract_top_phrases_hashed(open_blocks, n_buckets=HASH_BUCKETS)
+    sharded = extract_top_phrases_hashed(open_blocks, n_buckets=HASH_BUCKETS, executor=pool)
+
+    assert serial[0]
+    assert sharded == serial
+
+
+def test_stream_matches_whole_text(sample_text, pool):
+    whole = extract_top_phrases_with_tfidf(sample_text)
+
+    assert extract_top_phrases_from_stream(iter_chunks(sample_text), block_size=SHARD_SIZE) == whole
+    assert extract_top_phrases_from_stream(iter_chunks(sample_text), executor=pool, block_size=SHARD_SIZE) == whole
+
+
+@pytest.mark.parametrize("hash_buckets", [0, HASH_BUCKETS])
+def test_extractor_stream_matches_whole_text(sample_text, hash_buckets):
+    extractor = PhraseExtractor()
+    whole = extractor.analyze_text_with_stats(sample_text, hash_buckets=hash_buckets)
+    streamed = extractor.analyze_stream_with_stats(lambda: iter_chunks(sample_text), hash_buckets=hash_buckets)
+
+    assert whole["total_phrases"] > 0
+    assert streamed == whole
+
+
+def test_file_worker_matches_whole_text(sample_text, tmp_path):
+    path = tmp_path / "sample.txt"
+    path.write_text(sample_text, encoding="utf-8")
+
+    assert analyze_file_in_worker(str(path), shard_workers=1) == PhraseExtractor().analyze_text_with_stats(sample_text)